@@ -12,16 +12,26 @@ from agents.avatar.config import AvatarAgentSettings
 from agents.avatar.prompts import AVATAR_HUMAN_PROMPT, AVATAR_SYSTEM_PROMPT
 from agents.avatar.schemas import AvatarInput, AvatarOutput, AvatarState
 from agents.base import AgentBuilder
+from agents.llm import LLMClientRegistry
 
 logger = logging.getLogger(__name__)
 
+RESPONSE_NODE = "generate_response"
+"""Node whose LLM tokens are the user-facing response (streamed by the session service)."""
+
 
 class AvatarAgentBuilder(AgentBuilder):
     """Generates in-character or analytical responses grounded in retrieved story context."""
 
-    def __init__(self, settings: AvatarAgentSettings, openai_api_key: str = "") -> None:
+    def __init__(
+        self,
+        settings: AvatarAgentSettings,
+        openai_api_key: str = "",
+        llm_registry: LLMClientRegistry | None = None,
+    ) -> None:
         self.settings = settings
         self._openai_api_key = openai_api_key
+        self._llm_registry = llm_registry
 
     def _build(self) -> CompiledStateGraph:
         graph = StateGraph(
@@ -30,9 +40,9 @@ class AvatarAgentBuilder(AgentBuilder):
             output_schema=AvatarOutput,
         )
 
-        graph.add_node("generate_response", self._generate_response)
-        graph.set_entry_point("generate_response")
-        graph.add_edge("generate_response", END)
+        graph.add_node(RESPONSE_NODE, self._generate_response)
+        graph.set_entry_point(RESPONSE_NODE)
+        graph.add_edge(RESPONSE_NODE, END)
 
         return graph.compile()
 
@@ -73,13 +83,18 @@ class AvatarAgentBuilder(AgentBuilder):
                 messages.append(HumanMessage(content=content))
             elif role == "assistant":
                 messages.append(AIMessage(content=content))
+            elif role == "system":
+                messages.append(SystemMessage(content=content))
         messages.append(HumanMessage(content=human_content))
 
-        llm = ChatOpenAI(
-            model=self.settings.model,
-            temperature=0,
-            api_key=self._openai_api_key or None,
-        )
+        if self._llm_registry is not None:
+            llm = self._llm_registry.get(self.settings.model, temperature=0)
+        else:
+            llm = ChatOpenAI(
+                model=self.settings.model,
+                temperature=0,
+                api_key=self._openai_api_key or None,
+            )
         response = await llm.ainvoke(messages)
 
         return {"response_text": response.content, "citations": citations}
@@ -88,6 +103,11 @@ class AvatarAgentBuilder(AgentBuilder):
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
 
+def retrieval_citations(raw: str) -> list[dict]:
+    """Citations the avatar will attach for the given retrieval tool JSON string."""
+    return _parse_retrieval(raw)[1]
+
+
 def _parse_retrieval(raw: str) -> tuple[list[dict], list[dict]]:
     """Return (chunks, citations) from the retrieval tool JSON string."""
     if not raw:
@@ -0,0 +1,55 @@
+"""Generation counters for the knowledge-base collections.
+
+The ingestion pipeline bumps a collection's generation when it creates the
+collection, and a writer's generation within the collection whenever it
+writes that writer's chunks.  Caches that hold results derived from a
+collection (responses, retrieval results) store the generation they were
+computed against and treat entries from an older generation as stale.
+
+Searches are scoped to one writer (``pipeline.tenancy``), so one writer's
+ingestion leaves every other writer's cached results valid.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class KnowledgeBaseVersions:
+    """Process-wide, monotonically increasing generations per collection and writer."""
+
+    def __init__(self) -> None:
+        self._generations: dict[tuple[str, str | None], int] = {}
+        self._changes: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def current(self, collection_name: str, user_id: str | None = None) -> int:
+        """Generation of *collection_name* as seen by *user_id*.
+
+        With *user_id*, the collection-wide generation plus the writer's
+        own, so only bumps affecting that writer make it stale.  Without,
+        a count of every bump of the collection.
+        """
+        with self._lock:
+            if user_id is None:
+                return self._changes.get(collection_name, 0)
+            return self._generations.get((collection_name, None), 0) + self._generations.get(
+                (collection_name, user_id), 0
+            )
+
+    def bump(self, collection_name: str, user_id: str | None = None) -> int:
+        """Advance *user_id*'s generation (the whole collection's if ``None``)."""
+        with self._lock:
+            generation = self._generations.get((collection_name, user_id), 0) + 1
+            self._generations[(collection_name, user_id)] = generation
+            self._changes[collection_name] = self._changes.get(collection_name, 0) + 1
+        logger.info(
+            "Knowledge base %r (user %s) is now at generation %d",
+            collection_name,
+            user_id if user_id is not None else "*",
+            generation,
+        )
+        return generation
@@ -0,0 +1,115 @@
+"""Process-wide registry of ``ChatOpenAI`` clients sharing one HTTP pool.
+
+Every chat model is created once per ``(model, temperature, options)`` key and
+reused across turns and ingestion runs.  All of them share a single
+``httpx.AsyncClient`` (and a lazily created sync ``httpx.Client`` for the rare
+sync call), so TCP connections and TLS sessions to the OpenAI API are kept
+alive between requests instead of being set up per call.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+logger = logging.getLogger(__name__)
+
+
+class _CountingTransport(httpx.AsyncHTTPTransport):
+    """``AsyncHTTPTransport`` that counts requests and exposes its pool state."""
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.requests_total = 0
+        self.requests_in_flight = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests_total += 1
+        self.requests_in_flight += 1
+        try:
+            return await super().handle_async_request(request)
+        finally:
+            self.requests_in_flight -= 1
+
+    def pool_connections(self) -> tuple[int, int]:
+        """Return ``(open, idle)`` connection counts of the underlying pool."""
+        connections = self._pool.connections
+        return len(connections), sum(1 for c in connections if c.is_idle())
+
+
+class LLMClientRegistry:
+    """Shares ``ChatOpenAI`` instances and their HTTP connection pool.
+
+    Args:
+        api_key: OpenAI API key (falls back to ``OPENAI_API_KEY`` when empty).
+        max_connections: Upper bound on concurrent connections in the pool.
+        max_keepalive_connections: Idle connections kept open for reuse.
+        keepalive_expiry: Seconds an idle connection is kept alive.
+        timeout: Per-request timeout in seconds.
+    """
+
+    def __init__(
+        self,
+        api_key: str = "",
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 60.0,
+    ) -> None:
+        self._api_key = api_key
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._timeout = httpx.Timeout(timeout)
+        self._transport = _CountingTransport(limits=self._limits)
+        self._http_async_client = httpx.AsyncClient(
+            transport=self._transport, timeout=self._timeout
+        )
+        self._http_client: httpx.Client | None = None
+        self._clients: dict[tuple, ChatOpenAI] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model: str, temperature: float | None = None, **options: Any) -> ChatOpenAI:
+        """Return the shared ``ChatOpenAI`` for *model* / *temperature* / *options*."""
+        key = (model, temperature, tuple(sorted(options.items())))
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                if self._http_client is None:
+                    self._http_client = httpx.Client(limits=self._limits, timeout=self._timeout)
+                client = ChatOpenAI(
+                    model=model,
+                    temperature=temperature,
+                    api_key=self._api_key or None,
+                    http_async_client=self._http_async_client,
+                    http_client=self._http_client,
+                    **options,
+                )
+                self._clients[key] = client
+                logger.info("Created shared ChatOpenAI client for %s (t=%s)", model, temperature)
+            return client
+
+    def metrics(self) -> dict[str, int]:
+        """Snapshot of client and connection-pool usage."""
+        open_connections, idle_connections = self._transport.pool_connections()
+        return {
+            "clients": len(self._clients),
+            "requests_total": self._transport.requests_total,
+            "requests_in_flight": self._transport.requests_in_flight,
+            "pool_connections": open_connections,
+            "pool_idle_connections": idle_connections,
+            "max_connections": self._limits.max_connections,
+            "max_keepalive_connections": self._limits.max_keepalive_connections,
+        }
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP clients (call on application shutdown)."""
+        await self._http_async_client.aclose()
+        if self._http_client is not None:
+            self._http_client.close()
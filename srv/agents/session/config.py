@@ -0,0 +1,18 @@
+from pydantic_settings import BaseSettings
+
+
+class SessionSettings(BaseSettings):
+    history_fetch_limit: int = 40
+    # must stay below history_fetch_limit: the overflow is what gets summarized
+    history_window_messages: int = 20
+    history_token_budget: int = 3000
+    tokenizer_encoding: str = "o200k_base"
+    summarize_history: bool = True
+    summary_model: str = "gpt-4o-mini"
+    summary_max_words: int = 200
+    response_cache_enabled: bool = False
+    response_cache_similarity: float = 0.95
+    response_cache_ttl_seconds: float = 3600.0
+    response_cache_max_entries: int = 1000
+
+    model_config = {"env_prefix": "AGENT_SESSION_", "env_file": ".env", "extra": "ignore"}
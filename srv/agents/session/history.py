@@ -0,0 +1,157 @@
+"""Token-budgeted conversation history with a rolling summary.
+
+The session service fetches the most recent ``history_fetch_limit`` messages
+of a chat; ``HistoryManager.window`` keeps the newest ones that fit in
+``history_token_budget`` tokens, at most ``history_window_messages`` of them,
+and prepends the rolling summary of older turns as a system message.
+
+The summary lives in ``narrative_state`` under ``history_summary``, with
+``summarized_through`` holding the ``created_at`` of the newest message it
+covers.  Messages that drop out of the window and are newer than that mark
+are folded into the summary by one small LLM call per turn, which runs
+alongside the graph and is persisted with the turn.  Capping the window
+below the fetch limit guarantees every message leaves the window while it
+is still fetched, even when the whole fetch fits the token budget.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_openai import ChatOpenAI
+
+from agents.llm import LLMClientRegistry
+from agents.session.config import SessionSettings
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_KEY = "history_summary"
+SUMMARIZED_THROUGH_KEY = "summarized_through"
+
+_MESSAGE_OVERHEAD_TOKENS = 4
+"""Per-message framing tokens added by the chat format."""
+
+SUMMARY_PROMPT = """\
+You maintain a running summary of a conversation between a fiction writer and \
+one of their characters. Merge the new turns into the summary. Keep established \
+facts, decisions, promises, emotional shifts and open questions; drop small talk. \
+Write at most {max_words} words of plain prose.
+
+Current summary:
+{summary}
+
+New turns:
+{turns}"""
+
+
+class HistoryManager:
+    """Trims chat history to a token budget and keeps a rolling summary."""
+
+    def __init__(
+        self,
+        settings: SessionSettings,
+        openai_api_key: str = "",
+        llm_registry: LLMClientRegistry | None = None,
+    ) -> None:
+        self.settings = settings
+        self._openai_api_key = openai_api_key
+        self._llm_registry = llm_registry
+        self._count: Callable[[str], int] | None = None
+
+    def count_tokens(self, text: str) -> int:
+        """Token count of *text* with the local tokenizer.
+
+        Uses tiktoken's ``tokenizer_encoding``; if that encoding cannot be
+        loaded (e.g. no network to fetch it on first use) or is empty,
+        falls back to the ~4 characters per token rule of thumb.
+        """
+        if self._count is None and not self.settings.tokenizer_encoding:
+            self._count = _estimate_tokens
+        if self._count is None:
+            try:
+                import tiktoken
+
+                encoding = tiktoken.get_encoding(self.settings.tokenizer_encoding)
+                self._count = lambda s: len(encoding.encode(s, disallowed_special=()))
+            except Exception:
+                logger.warning(
+                    "Tokenizer %r unavailable; estimating tokens from length",
+                    self.settings.tokenizer_encoding,
+                )
+                self._count = _estimate_tokens
+        return self._count(text)
+
+    def window(
+        self, messages: list[dict], narrative_state: dict
+    ) -> tuple[list[dict[str, str]], list[dict]]:
+        """Split chronological *messages* into ``(history, unsummarized)``.
+
+        *history* is what the avatar sees: the summary (if any) followed by
+        the newest messages within the token budget and message cap,
+        starting at a user message.  *unsummarized* are the older messages not yet covered by
+        the summary.
+        """
+        budget = self.settings.history_token_budget
+        start = len(messages)
+        floor = max(0, len(messages) - self.settings.history_window_messages)
+        while start > floor:
+            cost = self.count_tokens(messages[start - 1].get("content", ""))
+            cost += _MESSAGE_OVERHEAD_TOKENS
+            if cost > budget:
+                break
+            budget -= cost
+            start -= 1
+        while start < len(messages) and messages[start].get("role") != "user":
+            start += 1
+
+        history = [
+            {"role": m.get("role", ""), "content": m.get("content", "")}
+            for m in messages[start:]
+        ]
+        summary = narrative_state.get(SUMMARY_KEY)
+        if summary:
+            history.insert(
+                0, {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}
+            )
+
+        through = narrative_state.get(SUMMARIZED_THROUGH_KEY) or ""
+        unsummarized = [m for m in messages[:start] if (m.get("created_at") or "") > through]
+        if not self.settings.summarize_history:
+            unsummarized = []
+        return history, unsummarized
+
+    async def summarize(self, narrative_state: dict, messages: list[dict]) -> dict:
+        """Fold *messages* into the rolling summary; returns the state delta."""
+        if not messages:
+            return {}
+        turns = "\n".join(f"{m.get('role', '')}: {m.get('content', '')}" for m in messages)
+        prompt = SUMMARY_PROMPT.format(
+            max_words=self.settings.summary_max_words,
+            summary=narrative_state.get(SUMMARY_KEY) or "(none yet)",
+            turns=turns,
+        )
+        response = await self._llm().ainvoke(
+            [
+                SystemMessage(content="You summarize conversations faithfully and concisely."),
+                HumanMessage(content=prompt),
+            ]
+        )
+        return {
+            SUMMARY_KEY: response.content,
+            SUMMARIZED_THROUGH_KEY: messages[-1].get("created_at") or "",
+        }
+
+    def _llm(self):
+        if self._llm_registry is not None:
+            return self._llm_registry.get(self.settings.summary_model, temperature=0)
+        return ChatOpenAI(
+            model=self.settings.summary_model,
+            temperature=0,
+            api_key=self._openai_api_key or None,
+        )
+
+
+def _estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
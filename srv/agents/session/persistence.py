@@ -0,0 +1,259 @@
+"""Write-behind persistence for finished chat turns.
+
+``AvatarSessionService`` hands each completed turn (two message rows plus
+the merged narrative state) to a ``PersistenceQueue`` and sends ``done``
+right away.  A background task batches the queued turns across chats into
+one message insert and one narrative-state upsert per chat, retrying with
+exponential backoff until the writes succeed.
+
+Delivery is at-least-once: message rows carry client-generated ids and the
+repository ignores duplicates, and narrative-state writes are upserts, so
+replaying a turn is harmless.  With a ``journal_path`` every queued turn is
+also appended to a JSONL file that is replayed on ``start`` and truncated
+once the queue drains, so turns survive a crash or a shutdown that could
+not reach the database.
+
+If the batched write fails, each chat's turns are retried on their own, so
+one bad chat (e.g. deleted while its turn was queued) cannot hold back the
+others.  Errors that a retry cannot fix (``is_permanent_error``) and chats
+still failing after ``max_attempts`` are dead-lettered: logged, counted and
+appended to ``dead_letter_path`` if one is set.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import Counter
+from pathlib import Path
+
+from agents.session.repository import ChatRepository, is_permanent_error
+
+logger = logging.getLogger(__name__)
+
+
+class PersistenceQueue:
+    """Batches turn writes in the background.
+
+    Args:
+        repository: Where the turns are written.
+        batch_size: Maximum turns written per batch.
+        flush_interval: Seconds to wait for more turns before writing a batch.
+        retry_backoff: First retry delay in seconds; doubles per failure.
+        max_backoff: Upper bound on the retry delay.
+        max_attempts: Writes per chat before its turns are dead-lettered.
+        journal_path: Optional JSONL journal for crash-safe delivery.
+        dead_letter_path: Optional JSONL file receiving turns that could not
+            be written.
+        wait_timeout: Upper bound on ``wait_for_chat`` in seconds.
+    """
+
+    def __init__(
+        self,
+        repository: ChatRepository,
+        batch_size: int = 200,
+        flush_interval: float = 0.05,
+        retry_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        max_attempts: int = 8,
+        journal_path: str = "",
+        dead_letter_path: str = "",
+        wait_timeout: float = 5.0,
+    ) -> None:
+        self._repository = repository
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._retry_backoff = retry_backoff
+        self._max_backoff = max_backoff
+        self._max_attempts = max(1, max_attempts)
+        self._journal = Path(journal_path) if journal_path else None
+        self._dead_letter = Path(dead_letter_path) if dead_letter_path else None
+        self._wait_timeout = wait_timeout
+        self._pending: list[dict] = []
+        self._pending_chats: Counter[str] = Counter()
+        self._wakeup = asyncio.Event()
+        self._drained = asyncio.Condition()
+        self._task: asyncio.Task | None = None
+        self._turns_written = 0
+        self._batches_written = 0
+        self._retries = 0
+        self._dead_lettered = 0
+
+    # ── Lifecycle ─────────────────────────────────────────────────────────
+
+    def start(self) -> None:
+        """Replay the journal (if any) and start the background writer."""
+        if self._task is not None:
+            return
+        if self._journal is not None and self._journal.exists():
+            replayed = [
+                json.loads(line)
+                for line in self._journal.read_text().splitlines()
+                if line.strip()
+            ]
+            for turn in replayed:
+                self._pending.append(turn)
+                self._pending_chats[turn["chat_id"]] += 1
+            if replayed:
+                logger.info("Replaying %d journaled chat turns", len(replayed))
+                self._wakeup.set()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Flush what is queued (up to *timeout* seconds), then stop the writer."""
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except asyncio.TimeoutError:
+            logger.error(
+                "Shutdown left %d chat turns unwritten%s",
+                len(self._pending),
+                " (kept in the journal)" if self._journal else "",
+            )
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ── Producer side ─────────────────────────────────────────────────────
+
+    def submit(
+        self, chat_id: str, user_id: str, messages: list[dict], narrative_state: dict
+    ) -> None:
+        """Queue one finished turn; returns immediately."""
+        turn = {
+            "chat_id": chat_id,
+            "user_id": user_id,
+            "messages": messages,
+            "narrative_state": narrative_state,
+        }
+        if self._journal is not None:
+            self._journal.parent.mkdir(parents=True, exist_ok=True)
+            with self._journal.open("a") as f:
+                f.write(json.dumps(turn) + "\n")
+        self._pending.append(turn)
+        self._pending_chats[chat_id] += 1
+        self._wakeup.set()
+        if self._task is None:
+            self.start()
+
+    async def wait_for_chat(self, chat_id: str) -> None:
+        """Wait until every queued turn of *chat_id* has been written.
+
+        Gives up after ``wait_timeout`` seconds (logging a warning), so a
+        struggling database delays the next turn instead of hanging it.
+        """
+        try:
+            async with asyncio.timeout(self._wait_timeout):
+                async with self._drained:
+                    await self._drained.wait_for(lambda: not self._pending_chats[chat_id])
+        except TimeoutError:
+            logger.warning(
+                "Chat %s still has %d unwritten turns after %.1fs; reading without them",
+                chat_id,
+                self._pending_chats[chat_id],
+                self._wait_timeout,
+            )
+
+    async def flush(self) -> None:
+        """Wait until the queue is empty."""
+        if self._pending:
+            self._wakeup.set()
+            if self._task is None:
+                self.start()
+        async with self._drained:
+            await self._drained.wait_for(lambda: not self._pending)
+
+    def metrics(self) -> dict[str, int]:
+        return {
+            "pending_turns": len(self._pending),
+            "turns_written": self._turns_written,
+            "batches_written": self._batches_written,
+            "retries": self._retries,
+            "dead_lettered": self._dead_lettered,
+        }
+
+    # ── Writer ────────────────────────────────────────────────────────────
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self._flush_interval > 0:
+                await asyncio.sleep(self._flush_interval)
+            while self._pending:
+                batch = self._pending[: self._batch_size]
+                await self._write_with_retry(batch)
+                del self._pending[: len(batch)]
+                self._pending_chats.subtract(turn["chat_id"] for turn in batch)
+                self._turns_written += len(batch)
+                self._batches_written += 1
+                if not self._pending and self._journal is not None:
+                    self._journal.write_text("")
+                async with self._drained:
+                    self._drained.notify_all()
+
+    async def _write_with_retry(self, batch: list[dict]) -> None:
+        """Write *batch*; returns once every turn is written or dead-lettered."""
+        try:
+            await self._write(batch)
+            return
+        except Exception:
+            self._retries += 1
+            logger.exception("Persisting %d chat turns failed; retrying per chat", len(batch))
+
+        by_chat: dict[str, list[dict]] = {}
+        for turn in batch:
+            by_chat.setdefault(turn["chat_id"], []).append(turn)
+        await asyncio.gather(*(self._write_chat(turns) for turns in by_chat.values()))
+
+    async def _write_chat(self, turns: list[dict]) -> None:
+        chat_id = turns[0]["chat_id"]
+        delay = self._retry_backoff
+        for attempt in range(1, self._max_attempts + 1):
+            try:
+                await self._write(turns)
+                return
+            except Exception as exc:
+                if is_permanent_error(exc) or attempt == self._max_attempts:
+                    logger.exception(
+                        "Dead-lettering %d turns of chat %s after %d attempts",
+                        len(turns),
+                        chat_id,
+                        attempt,
+                    )
+                    self._dead_letter_turns(turns, exc)
+                    return
+                self._retries += 1
+                logger.warning(
+                    "Persisting chat %s failed (%s); retrying in %.1fs", chat_id, exc, delay
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self._max_backoff)
+
+    def _dead_letter_turns(self, turns: list[dict], exc: BaseException) -> None:
+        self._dead_lettered += len(turns)
+        if self._dead_letter is None:
+            return
+        self._dead_letter.parent.mkdir(parents=True, exist_ok=True)
+        with self._dead_letter.open("a") as f:
+            for turn in turns:
+                f.write(json.dumps({**turn, "error": repr(exc)}) + "\n")
+
+    async def _write(self, batch: list[dict]) -> None:
+        await self._repository.insert_messages(
+            [row for turn in batch for row in turn["messages"]]
+        )
+        # Later turns of the same chat carry the newer state.
+        latest = {turn["chat_id"]: turn for turn in batch}
+        await asyncio.gather(
+            *(
+                self._repository.upsert_narrative_state(
+                    turn["chat_id"], turn["user_id"], turn["narrative_state"]
+                )
+                for turn in latest.values()
+            )
+        )
@@ -0,0 +1,361 @@
+"""Async data access for chats, characters, messages and narrative state.
+
+``SupabaseChatRepository`` talks to PostgREST through supabase-py's
+``AsyncClient``, whose pooled ``httpx.AsyncClient`` keeps connections open
+between requests, so no Supabase call blocks the event loop.
+``InMemoryChatRepository`` keeps the same tables in dicts for local runs and
+tests.
+"""
+
+from __future__ import annotations
+
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Protocol, runtime_checkable
+
+import httpx
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
+from supabase import AsyncClient
+
+logger = logging.getLogger(__name__)
+
+_CHAT_COLUMNS = ("id", "character_id", "title", "created_at", "updated_at")
+_CHARACTER_COLUMNS = ("id", "name", "initials", "color", "created_at")
+
+# SQLSTATE classes a retry cannot fix: data exceptions (22), integrity
+# constraint violations such as a deleted chat's foreign key (23) and
+# syntax / undefined-object errors (42).  PGRST* codes are request errors.
+_PERMANENT_SQLSTATE_CLASSES = ("22", "23", "42")
+
+
+def is_permanent_error(exc: BaseException) -> bool:
+    """True if a repository write failed in a way that retrying cannot fix.
+
+    Covers PostgREST errors for invalid data, violated constraints and
+    malformed requests, and HTTP 4xx responses other than 408 / 429.
+    Everything else (network errors, 5xx, timeouts) is treated as transient.
+    """
+    if isinstance(exc, APIError):
+        code = exc.code or ""
+        return code.startswith("PGRST") or code[:2] in _PERMANENT_SQLSTATE_CLASSES
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return 400 <= status < 500 and status not in (408, 429)
+    return False
+
+
+@runtime_checkable
+class ChatRepository(Protocol):
+    """Async CRUD interface used by the session service and the chat routes."""
+
+    async def chat_owned_by(self, chat_id: str, user_id: str) -> bool: ...
+
+    async def list_chats(self, user_id: str) -> list[dict]: ...
+
+    async def create_chat(
+        self, chat_id: str, user_id: str, character_id: str, title: str | None
+    ) -> dict: ...
+
+    async def rename_chat(self, chat_id: str, user_id: str, title: str) -> dict | None: ...
+
+    async def delete_chat(self, chat_id: str, user_id: str) -> bool: ...
+
+    async def list_characters(self, user_id: str) -> list[dict]: ...
+
+    async def character_name(self, character_id: str, user_id: str) -> str | None: ...
+
+    async def create_character(
+        self, user_id: str, name: str, initials: str, color: str
+    ) -> dict: ...
+
+    async def delete_character(self, character_id: str, user_id: str) -> bool: ...
+
+    async def read_history(self, chat_id: str, limit: int) -> list[dict[str, str]]:
+        """The *limit* most recent messages of *chat_id*, oldest first."""
+
+    async def insert_messages(self, rows: list[dict]) -> None:
+        """Insert message rows, skipping ids that already exist."""
+
+    async def read_narrative_state(self, chat_id: str) -> dict: ...
+
+    async def upsert_narrative_state(self, chat_id: str, user_id: str, state: dict) -> None: ...
+
+    async def aclose(self) -> None: ...
+
+
+class SupabaseChatRepository:
+    """Reads/writes the chat tables through the async Supabase client.
+
+    The client only builds its HTTP session on first use, so constructing
+    the repository performs no I/O.
+    """
+
+    def __init__(self, supabase_url: str, supabase_service_key: str) -> None:
+        self._client = AsyncClient(supabase_url, supabase_service_key)
+
+    # ── Chats ─────────────────────────────────────────────────────────────
+
+    async def chat_owned_by(self, chat_id: str, user_id: str) -> bool:
+        result = await (
+            self._client.table("chats")
+            .select("id")
+            .eq("id", chat_id)
+            .eq("user_id", user_id)
+            .execute()
+        )
+        return bool(result.data)
+
+    async def list_chats(self, user_id: str) -> list[dict]:
+        result = await (
+            self._client.table("chats")
+            .select(", ".join(_CHAT_COLUMNS))
+            .eq("user_id", user_id)
+            .order("updated_at", desc=True)
+            .execute()
+        )
+        return result.data
+
+    async def create_chat(
+        self, chat_id: str, user_id: str, character_id: str, title: str | None
+    ) -> dict:
+        result = await (
+            self._client.table("chats")
+            .insert(
+                {
+                    "id": chat_id,
+                    "user_id": user_id,
+                    "character_id": character_id,
+                    "title": title,
+                }
+            )
+            .execute()
+        )
+        return result.data[0]
+
+    async def rename_chat(self, chat_id: str, user_id: str, title: str) -> dict | None:
+        result = await (
+            self._client.table("chats")
+            .update({"title": title})
+            .eq("id", chat_id)
+            .eq("user_id", user_id)
+            .execute()
+        )
+        return result.data[0] if result.data else None
+
+    async def delete_chat(self, chat_id: str, user_id: str) -> bool:
+        result = await (
+            self._client.table("chats")
+            .delete()
+            .eq("id", chat_id)
+            .eq("user_id", user_id)
+            .execute()
+        )
+        return bool(result.data)
+
+    # ── Characters ────────────────────────────────────────────────────────
+
+    async def list_characters(self, user_id: str) -> list[dict]:
+        result = await (
+            self._client.table("characters")
+            .select(", ".join(_CHARACTER_COLUMNS))
+            .eq("user_id", user_id)
+            .order("created_at", desc=False)
+            .execute()
+        )
+        return result.data
+
+    async def character_name(self, character_id: str, user_id: str) -> str | None:
+        """Name of *user_id*'s character *character_id* (``None`` if unknown)."""
+        try:
+            uuid.UUID(character_id)
+        except ValueError:
+            # Not a characters.id; querying would fail the uuid cast.
+            return None
+        result = await (
+            self._client.table("characters")
+            .select("name")
+            .eq("id", character_id)
+            .eq("user_id", user_id)
+            .limit(1)
+            .execute()
+        )
+        return result.data[0]["name"] if result.data else None
+
+    async def create_character(
+        self, user_id: str, name: str, initials: str, color: str
+    ) -> dict:
+        result = await (
+            self._client.table("characters")
+            .insert({"user_id": user_id, "name": name, "initials": initials, "color": color})
+            .execute()
+        )
+        return result.data[0]
+
+    async def delete_character(self, character_id: str, user_id: str) -> bool:
+        result = await (
+            self._client.table("characters")
+            .delete()
+            .eq("id", character_id)
+            .eq("user_id", user_id)
+            .execute()
+        )
+        return bool(result.data)
+
+    # ── Messages & narrative state ────────────────────────────────────────
+
+    async def read_history(self, chat_id: str, limit: int) -> list[dict[str, str]]:
+        result = await (
+            self._client.table("messages")
+            .select("role, content, created_at")
+            .eq("chat_id", chat_id)
+            .order("created_at", desc=True)
+            .limit(limit)
+            .execute()
+        )
+        return list(reversed(result.data or []))
+
+    async def insert_messages(self, rows: list[dict]) -> None:
+        # Rows carry their own ids; replays of an already written row are no-ops.
+        await (
+            self._client.table("messages")
+            .upsert(rows, ignore_duplicates=True, returning=ReturnMethod.minimal)
+            .execute()
+        )
+
+    async def read_narrative_state(self, chat_id: str) -> dict:
+        result = await (
+            self._client.table("narrative_state")
+            .select("state")
+            .eq("chat_id", chat_id)
+            .maybe_single()
+            .execute()
+        )
+        if result and result.data:
+            return result.data.get("state", {})
+        return {}
+
+    async def upsert_narrative_state(self, chat_id: str, user_id: str, state: dict) -> None:
+        await (
+            self._client.table("narrative_state")
+            .upsert(
+                {
+                    "chat_id": chat_id,
+                    "user_id": user_id,
+                    "state": state,
+                    "updated_at": "now()",
+                }
+            )
+            .execute()
+        )
+
+    async def aclose(self) -> None:
+        """Close the pooled PostgREST session (call on application shutdown)."""
+        await self._client.postgrest.aclose()
+
+
+class InMemoryChatRepository:
+    """Dict-backed tables. Ephemeral — lost on restart."""
+
+    def __init__(self) -> None:
+        self.chats: dict[str, dict[str, Any]] = {}
+        self.characters: dict[str, dict[str, Any]] = {}
+        self.messages: list[dict[str, Any]] = []
+        self.narrative_states: dict[str, dict[str, Any]] = {}
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    async def chat_owned_by(self, chat_id: str, user_id: str) -> bool:
+        chat = self.chats.get(chat_id)
+        return chat is not None and chat["user_id"] == user_id
+
+    async def list_chats(self, user_id: str) -> list[dict]:
+        rows = [c for c in self.chats.values() if c["user_id"] == user_id]
+        rows.sort(key=lambda c: c["updated_at"], reverse=True)
+        return [{k: c[k] for k in _CHAT_COLUMNS} for c in rows]
+
+    async def create_chat(
+        self, chat_id: str, user_id: str, character_id: str, title: str | None
+    ) -> dict:
+        now = self._now()
+        chat = {
+            "id": chat_id,
+            "user_id": user_id,
+            "character_id": character_id,
+            "title": title,
+            "created_at": now,
+            "updated_at": now,
+        }
+        self.chats[chat_id] = chat
+        return dict(chat)
+
+    async def rename_chat(self, chat_id: str, user_id: str, title: str) -> dict | None:
+        if not await self.chat_owned_by(chat_id, user_id):
+            return None
+        self.chats[chat_id].update(title=title, updated_at=self._now())
+        return dict(self.chats[chat_id])
+
+    async def delete_chat(self, chat_id: str, user_id: str) -> bool:
+        if not await self.chat_owned_by(chat_id, user_id):
+            return False
+        del self.chats[chat_id]
+        self.messages = [m for m in self.messages if m["chat_id"] != chat_id]
+        self.narrative_states.pop(chat_id, None)
+        return True
+
+    async def list_characters(self, user_id: str) -> list[dict]:
+        rows = [c for c in self.characters.values() if c["user_id"] == user_id]
+        return [{k: c[k] for k in _CHARACTER_COLUMNS} for c in rows]
+
+    async def character_name(self, character_id: str, user_id: str) -> str | None:
+        character = self.characters.get(character_id)
+        if character is None or character["user_id"] != user_id:
+            return None
+        return character["name"]
+
+    async def create_character(
+        self, user_id: str, name: str, initials: str, color: str
+    ) -> dict:
+        character = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "name": name,
+            "initials": initials,
+            "color": color,
+            "created_at": self._now(),
+        }
+        self.characters[character["id"]] = character
+        return dict(character)
+
+    async def delete_character(self, character_id: str, user_id: str) -> bool:
+        character = self.characters.get(character_id)
+        if character is None or character["user_id"] != user_id:
+            return False
+        del self.characters[character_id]
+        return True
+
+    async def read_history(self, chat_id: str, limit: int) -> list[dict[str, str]]:
+        rows = [m for m in self.messages if m["chat_id"] == chat_id][-limit:]
+        return [
+            {"role": m["role"], "content": m["content"], "created_at": m.get("created_at")}
+            for m in rows
+        ]
+
+    async def insert_messages(self, rows: list[dict]) -> None:
+        seen = {m.get("id") for m in self.messages}
+        self.messages.extend(
+            dict(row) for row in rows if row.get("id") is None or row["id"] not in seen
+        )
+
+    async def read_narrative_state(self, chat_id: str) -> dict:
+        row = self.narrative_states.get(chat_id)
+        return dict(row["state"]) if row else {}
+
+    async def upsert_narrative_state(self, chat_id: str, user_id: str, state: dict) -> None:
+        self.narrative_states[chat_id] = {"user_id": user_id, "state": dict(state)}
+
+    async def aclose(self) -> None:
+        return None
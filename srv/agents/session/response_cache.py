@@ -0,0 +1,140 @@
+"""Semantic cache of finished avatar responses.
+
+Writers often ask a character near-identical questions across chats ("What
+does PurpleFrog fear?").  ``SemanticResponseCache`` sits in front of the
+supervisor graph: a message whose embedding is within
+``similarity_threshold`` (cosine) of a cached message for the same user and
+character, computed against the current knowledge-base generation, is
+answered from the cache without retrieval, reranking or the avatar LLM.
+
+Entries expire after ``ttl_seconds`` and the least recently used are
+evicted beyond ``max_entries``.  Ingestion bumps the writer's generation in
+``KnowledgeBaseVersions``, which makes that writer's older entries a miss.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from pydantic import BaseModel, Field
+
+from agents.knowledge_base import KnowledgeBaseVersions
+
+logger = logging.getLogger(__name__)
+
+
+class CachedResponse(BaseModel):
+    response_text: str
+    citations: list[dict] = Field(default_factory=list)
+    gap_flags: list[dict] = Field(default_factory=list)
+
+
+class CacheProbe(BaseModel):
+    """Result of ``lookup``; pass it back to ``store`` on a miss."""
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    hit: CachedResponse | None = None
+    scope: tuple[str, str, int]
+    vector: np.ndarray
+
+
+class _Entry:
+    __slots__ = ("scope", "vector", "response", "stored_at")
+
+    def __init__(
+        self, scope: tuple[str, str, int], vector: np.ndarray, response: CachedResponse
+    ) -> None:
+        self.scope = scope
+        self.vector = vector
+        self.response = response
+        self.stored_at = time.monotonic()
+
+
+class SemanticResponseCache:
+    """Embedding-similarity cache keyed by user, character and KB generation.
+
+    Args:
+        embeddings: Embeds incoming messages (the shared cached embeddings).
+        versions: Knowledge-base generation counters.
+        collection_name: Collection whose generation scopes the entries.
+        similarity_threshold: Minimum cosine similarity for a hit.
+        ttl_seconds: Entry lifetime.
+        max_entries: LRU bound on the number of cached responses.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        versions: KnowledgeBaseVersions,
+        collection_name: str,
+        similarity_threshold: float = 0.95,
+        ttl_seconds: float = 3600.0,
+        max_entries: int = 1000,
+    ) -> None:
+        self._embeddings = embeddings
+        self._versions = versions
+        self._collection_name = collection_name
+        self._threshold = similarity_threshold
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._scopes: dict[tuple[str, str, int], list[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    async def lookup(self, user_id: str, character_id: str, message: str) -> CacheProbe:
+        """Embed *message* and return the best cached response, if close enough."""
+        vector = np.asarray(await self._embeddings.aembed_query(message), dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm:
+            vector = vector / norm
+        scope = (user_id, character_id, self._versions.current(self._collection_name, user_id))
+
+        best: _Entry | None = None
+        best_score = self._threshold
+        now = time.monotonic()
+        with self._lock:
+            for entry_id in list(self._scopes.get(scope, ())):
+                entry = self._entries[entry_id]
+                if now - entry.stored_at > self._ttl:
+                    self._remove(entry_id)
+                    continue
+                score = float(np.dot(vector, entry.vector))
+                if score >= best_score:
+                    best, best_score = entry, score
+                    best_id = entry_id
+            if best is not None:
+                self._entries.move_to_end(best_id)
+                self._hits += 1
+            else:
+                self._misses += 1
+        return CacheProbe(hit=best.response if best else None, scope=scope, vector=vector)
+
+    def store(self, probe: CacheProbe, response: CachedResponse) -> None:
+        """Cache *response* under the scope and embedding of a missed *probe*."""
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(probe.scope, probe.vector, response)
+            self._scopes.setdefault(probe.scope, []).append(entry_id)
+            while len(self._entries) > self._max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def metrics(self) -> dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self._hits, "misses": self._misses}
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        ids = self._scopes[entry.scope]
+        ids.remove(entry_id)
+        if not ids:
+            del self._scopes[entry.scope]
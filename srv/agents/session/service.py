@@ -1,45 +1,87 @@
+import asyncio
 import json
 import logging
+import uuid
 from collections.abc import AsyncGenerator
+from datetime import datetime, timezone
 
 from fastapi import HTTPException
-from supabase import Client, create_client
+from pydantic import BaseModel, Field
 
+from agents.avatar.agent import RESPONSE_NODE, retrieval_citations
+from agents.session.config import SessionSettings
+from agents.session.history import HistoryManager
+from agents.session.persistence import PersistenceQueue
+from agents.session.repository import ChatRepository
+from agents.session.response_cache import CachedResponse, SemanticResponseCache
 from agents.supervisor.agent import SupervisorAgentBuilder
 
 logger = logging.getLogger(__name__)
 
-HISTORY_WINDOW = 20
+
+class TurnContext(BaseModel):
+    """Chat data loaded once per turn and carried through to persistence."""
+
+    history: list[dict[str, str]] = Field(default_factory=list)
+    narrative_state: dict = Field(default_factory=dict)
+    unsummarized: list[dict] = Field(default_factory=list)
+    character_name: str = ""
 
 
 class AvatarSessionService:
     """Stateless wrapper around the supervisor graph.
 
-    Reads/writes Supabase; invokes the graph; yields SSE frames.
+    Reads chat data through an async ``ChatRepository``; invokes the graph;
+    yields SSE frames.  Finished turns are written behind the response by a
+    ``PersistenceQueue``, so ``done`` does not wait on the database.  The
+    ``HistoryManager`` bounds the history sent to the avatar by tokens.  With
+    a ``SemanticResponseCache``, near-duplicate questions to the same
+    character are answered without running the graph.
     """
 
     def __init__(
         self,
         supervisor_builder: SupervisorAgentBuilder,
-        supabase_url: str,
-        supabase_service_key: str,
+        repository: ChatRepository,
+        persistence: PersistenceQueue | None = None,
+        history: HistoryManager | None = None,
+        response_cache: SemanticResponseCache | None = None,
     ) -> None:
         self._supervisor_graph = supervisor_builder.compile()
-        self._supabase: Client = create_client(supabase_url, supabase_service_key)
-
-    def get_supabase_client(self) -> Client:
-        return self._supabase
-
-    async def assert_chat_owner(self, chat_id: str, user_id: str) -> None:
-        result = (
-            self._supabase.table("chats")
-            .select("id")
-            .eq("id", chat_id)
-            .eq("user_id", user_id)
-            .execute()
+        self._repository = repository
+        self._persistence = persistence or PersistenceQueue(repository)
+        self._history = history or HistoryManager(SessionSettings())
+        self._response_cache = response_cache
+
+    async def load_turn(
+        self, chat_id: str, user_id: str, character_id: str = ""
+    ) -> TurnContext:
+        """Check ownership and load history, narrative state and character name.
+
+        Raises 403 if *user_id* does not own *chat_id*.  The four reads are
+        independent, so a turn pays one round-trip instead of four.  A
+        previous turn of the chat still in the write-behind queue is flushed
+        first, so the reads see it.
+
+        Chats refer to characters by ``characters.id``; the name it resolves
+        to is what retrieval focuses on (see ``pipeline.taxonomy``).
+        """
+        await self._persistence.wait_for_chat(chat_id)
+        owned, messages, narrative_state, character_name = await asyncio.gather(
+            self._repository.chat_owned_by(chat_id, user_id),
+            self._repository.read_history(chat_id, self._history.settings.history_fetch_limit),
+            self._repository.read_narrative_state(chat_id),
+            self._repository.character_name(character_id, user_id),
         )
-        if not result.data:
+        if not owned:
             raise HTTPException(status_code=403, detail="Chat not found or access denied")
+        history, unsummarized = self._history.window(messages, narrative_state)
+        return TurnContext(
+            history=history,
+            narrative_state=narrative_state,
+            unsummarized=unsummarized,
+            character_name=character_name or "",
+        )
 
     async def stream(
         self,
@@ -47,130 +89,192 @@ class AvatarSessionService:
         user_id: str,
         character_id: str,
         message: str,
+        turn: TurnContext | None = None,
     ) -> AsyncGenerator[str, None]:
-        history = self._read_history(chat_id)
-        narrative_state = self._read_narrative_state(chat_id)
-
-        config = {"configurable": {"thread_id": chat_id}}
-        result = await self._supervisor_graph.ainvoke(
-            {
-                "message": message,
-                "character_id": character_id,
-                "conversation_history": history,
-                "narrative_state": narrative_state,
-            },
-            config=config,
+        if turn is None:
+            turn = await self.load_turn(chat_id, user_id, character_id)
+        asked_at = _now()
+        # Older turns that left the window are summarized while the graph runs.
+        summary_task = (
+            asyncio.create_task(self._history.summarize(turn.narrative_state, turn.unsummarized))
+            if turn.unsummarized
+            else None
         )
 
-        response_text = result.get("response_text", "")
-        citations = result.get("citations", [])
-        gap_flags = result.get("gap_flags", [])
-
-        for token in _chunk_text(response_text, chunk_size=20):
-            yield _sse_frame("token", {"text": token})
-
-        for citation in citations:
-            yield _sse_frame("citation", citation)
+        outcome = _TurnOutcome()
+        probe = (
+            await self._response_cache.lookup(user_id, character_id, message)
+            if self._response_cache is not None
+            else None
+        )
+        if probe is not None and probe.hit is not None:
+            outcome.response_text = probe.hit.response_text
+            outcome.citations = probe.hit.citations
+            outcome.gap_flags = probe.hit.gap_flags
+            for gap in outcome.gap_flags:
+                yield _gap_frame(gap)
+            for citation in outcome.citations:
+                yield _sse_frame("citation", citation)
+            yield _sse_frame("token", {"text": outcome.response_text})
+        else:
+            async for frame in self._run_graph(
+                chat_id, user_id, character_id, message, turn, outcome
+            ):
+                yield frame
+            if probe is not None and outcome.response_text:
+                self._response_cache.store(
+                    probe,
+                    CachedResponse(
+                        response_text=outcome.response_text,
+                        citations=outcome.citations,
+                        gap_flags=outcome.gap_flags,
+                    ),
+                )
 
-        for gap in gap_flags:
-            yield _sse_frame("gap", {
-                "attribute": gap.get("undefined_attribute", gap.get("attribute", "")),
-                "suggestion": gap.get("development_suggestion", gap.get("suggestion", "")),
-            })
+        summary_delta: dict = {}
+        if summary_task is not None:
+            try:
+                summary_delta = await summary_task
+            except Exception:
+                logger.exception("Updating the history summary of chat %s failed", chat_id)
 
-        self._persist_messages(chat_id, user_id, message, response_text, citations, gap_flags)
-        self._persist_narrative_state(
-            chat_id, user_id, result.get("narrative_state_delta", {})
+        self._queue_turn(
+            chat_id,
+            user_id,
+            asked_at,
+            message,
+            outcome.response_text,
+            outcome.citations,
+            outcome.gap_flags,
+            {**turn.narrative_state, **summary_delta, **outcome.narrative_state_delta},
         )
 
         yield _sse_frame("done", {"chat_id": chat_id})
 
-    # ── Supabase reads ────────────────────────────────────────────────────
+    async def _run_graph(
+        self,
+        chat_id: str,
+        user_id: str,
+        character_id: str,
+        message: str,
+        turn: TurnContext,
+        outcome: "_TurnOutcome",
+    ) -> AsyncGenerator[str, None]:
+        config = {"configurable": {"thread_id": chat_id}}
+        streamed = False
+        citations_sent = False
+
+        # "messages" carries LLM tokens from every (sub)graph; only the avatar's
+        # response node is user-facing.  "updates" reports each supervisor node
+        # as it finishes, so citations and gaps go out before the text ends.
+        async for namespace, mode, data in self._supervisor_graph.astream(
+            {
+                "message": message,
+                "character_id": character_id,
+                "character_name": turn.character_name,
+                "user_id": user_id,
+                "conversation_history": turn.history,
+                "narrative_state": turn.narrative_state,
+            },
+            config=config,
+            stream_mode=["messages", "updates"],
+            subgraphs=True,
+        ):
+            if mode == "messages":
+                chunk, metadata = data
+                if metadata.get("langgraph_node") == RESPONSE_NODE and chunk.content:
+                    streamed = True
+                    yield _sse_frame("token", {"text": chunk.content})
+                continue
+            if namespace:
+                continue
+
+            for node, update in data.items():
+                if not update:
+                    continue
+                if node == "call_retrieval_tool":
+                    outcome.citations = retrieval_citations(update.get("retrieval_result") or "")
+                    citations_sent = True
+                    for citation in outcome.citations:
+                        yield _sse_frame("citation", citation)
+                elif node == "call_gap_detection_agent":
+                    outcome.gap_flags = update.get("gap_flags", [])
+                    for gap in outcome.gap_flags:
+                        yield _gap_frame(gap)
+                if "response_text" in update:
+                    outcome.response_text = update["response_text"]
+                    outcome.citations = update.get("citations", outcome.citations)
+                    outcome.narrative_state_delta = update.get("narrative_state_delta", {})
 
-    def _read_history(self, chat_id: str) -> list[dict[str, str]]:
-        result = (
-            self._supabase.table("messages")
-            .select("role, content")
-            .eq("chat_id", chat_id)
-            .order("created_at", desc=False)
-            .limit(HISTORY_WINDOW)
-            .execute()
-        )
-        return result.data or []
-
-    def _read_narrative_state(self, chat_id: str) -> dict:
-        result = (
-            self._supabase.table("narrative_state")
-            .select("state")
-            .eq("chat_id", chat_id)
-            .maybe_single()
-            .execute()
-        )
-        if result and result.data:
-            return result.data.get("state", {})
-        return {}
+        if outcome.response_text and not streamed:
+            yield _sse_frame("token", {"text": outcome.response_text})
+        if not citations_sent:
+            for citation in outcome.citations:
+                yield _sse_frame("citation", citation)
 
-    # ── Supabase writes ───────────────────────────────────────────────────
+    # ── Persistence ───────────────────────────────────────────────────────
 
-    def _persist_messages(
+    def _queue_turn(
         self,
         chat_id: str,
         user_id: str,
+        asked_at: str,
         user_message: str,
         assistant_response: str,
         citations: list[dict],
         gap_flags: list[dict],
+        narrative_state: dict,
     ) -> None:
-        self._supabase.table("messages").insert(
+        # Client-side ids make retried writes idempotent; client-side
+        # timestamps keep turns ordered when a batch is inserted at once.
+        self._persistence.submit(
+            chat_id,
+            user_id,
             [
                 {
+                    "id": str(uuid.uuid4()),
                     "chat_id": chat_id,
                     "user_id": user_id,
                     "role": "user",
                     "content": user_message,
+                    "created_at": asked_at,
                 },
                 {
+                    "id": str(uuid.uuid4()),
                     "chat_id": chat_id,
                     "user_id": user_id,
                     "role": "assistant",
                     "content": assistant_response,
                     "citations": citations or None,
                     "gap_flags": gap_flags or None,
+                    "created_at": _now(),
                 },
-            ]
-        ).execute()
+            ],
+            narrative_state,
+        )
 
-    def _persist_narrative_state(
-        self, chat_id: str, user_id: str, delta: dict
-    ) -> None:
-        current = self._read_narrative_state(chat_id)
-        merged = {**current, **delta}
-        self._supabase.table("narrative_state").upsert(
-            {
-                "chat_id": chat_id,
-                "user_id": user_id,
-                "state": merged,
-                "updated_at": "now()",
-            }
-        ).execute()
 
+class _TurnOutcome:
+    """What a turn produced, filled in while its frames are yielded."""
 
-def _sse_frame(event: str, data: dict) -> str:
-    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    def __init__(self) -> None:
+        self.response_text = ""
+        self.citations: list[dict] = []
+        self.gap_flags: list[dict] = []
+        self.narrative_state_delta: dict = {}
 
 
-def _chunk_text(text: str, chunk_size: int = 20) -> list[str]:
-    """Split text into small chunks to simulate token-by-token streaming.
+def _gap_frame(gap: dict) -> str:
+    return _sse_frame("gap", {
+        "attribute": gap.get("undefined_attribute", gap.get("attribute", "")),
+        "suggestion": gap.get("development_suggestion", gap.get("suggestion", "")),
+    })
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _sse_frame(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-    Splits on spaces only (preserving embedded newlines for paragraph structure)
-    and appends a trailing space to every non-final chunk so that the frontend
-    can concatenate chunks without losing word boundaries.
-    """
-    words = text.split(" ")
-    chunks = []
-    for i in range(0, len(words), chunk_size):
-        chunk = " ".join(words[i : i + chunk_size])
-        if i + chunk_size < len(words):
-            chunk += " "
-        chunks.append(chunk)
-    return chunks
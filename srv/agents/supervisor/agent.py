@@ -1,5 +1,7 @@
+import asyncio
 import json
 import logging
+import re
 
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import END, StateGraph
@@ -32,12 +34,19 @@ class SupervisorAgentBuilder(AgentBuilder):
       classify_intent_node
         -> call_retrieval_tool
         -> [route_after_retrieval]
-            no_context  -> handle_no_context -> END
-            tavily      -> call_tavily_tool  -> [route_after_tavily]
-                              gap_detection -> call_gap_detection_agent -> call_avatar_agent -> END
-                              avatar        -> call_avatar_agent -> END
+            no_context    -> handle_no_context -> END
+            tavily        -> call_tavily_tool -> call_avatar_agent -> END
             gap_detection -> call_gap_detection_agent -> call_avatar_agent -> END
             avatar        -> call_avatar_agent -> END
+
+    ``tavily`` and ``gap_detection`` can both be selected; they then run
+    concurrently and ``call_avatar_agent`` waits for both.
+
+    With ``speculative_tavily`` enabled, a message matching
+    ``external_reference_pattern`` starts the Tavily search alongside
+    retrieval.  If routing then needs Tavily, its result is already in
+    state and ``call_tavily_tool`` is skipped; otherwise the search is
+    cancelled and discarded.
     """
 
     def __init__(
@@ -55,6 +64,7 @@ class SupervisorAgentBuilder(AgentBuilder):
         self.avatar_agent = avatar_agent_builder.compile()
         self.gap_detection_agent = gap_detection_builder.compile()
         self._checkpointer = checkpointer
+        self._external_reference = re.compile(settings.external_reference_pattern, re.IGNORECASE)
 
     def _build(self) -> CompiledStateGraph:
         graph = StateGraph(
@@ -86,15 +96,7 @@ class SupervisorAgentBuilder(AgentBuilder):
 
         graph.add_edge("handle_no_context", END)
 
-        graph.add_conditional_edges(
-            "call_tavily_tool",
-            self._route_after_tavily,
-            {
-                "gap_detection": "call_gap_detection_agent",
-                "avatar": "call_avatar_agent",
-            },
-        )
-
+        graph.add_edge("call_tavily_tool", "call_avatar_agent")
         graph.add_edge("call_gap_detection_agent", "call_avatar_agent")
         graph.add_edge("call_avatar_agent", END)
 
@@ -107,12 +109,41 @@ class SupervisorAgentBuilder(AgentBuilder):
             "intent": "in_character",
             "resolved_characters": [state.get("character_id", "unknown")],
             "gap_flags": [],
+            "tavily_result": None,
             "tavily_used": False,
         }
 
     async def _call_retrieval_tool(self, state: SupervisorState) -> dict:
-        result = self.retrieval_tool.invoke(state["message"])
-        return {"retrieval_result": result}
+        message = state["message"]
+        speculative = None
+        if self.settings.speculative_tavily and self._external_reference.search(message):
+            speculative = asyncio.create_task(self.tavily_tool.ainvoke(message))
+
+        try:
+            result = await self.retrieval_tool.ainvoke(
+                {
+                    "query": message,
+                    "user_id": state.get("user_id", ""),
+                    "character_id": state.get("character_name") or state.get("character_id", ""),
+                    "hints": state.get("taxonomy_hints"),
+                }
+            )
+        except BaseException:
+            if speculative is not None:
+                speculative.cancel()
+            raise
+
+        update: dict = {"retrieval_result": result}
+        if speculative is None:
+            return update
+        if "tavily" in self._route_after_retrieval({**state, **update}):
+            logger.info("Using speculative Tavily result")
+            update["tavily_result"] = await speculative
+            update["tavily_used"] = True
+        else:
+            speculative.cancel()
+            speculative.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return update
 
     async def _handle_no_context(self, state: SupervisorState) -> dict:
         logger.info("No knowledge base context available — returning guidance")
@@ -125,7 +156,7 @@ class SupervisorAgentBuilder(AgentBuilder):
         }
 
     async def _call_tavily_tool(self, state: SupervisorState) -> dict:
-        result = self.tavily_tool.invoke(state["message"])
+        result = await self.tavily_tool.ainvoke(state["message"])
         return {"tavily_result": result, "tavily_used": True}
 
     async def _call_gap_detection_agent(self, state: SupervisorState) -> dict:
@@ -167,28 +198,21 @@ class SupervisorAgentBuilder(AgentBuilder):
         except (json.JSONDecodeError, AttributeError):
             return None
 
-    def _route_after_retrieval(self, state: SupervisorState) -> str:
+    def _route_after_retrieval(self, state: SupervisorState) -> list[str]:
         parsed = self._parse_retrieval(state)
 
         if parsed is None:
-            return "no_context"
+            return ["no_context"]
 
         low_confidence = parsed.get("low_confidence", False)
         has_chunks = bool(parsed.get("ranked_chunks"))
 
         if low_confidence and not has_chunks:
-            return "no_context"
-
-        if parsed.get("external_references"):
-            return "tavily"
+            return ["no_context"]
 
+        routes = []
+        if parsed.get("external_references") and state.get("tavily_result") is None:
+            routes.append("tavily")
         if low_confidence:
-            return "gap_detection"
-
-        return "avatar"
-
-    def _route_after_tavily(self, state: SupervisorState) -> str:
-        parsed = self._parse_retrieval(state)
-        if parsed and parsed.get("low_confidence", False):
-            return "gap_detection"
-        return "avatar"
+            routes.append("gap_detection")
+        return routes or ["avatar"]
@@ -4,5 +4,11 @@ from pydantic_settings import BaseSettings
 class SupervisorAgentSettings(BaseSettings):
     model: str = "gpt-4o"
     history_window: int = 20
+    # opt-in: every speculative start is a billed Tavily request, used or not
+    speculative_tavily: bool = False
+    external_reference_pattern: str = (
+        r"\b(?:story grid|hero'?s journey|save the cat|snowflake method|"
+        r"inspired by|similar to|compared? to|reminds? (?:me|us) of)\b"
+    )
 
     model_config = {"env_prefix": "AGENT_SUPERVISOR_", "env_file": ".env", "extra": "ignore"}
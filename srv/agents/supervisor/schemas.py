@@ -1,9 +1,14 @@
-from typing import Any, TypedDict
+from typing import Any, NotRequired, TypedDict
 
 
 class SupervisorInput(TypedDict):
     message: str
     character_id: str
+    # display name of character_id; retrieval focuses on it when set
+    character_name: NotRequired[str]
+    user_id: str
+    # optional retrieval focus, e.g. {"narrative_function": ["backstory"]}
+    taxonomy_hints: NotRequired[dict[str, list[str]]]
     conversation_history: list[dict[str, str]]
     narrative_state: dict[str, Any]
 
@@ -21,6 +26,9 @@ class SupervisorOutput(TypedDict):
 class SupervisorState(TypedDict):
     message: str
     character_id: str
+    character_name: str
+    user_id: str
+    taxonomy_hints: dict[str, list[str]]
     conversation_history: list[dict[str, str]]
     narrative_state: dict[str, Any]
     # populated by nodes
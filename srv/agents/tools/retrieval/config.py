@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 
@@ -6,6 +8,20 @@ class RetrievalToolSettings(BaseSettings):
     qdrant_api_key: str = ""
     collection_name: str = "lrwr_chunks"
     top_k: int = 10
+    focused_search: bool = True
+    focused_top_k: int = 5
+    focused_min_results: int = 3
+    retrieval_mode: Literal["dense", "hybrid"] = "hybrid"
+    hnsw_ef: int = 0
+    quantization_rescore: bool = True
+    quantization_oversampling: float = 2.0
+    collection_cache_seconds: float = 30.0
     cohere_api_key: str = ""
+    cohere_rerank_model: str = "rerank-v3.5"
+    reranker: Literal["auto", "cohere", "lexical", "none"] = "auto"
+    rerank_top_n: int = 3
+    rerank_skip_margin: float = 0.0
+    result_cache_max_entries: int = 2048
+    result_cache_ttl_seconds: float = 600.0
 
     model_config = {"env_prefix": "TOOL_RETRIEVAL_", "env_file": ".env", "extra": "ignore"}
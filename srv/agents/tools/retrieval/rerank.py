@@ -0,0 +1,100 @@
+"""Rerankers for the retrieval tool.
+
+Any LangChain ``BaseDocumentCompressor`` can rerank retrieval candidates;
+``create_reranker`` picks one from ``RetrievalToolSettings.reranker``:
+
+- ``"cohere"`` — ``CohereRerank`` (network round-trip per query).
+- ``"lexical"`` — ``LexicalReranker``, a CPU-only BM25 scorer over the
+  candidate set.  No model, no network.
+- ``"none"`` — keep the first-stage order.
+- ``"auto"`` — Cohere when an API key is configured, lexical otherwise.
+
+Rerankers are expected to return at most ``top_n`` documents with a
+``relevance_score`` in their metadata, as ``CohereRerank`` does.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+from collections import Counter
+from collections.abc import Sequence
+
+from langchain_cohere import CohereRerank
+from langchain_core.callbacks import Callbacks
+from langchain_core.documents import BaseDocumentCompressor, Document
+
+from agents.tools.retrieval.config import RetrievalToolSettings
+from pipeline.sparse import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class LexicalReranker(BaseDocumentCompressor):
+    """Reorders candidates by BM25 over the query terms.
+
+    Document frequencies are taken from the candidate set itself, so a query
+    term that appears in only a few candidates (a character name, an
+    invented artifact) outweighs one that appears in all of them.  Scores
+    are normalised to ``[0, 1]`` by the score of a candidate containing
+    every query term once; ties keep the first-stage order.
+    """
+
+    top_n: int = 3
+    k1: float = 1.2
+    b: float = 0.75
+
+    def compress_documents(
+        self,
+        documents: Sequence[Document],
+        query: str,
+        callbacks: Callbacks | None = None,
+    ) -> Sequence[Document]:
+        if not documents:
+            return []
+        query_terms = set(tokenize(query))
+        doc_terms = [Counter(tokenize(doc.page_content)) for doc in documents]
+        avg_len = sum(sum(c.values()) for c in doc_terms) / len(doc_terms) or 1.0
+
+        n = len(documents)
+        idf: dict[str, float] = {}
+        for term in query_terms:
+            df = sum(1 for counts in doc_terms if term in counts)
+            idf[term] = math.log(1 + (n - df + 0.5) / (df + 0.5))
+        max_score = sum(idf.values()) or 1.0
+
+        scored: list[tuple[float, Document]] = []
+        for doc, counts in zip(documents, doc_terms):
+            norm = self.k1 * (1 - self.b + self.b * sum(counts.values()) / avg_len)
+            score = sum(
+                idf[term] * counts[term] * (self.k1 + 1) / (counts[term] + norm)
+                for term in query_terms
+                if term in counts
+            )
+            scored.append((score / max_score, doc))
+
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        return [
+            Document(
+                page_content=doc.page_content,
+                metadata={**doc.metadata, "relevance_score": min(score, 1.0)},
+            )
+            for score, doc in scored[: self.top_n]
+        ]
+
+
+def create_reranker(settings: RetrievalToolSettings) -> BaseDocumentCompressor | None:
+    """Build the reranker selected by *settings* (``None`` disables reranking)."""
+    choice = settings.reranker
+    if choice == "auto":
+        choice = "cohere" if settings.cohere_api_key else "lexical"
+    logger.info("Retrieval reranker: %s", choice)
+    if choice == "cohere":
+        return CohereRerank(
+            model=settings.cohere_rerank_model,
+            cohere_api_key=settings.cohere_api_key,
+            top_n=settings.rerank_top_n,
+        )
+    if choice == "lexical":
+        return LexicalReranker(top_n=settings.rerank_top_n)
+    return None
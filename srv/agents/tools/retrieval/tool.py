@@ -1,41 +1,494 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Annotated
 
-from langchain_classic.retrievers.contextual_compression import ContextualCompressionRetriever
-from langchain_cohere import CohereRerank
-from langchain_core.tools import tool
-from langchain_openai import OpenAIEmbeddings
-from langchain_qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient
+from langchain_core.documents import BaseDocumentCompressor, Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.tools import InjectedToolArg, StructuredTool
+from langchain_qdrant import QdrantVectorStore, RetrievalMode
+from qdrant_client import AsyncQdrantClient, QdrantClient, models
 
+from agents.knowledge_base import KnowledgeBaseVersions
 from agents.tools.retrieval.config import RetrievalToolSettings
+from agents.tools.retrieval.rerank import create_reranker
 from agents.tools.retrieval.schemas import RankedChunk, RetrievalResult
+from pipeline.qdrant import locked_client
+from pipeline.sparse import SPARSE_VECTOR_NAME, BM25SparseEmbeddings
+from pipeline.taxonomy import focus_conditions
+from pipeline.tenancy import tenant_filter
 
 logger = logging.getLogger(__name__)
 
+_QUERY_PUNCTUATION = re.compile(r"[^\w\s'-]+")
+
+
+def normalize_query(query: str) -> str:
+    """Case-, whitespace- and punctuation-insensitive form of *query* (cache key)."""
+    return " ".join(_QUERY_PUNCTUATION.sub(" ", query.lower()).split())
+
+
+def search_params(settings: RetrievalToolSettings) -> models.SearchParams | None:
+    """Dense search parameters: HNSW ``ef`` and quantized-search rescoring.
+
+    The quantization part only takes effect on quantized collections, where
+    ``quantization_oversampling`` x ``limit`` candidates are scored on the
+    quantized vectors and rescored with the originals.  ``None`` leaves the
+    server defaults.
+    """
+    if not settings.hnsw_ef and settings.quantization_rescore and (
+        settings.quantization_oversampling == 1.0
+    ):
+        return None
+    return models.SearchParams(
+        hnsw_ef=settings.hnsw_ef or None,
+        quantization=models.QuantizationSearchParams(
+            rescore=settings.quantization_rescore,
+            oversampling=settings.quantization_oversampling,
+        ),
+    )
+
+
+def _decisive(docs: list[Document], margin: float) -> bool:
+    """True if the top first-stage score beats the runner-up by at least *margin*."""
+    if margin <= 0 or len(docs) < 2:
+        return False
+    top, second = (doc.metadata["retrieval_score"] for doc in docs[:2])
+    return top - second >= margin
+
 
 class RetrievalToolBuilder:
-    """Builds a LangChain tool for Qdrant vector search + Cohere rerank."""
+    """Builds a LangChain tool for Qdrant vector search + rerank.
+
+    One instance is shared by every chat session: the reranker, the vector
+    store and the ``retrieval_search`` tool are built once, and the
+    collection lookup is cached (see ``invalidate``).
+
+    In ``"hybrid"`` retrieval mode, dense and BM25 sparse queries run
+    together and are fused with reciprocal rank fusion, so exact names and
+    invented terms are recalled without relying on the reranker.  Collections
+    ingested without sparse vectors are searched dense-only.
+
+    The reranker is any ``BaseDocumentCompressor``; by default one is picked
+    by ``create_reranker`` from ``settings.reranker``.  With
+    ``rerank_skip_margin`` set, reranking is skipped whenever the first-stage
+    score margin between the top two candidates is at least that large
+    (cosine similarity in dense mode, fused RRF score in hybrid mode).
+
+    The tool supports ``ainvoke``.  With an ``async_qdrant_client`` the
+    whole search (query embedding, Qdrant query, rerank) is awaited on the
+    event loop; without one the sync search runs in a worker thread.
+
+    Reranked results are cached per user, normalized query and knowledge-base
+    generation (``versions``, bumped for the writer by the ingestion
+    pipeline after every upsert), bounded by ``result_cache_max_entries`` (LRU) and
+    ``result_cache_ttl_seconds``.  ``cache_metrics`` reports hits and misses.
+
+    Every search only sees the points of its ``user_id`` (a must-filter on
+    the tenant payload index, see ``pipeline.tenancy``); the tool takes it
+    as an injected argument, so the model never chooses whose documents it
+    reads.  A search without a ``user_id`` fails closed: it returns an
+    empty, low-confidence result instead of searching every tenant.
+
+    The active character (``character_id``: its name or a slug of it, see
+    ``pipeline.taxonomy``) and optional taxonomy ``hints`` (e.g.
+    ``{"narrative_function": ["backstory"]}``) are injected the same way.
+    With ``focused_search`` on, they narrow a first search of
+    ``focused_top_k`` candidates to the chunks classified with that
+    character and those labels; if it finds fewer than
+    ``focused_min_results``, the unfocused search tops the candidates up to
+    ``top_k``.
+    """
 
     def __init__(
         self,
         settings: RetrievalToolSettings,
         qdrant_client: QdrantClient,
-        embeddings: OpenAIEmbeddings,
+        embeddings: Embeddings,
+        reranker: BaseDocumentCompressor | None = None,
+        async_qdrant_client: AsyncQdrantClient | None = None,
+        versions: KnowledgeBaseVersions | None = None,
     ) -> None:
         self.settings = settings
-        self.qdrant_client = qdrant_client
+        self.qdrant_client = locked_client(qdrant_client)
+        self.async_qdrant_client = async_qdrant_client
         self.embeddings = embeddings
+        self.reranker = reranker or create_reranker(settings)
+        self._sparse_embeddings = BM25SparseEmbeddings()
+        self._lock = threading.Lock()
+        self._hybrid: bool | None = None
+        self._vectorstore: QdrantVectorStore | None = None
+        self._checked_at: float | None = None
+        self._tool: StructuredTool | None = None
+        self._versions = versions
+        self._results: OrderedDict[tuple, tuple[float, RetrievalResult]] = OrderedDict()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._cache_evictions = 0
+
+    def invalidate(self, collection_name: str | None = None, user_id: str | None = None) -> None:
+        """Forget cached state so the next search re-checks it.
+
+        Called by the ingestion pipeline after it creates or writes to a
+        collection; *collection_name* other than ours is ignored.  With
+        *user_id*, only that writer's cached results are dropped; without
+        it, the collection lookup and every cached result are.
+        """
+        if collection_name not in (None, self.settings.collection_name):
+            return
+        with self._lock:
+            if user_id is not None:
+                for key in [key for key in self._results if key[2] == user_id]:
+                    del self._results[key]
+                return
+            self._hybrid = None
+            self._vectorstore = None
+            self._checked_at = None
+            self._results.clear()
+
+    # ── Collection state ──────────────────────────────────────────────────
+
+    def _cached_collection(self) -> tuple[bool, bool | None]:
+        """Return ``(fresh, hybrid)`` from the cache; *hybrid* is ``None`` if missing.
+
+        The collection lookup is trusted for ``collection_cache_seconds`` (or
+        until ``invalidate``), so warm searches skip the extra round-trip.
+        """
+        with self._lock:
+            fresh = (
+                self._checked_at is not None
+                and time.monotonic() - self._checked_at < self.settings.collection_cache_seconds
+            )
+            return fresh, self._hybrid
+
+    def _remember_collection(self, collection: models.CollectionInfo | None) -> bool | None:
+        hybrid = None
+        if collection is not None:
+            hybrid = self.settings.retrieval_mode == "hybrid" and SPARSE_VECTOR_NAME in (
+                collection.config.params.sparse_vectors or {}
+            )
+        with self._lock:
+            self._hybrid = hybrid
+            self._vectorstore = None
+            self._checked_at = time.monotonic()
+        return hybrid
+
+    def _collection_mode(self) -> bool | None:
+        fresh, hybrid = self._cached_collection()
+        if fresh:
+            return hybrid
+        try:
+            collection = self.qdrant_client.get_collection(self.settings.collection_name)
+        except Exception:
+            collection = None
+        return self._remember_collection(collection)
+
+    async def _acollection_mode(self) -> bool | None:
+        fresh, hybrid = self._cached_collection()
+        if fresh:
+            return hybrid
+        try:
+            collection = await self.async_qdrant_client.get_collection(
+                self.settings.collection_name
+            )
+        except Exception:
+            collection = None
+        return self._remember_collection(collection)
+
+    def _get_vectorstore(self, hybrid: bool) -> QdrantVectorStore:
+        with self._lock:
+            if self._vectorstore is None:
+                self._vectorstore = QdrantVectorStore(
+                    client=self.qdrant_client,
+                    collection_name=self.settings.collection_name,
+                    embedding=self.embeddings,
+                    sparse_embedding=self._sparse_embeddings if hybrid else None,
+                    retrieval_mode=RetrievalMode.HYBRID if hybrid else RetrievalMode.DENSE,
+                    sparse_vector_name=SPARSE_VECTOR_NAME,
+                    validate_collection_config=False,
+                )
+            return self._vectorstore
+
+    def _empty(self) -> RetrievalResult:
+        logger.warning(
+            "Collection %r does not exist — returning empty result",
+            self.settings.collection_name,
+        )
+        return RetrievalResult(ranked_chunks=[], low_confidence=True)
+
+    def _unscoped(self) -> RetrievalResult:
+        logger.warning("Retrieval without a user_id — returning empty result")
+        return RetrievalResult(ranked_chunks=[], low_confidence=True)
+
+    # ── Search ────────────────────────────────────────────────────────────
+
+    def search(
+        self,
+        query: str,
+        user_id: str = "",
+        character_id: str = "",
+        hints: dict[str, list[str]] | None = None,
+    ) -> RetrievalResult:
+        """Retrieve, rerank and package the passages for *query*.
+
+        Only *user_id*'s passages are searched; without a *user_id* the
+        result is empty.  With *character_id* or taxonomy *hints*, the
+        matching passages are searched first (see ``_filters``).
+        """
+        if not user_id:
+            return self._unscoped()
+        key = self._result_key(query, user_id, character_id, hints)
+        cached = self._cached_result(key)
+        if cached is not None:
+            return cached
+        result = self._search(query, user_id, character_id, hints)
+        self._remember_result(key, result)
+        return result
+
+    async def asearch(
+        self,
+        query: str,
+        user_id: str = "",
+        character_id: str = "",
+        hints: dict[str, list[str]] | None = None,
+    ) -> RetrievalResult:
+        """Async ``search``; falls back to a worker thread without an async client."""
+        if not user_id:
+            return self._unscoped()
+        key = self._result_key(query, user_id, character_id, hints)
+        cached = self._cached_result(key)
+        if cached is not None:
+            return cached
+        if self.async_qdrant_client is None:
+            result = await asyncio.to_thread(
+                self._search, query, user_id, character_id, hints
+            )
+        else:
+            result = await self._asearch(query, user_id, character_id, hints)
+        self._remember_result(key, result)
+        return result
 
-    def build(self):
-        settings = self.settings
-        qdrant = self.qdrant_client
-        embeddings = self.embeddings
+    def _filters(
+        self, user_id: str, character_id: str, hints: dict[str, list[str]] | None
+    ) -> tuple[models.Filter | None, models.Filter]:
+        """Return ``(focused, broad)`` first-stage filters.
 
-        @tool
-        def retrieval_search(query: str) -> str:
+        *broad* is the tenant filter of *user_id*.  *focused*
+        adds the character / taxonomy conditions of ``pipeline.taxonomy``;
+        it is ``None`` when there is nothing to focus on or
+        ``focused_search`` is off.
+        """
+        broad = tenant_filter(user_id)
+        conditions = focus_conditions(character_id, hints) if self.settings.focused_search else []
+        if not conditions:
+            return None, broad
+        return models.Filter(must=[*broad.must, *conditions]), broad
+
+    def _needs_broad(self, focused: models.Filter | None, docs: list[Document]) -> bool:
+        return focused is None or len(docs) < self.settings.focused_min_results
+
+    def _search(
+        self,
+        query: str,
+        user_id: str = "",
+        character_id: str = "",
+        hints: dict[str, list[str]] | None = None,
+    ) -> RetrievalResult:
+        hybrid = self._collection_mode()
+        if hybrid is None:
+            return self._empty()
+
+        vectorstore = self._get_vectorstore(hybrid)
+        params = search_params(self.settings)
+
+        def first_stage(query_filter: models.Filter, k: int) -> list[Document]:
+            docs = []
+            for doc, score in vectorstore.similarity_search_with_score(
+                query, k=k, filter=query_filter, search_params=params
+            ):
+                doc.metadata["retrieval_score"] = score
+                docs.append(doc)
+            return docs
+
+        focused, broad = self._filters(user_id, character_id, hints)
+        docs = first_stage(focused, self.settings.focused_top_k) if focused else []
+        if self._needs_broad(focused, docs):
+            docs = self._merge(docs, first_stage(broad, self.settings.top_k))
+
+        if self._skip_rerank(docs):
+            return self._package(docs[: self.settings.rerank_top_n])
+        return self._package(list(self.reranker.compress_documents(docs, query)))
+
+    async def _asearch(
+        self,
+        query: str,
+        user_id: str = "",
+        character_id: str = "",
+        hints: dict[str, list[str]] | None = None,
+    ) -> RetrievalResult:
+        hybrid = await self._acollection_mode()
+        if hybrid is None:
+            return self._empty()
+
+        dense = await self.embeddings.aembed_query(query)
+        sparse = self._sparse_embeddings.embed_query(query) if hybrid else None
+        params = search_params(self.settings)
+
+        async def first_stage(query_filter: models.Filter, k: int) -> list[Document]:
+            if sparse is not None:
+                response = await self.async_qdrant_client.query_points(
+                    collection_name=self.settings.collection_name,
+                    prefetch=[
+                        models.Prefetch(
+                            query=dense, filter=query_filter, params=params, limit=k
+                        ),
+                        models.Prefetch(
+                            query=models.SparseVector(
+                                indices=sparse.indices, values=sparse.values
+                            ),
+                            using=SPARSE_VECTOR_NAME,
+                            filter=query_filter,
+                            limit=k,
+                        ),
+                    ],
+                    query=models.FusionQuery(fusion=models.Fusion.RRF),
+                    query_filter=query_filter,
+                    limit=k,
+                    with_payload=True,
+                )
+            else:
+                response = await self.async_qdrant_client.query_points(
+                    collection_name=self.settings.collection_name,
+                    query=dense,
+                    query_filter=query_filter,
+                    search_params=params,
+                    limit=k,
+                    with_payload=True,
+                )
+            return [
+                Document(
+                    page_content=(point.payload or {}).get("page_content", ""),
+                    metadata={
+                        **((point.payload or {}).get("metadata") or {}),
+                        "_id": point.id,
+                        "retrieval_score": point.score,
+                    },
+                )
+                for point in response.points
+            ]
+
+        focused, broad = self._filters(user_id, character_id, hints)
+        docs = await first_stage(focused, self.settings.focused_top_k) if focused else []
+        if self._needs_broad(focused, docs):
+            docs = self._merge(docs, await first_stage(broad, self.settings.top_k))
+
+        if self._skip_rerank(docs):
+            return self._package(docs[: self.settings.rerank_top_n])
+        return self._package(list(await self.reranker.acompress_documents(docs, query)))
+
+    def _merge(self, focused: list[Document], broad: list[Document]) -> list[Document]:
+        """Focused hits first, topped up with unseen broad hits to ``top_k``."""
+        seen = {doc.metadata.get("_id") for doc in focused}
+        merged = focused + [doc for doc in broad if doc.metadata.get("_id") not in seen]
+        return merged[: max(self.settings.top_k, len(focused))]
+
+    # ── Result cache ──────────────────────────────────────────────────────
+
+    def _result_key(
+        self,
+        query: str,
+        user_id: str = "",
+        character_id: str = "",
+        hints: dict[str, list[str]] | None = None,
+    ) -> tuple:
+        name = self.settings.collection_name
+        generation = self._versions.current(name, user_id) if self._versions is not None else 0
+        hint_items = sorted((hints or {}).items())
+        focus = (character_id, tuple((field, tuple(sorted(vals))) for field, vals in hint_items))
+        return (name, generation, user_id, focus, normalize_query(query))
+
+    def _cached_result(self, key: tuple) -> RetrievalResult | None:
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None and (
+                time.monotonic() - entry[0] < self.settings.result_cache_ttl_seconds
+            ):
+                self._results.move_to_end(key)
+                self._cache_hits += 1
+                return entry[1].model_copy(deep=True)
+            if entry is not None:
+                del self._results[key]
+            self._cache_misses += 1
+            return None
+
+    def _remember_result(self, key: tuple, result: RetrievalResult) -> None:
+        # A missing collection is not cached: its creation may not bump the
+        # generation in processes without a ``versions`` registry.
+        if result.low_confidence and not result.ranked_chunks:
+            return
+        if self.settings.result_cache_max_entries <= 0:
+            return
+        with self._lock:
+            self._results[key] = (time.monotonic(), result.model_copy(deep=True))
+            self._results.move_to_end(key)
+            while len(self._results) > self.settings.result_cache_max_entries:
+                self._results.popitem(last=False)
+                self._cache_evictions += 1
+
+    def cache_metrics(self) -> dict[str, int]:
+        """Hit/miss counters and size of the retrieval result cache."""
+        with self._lock:
+            return {
+                "entries": len(self._results),
+                "max_entries": self.settings.result_cache_max_entries,
+                "hits": self._cache_hits,
+                "misses": self._cache_misses,
+                "evictions": self._cache_evictions,
+            }
+
+    def _skip_rerank(self, docs: list[Document]) -> bool:
+        return self.reranker is None or _decisive(docs, self.settings.rerank_skip_margin)
+
+    @staticmethod
+    def _package(docs: list[Document]) -> RetrievalResult:
+        all_external_refs: list[str] = []
+        for doc in docs:
+            doc.metadata.setdefault("relevance_score", doc.metadata.get("retrieval_score", 1.0))
+            refs = doc.metadata.get("external_references", [])
+            if isinstance(refs, list):
+                all_external_refs.extend(refs)
+
+        return RetrievalResult(
+            ranked_chunks=[
+                RankedChunk(
+                    text=doc.page_content,
+                    source_document=doc.metadata.get("source", "unknown"),
+                    chunk_index=i,
+                    score=doc.metadata["relevance_score"],
+                )
+                for i, doc in enumerate(docs)
+            ],
+            low_confidence=len(docs) == 0,
+            external_references=list(set(all_external_refs)),
+        )
+
+    def build(self) -> StructuredTool:
+        """Return the ``retrieval_search`` tool (built once, then reused)."""
+        if self._tool is not None:
+            return self._tool
+
+        def retrieval_search(
+            query: str,
+            user_id: Annotated[str, InjectedToolArg] = "",
+            character_id: Annotated[str, InjectedToolArg] = "",
+            hints: Annotated[dict[str, list[str]] | None, InjectedToolArg] = None,
+        ) -> str:
             """Search the writer's uploaded story documents for passages relevant to a query.
 
             Use this tool for any question about the writer's own characters, scenes,
@@ -63,65 +516,26 @@ class RetrievalToolBuilder:
             Returns:
                 JSON string containing a RetrievalResult with:
                 - ranked_chunks: list of text passages with source document, chunk index,
-                  and relevance score (highest first, post Cohere rerank)
+                  and relevance score (highest first, post rerank)
                 - low_confidence: true if no relevant passages were found (triggers gap
                   detection)
                 - external_references: named characters or works not from the author's
                   material
             """
-            try:
-                collections = qdrant.get_collections().collections
-                collection_exists = any(c.name == settings.collection_name for c in collections)
-            except Exception:
-                collection_exists = False
-
-            if not collection_exists:
-                logger.warning(
-                    "Collection %r does not exist — returning empty result",
-                    settings.collection_name,
-                )
-                empty = RetrievalResult(ranked_chunks=[], low_confidence=True)
-                return json.dumps(empty.model_dump())
-
-            vectorstore = QdrantVectorStore(
-                client=qdrant,
-                collection_name=settings.collection_name,
-                embedding=embeddings,
-            )
-            base_retriever = vectorstore.as_retriever(
-                search_kwargs={"k": settings.top_k},
-            )
+            return json.dumps(self.search(query, user_id, character_id, hints).model_dump())
 
-            reranker = CohereRerank(
-                model="rerank-v3.5",
-                cohere_api_key=settings.cohere_api_key,
-            )
-            retriever = ContextualCompressionRetriever(
-                base_compressor=reranker,
-                base_retriever=base_retriever,
-            )
-
-            docs = retriever.invoke(query)
-
-            all_external_refs: list[str] = []
-            for doc in docs:
-                refs = doc.metadata.get("external_references", [])
-                if isinstance(refs, list):
-                    all_external_refs.extend(refs)
-
-            result = RetrievalResult(
-                ranked_chunks=[
-                    RankedChunk(
-                        text=doc.page_content,
-                        source_document=doc.metadata.get("source", "unknown"),
-                        chunk_index=i,
-                        score=doc.metadata.get("relevance_score", 1.0),
-                    )
-                    for i, doc in enumerate(docs)
-                ],
-                low_confidence=len(docs) == 0,
-                external_references=list(set(all_external_refs)),
-            )
+        async def aretrieval_search(
+            query: str,
+            user_id: Annotated[str, InjectedToolArg] = "",
+            character_id: Annotated[str, InjectedToolArg] = "",
+            hints: Annotated[dict[str, list[str]] | None, InjectedToolArg] = None,
+        ) -> str:
+            result = await self.asearch(query, user_id, character_id, hints)
             return json.dumps(result.model_dump())
 
-        return retrieval_search
+        self._tool = StructuredTool.from_function(
+            func=retrieval_search,
+            coroutine=aretrieval_search,
+            name="retrieval_search",
+        )
+        return self._tool
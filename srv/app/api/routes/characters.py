@@ -4,7 +4,7 @@ from dependency_injector.wiring import Provide, inject
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 
-from agents.session.service import AvatarSessionService
+from agents.session.repository import ChatRepository
 from app.api.deps import get_current_user_id
 from app.containers import ApplicationContainer
 
@@ -23,19 +23,9 @@ class CharacterCreate(BaseModel):
 @inject
 async def list_characters(
     user_id: str = Depends(get_current_user_id),
-    session_service: AvatarSessionService = Depends(
-        Provide[ApplicationContainer.avatar_session_service]
-    ),
+    repository: ChatRepository = Depends(Provide[ApplicationContainer.chat_repository]),
 ) -> list[dict]:
-    client = session_service.get_supabase_client()
-    result = (
-        client.table("characters")
-        .select("id, name, initials, color, created_at")
-        .eq("user_id", user_id)
-        .order("created_at", desc=False)
-        .execute()
-    )
-    return result.data
+    return await repository.list_characters(user_id)
 
 
 @router.post("/characters", status_code=201)
@@ -43,24 +33,14 @@ async def list_characters(
 async def create_character(
     body: CharacterCreate,
     user_id: str = Depends(get_current_user_id),
-    session_service: AvatarSessionService = Depends(
-        Provide[ApplicationContainer.avatar_session_service]
-    ),
+    repository: ChatRepository = Depends(Provide[ApplicationContainer.chat_repository]),
 ) -> dict:
-    client = session_service.get_supabase_client()
-    result = (
-        client.table("characters")
-        .insert(
-            {
-                "user_id": user_id,
-                "name": body.name,
-                "initials": body.initials,
-                "color": body.color,
-            }
-        )
-        .execute()
+    return await repository.create_character(
+        user_id=user_id,
+        name=body.name,
+        initials=body.initials,
+        color=body.color,
     )
-    return result.data[0]
 
 
 @router.delete("/characters/{character_id}", status_code=204)
@@ -68,18 +48,8 @@ async def create_character(
 async def delete_character(
     character_id: str,
     user_id: str = Depends(get_current_user_id),
-    session_service: AvatarSessionService = Depends(
-        Provide[ApplicationContainer.avatar_session_service]
-    ),
+    repository: ChatRepository = Depends(Provide[ApplicationContainer.chat_repository]),
 ):
-    client = session_service.get_supabase_client()
-    result = (
-        client.table("characters")
-        .delete()
-        .eq("id", character_id)
-        .eq("user_id", user_id)
-        .execute()
-    )
-    if not result.data:
+    if not await repository.delete_character(character_id, user_id):
         raise HTTPException(status_code=403, detail="Character not found or access denied")
     return None
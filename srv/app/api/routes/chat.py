@@ -25,9 +25,10 @@ async def chat_stream(
         Provide[ApplicationContainer.avatar_session_service]
     ),
 ) -> StreamingResponse:
-    await session_service.assert_chat_owner(
+    turn = await session_service.load_turn(
         chat_id=body.chat_id,
         user_id=user_id,
+        character_id=body.character_id,
     )
 
     return StreamingResponse(
@@ -36,6 +37,7 @@ async def chat_stream(
             user_id=user_id,
             character_id=body.character_id,
             message=body.message,
+            turn=turn,
         ),
         media_type="text/event-stream",
         headers={
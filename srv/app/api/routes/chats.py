@@ -5,7 +5,7 @@ from dependency_injector.wiring import Provide, inject
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 
-from agents.session.service import AvatarSessionService
+from agents.session.repository import ChatRepository
 from app.api.deps import get_current_user_id
 from app.containers import ApplicationContainer
 
@@ -28,19 +28,9 @@ class ChatUpdate(BaseModel):
 @inject
 async def list_chats(
     user_id: str = Depends(get_current_user_id),
-    session_service: AvatarSessionService = Depends(
-        Provide[ApplicationContainer.avatar_session_service]
-    ),
+    repository: ChatRepository = Depends(Provide[ApplicationContainer.chat_repository]),
 ) -> list[dict]:
-    client = session_service.get_supabase_client()
-    result = (
-        client.table("chats")
-        .select("id, character_id, title, created_at, updated_at")
-        .eq("user_id", user_id)
-        .order("updated_at", desc=True)
-        .execute()
-    )
-    return result.data
+    return await repository.list_chats(user_id)
 
 
 @router.post("/chats", status_code=201)
@@ -48,24 +38,14 @@ async def list_chats(
 async def create_chat(
     body: ChatCreate,
     user_id: str = Depends(get_current_user_id),
-    session_service: AvatarSessionService = Depends(
-        Provide[ApplicationContainer.avatar_session_service]
-    ),
+    repository: ChatRepository = Depends(Provide[ApplicationContainer.chat_repository]),
 ) -> dict:
-    client = session_service.get_supabase_client()
-    result = (
-        client.table("chats")
-        .insert(
-            {
-                "id": body.chat_id,
-                "user_id": user_id,
-                "character_id": body.character_id,
-                "title": body.title,
-            }
-        )
-        .execute()
+    return await repository.create_chat(
+        chat_id=body.chat_id,
+        user_id=user_id,
+        character_id=body.character_id,
+        title=body.title,
     )
-    return result.data[0]
 
 
 @router.patch("/chats/{chat_id}")
@@ -74,21 +54,12 @@ async def rename_chat(
     chat_id: str,
     body: ChatUpdate,
     user_id: str = Depends(get_current_user_id),
-    session_service: AvatarSessionService = Depends(
-        Provide[ApplicationContainer.avatar_session_service]
-    ),
+    repository: ChatRepository = Depends(Provide[ApplicationContainer.chat_repository]),
 ) -> dict:
-    client = session_service.get_supabase_client()
-    result = (
-        client.table("chats")
-        .update({"title": body.title})
-        .eq("id", chat_id)
-        .eq("user_id", user_id)
-        .execute()
-    )
-    if not result.data:
+    chat = await repository.rename_chat(chat_id, user_id, body.title)
+    if chat is None:
         raise HTTPException(status_code=403, detail="Chat not found or access denied")
-    return result.data[0]
+    return chat
 
 
 @router.delete("/chats/{chat_id}", status_code=204)
@@ -96,18 +67,8 @@ async def rename_chat(
 async def delete_chat(
     chat_id: str,
     user_id: str = Depends(get_current_user_id),
-    session_service: AvatarSessionService = Depends(
-        Provide[ApplicationContainer.avatar_session_service]
-    ),
+    repository: ChatRepository = Depends(Provide[ApplicationContainer.chat_repository]),
 ):
-    client = session_service.get_supabase_client()
-    result = (
-        client.table("chats")
-        .delete()
-        .eq("id", chat_id)
-        .eq("user_id", user_id)
-        .execute()
-    )
-    if not result.data:
+    if not await repository.delete_chat(chat_id, user_id):
         raise HTTPException(status_code=403, detail="Chat not found or access denied")
     return None
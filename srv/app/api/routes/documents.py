@@ -157,7 +157,7 @@ async def extract_knowledge(
         try:
             lc_doc = Document(
                 page_content=doc.content,
-                metadata={"source": doc.filename},
+                metadata={"source": doc.filename, "user_id": user_id, "document_id": document_id},
             )
 
             async def _on_progress(
@@ -1,4 +1,10 @@
-from fastapi import APIRouter
+from dependency_injector.wiring import Provide, inject
+from fastapi import APIRouter, Depends
+
+from agents.llm import LLMClientRegistry
+from agents.session.persistence import PersistenceQueue
+from agents.tools.retrieval.tool import RetrievalToolBuilder
+from app.containers import ApplicationContainer
 
 router = APIRouter()
 
@@ -6,3 +12,27 @@ router = APIRouter()
 @router.get("/health")
 async def health():
     return {"status": "ok"}
+
+
+@router.get("/health/llm-pool")
+@inject
+async def llm_pool(
+    registry: LLMClientRegistry = Depends(Provide[ApplicationContainer.llm_registry]),
+):
+    return registry.metrics()
+
+
+@router.get("/health/persistence")
+@inject
+async def persistence(
+    queue: PersistenceQueue = Depends(Provide[ApplicationContainer.persistence_queue]),
+):
+    return queue.metrics()
+
+
+@router.get("/health/retrieval-cache")
+@inject
+async def retrieval_cache(
+    builder: RetrievalToolBuilder = Depends(Provide[ApplicationContainer.retrieval_tool_builder]),
+):
+    return builder.cache_metrics()
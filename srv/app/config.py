@@ -7,6 +7,17 @@ class AppSettings(BaseSettings):
     supabase_service_key: str
     openai_api_key: str = ""
     llm_model: str = "gpt-4o"
+    llm_max_connections: int = 100
+    llm_max_keepalive_connections: int = 20
+    llm_keepalive_expiry: float = 30.0
+    llm_timeout: float = 60.0
     use_supabase_storage: bool = False
+    persistence_batch_size: int = 200
+    persistence_flush_interval: float = 0.05
+    persistence_journal_path: str = ""
+    persistence_max_attempts: int = 8
+    persistence_dead_letter_path: str = ""
+    persistence_wait_timeout: float = 5.0
+    persistence_shutdown_timeout: float = 10.0
 
     model_config = {"env_prefix": "APP_", "env_file": ".env", "extra": "ignore"}
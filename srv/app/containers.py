@@ -1,3 +1,5 @@
+from pathlib import Path
+
 from dependency_injector import containers, providers
 from langchain_openai import OpenAIEmbeddings
 from langgraph.checkpoint.memory import MemorySaver
@@ -7,6 +9,13 @@ from agents.avatar.agent import AvatarAgentBuilder
 from agents.avatar.config import AvatarAgentSettings
 from agents.gap_detection.agent import GapDetectionAgentBuilder
 from agents.gap_detection.config import GapDetectionAgentSettings
+from agents.knowledge_base import KnowledgeBaseVersions
+from agents.llm import LLMClientRegistry
+from agents.session.config import SessionSettings
+from agents.session.history import HistoryManager
+from agents.session.persistence import PersistenceQueue
+from agents.session.repository import SupabaseChatRepository
+from agents.session.response_cache import SemanticResponseCache
 from agents.session.service import AvatarSessionService
 from agents.supervisor.agent import SupervisorAgentBuilder
 from agents.supervisor.config import SupervisorAgentSettings
@@ -17,7 +26,14 @@ from agents.tools.tavily.tool import TavilyToolBuilder
 from app.config import AppSettings
 from app.services.document_store import InMemoryDocumentStore, SupabaseDocumentStore
 from app.services.progress import InMemoryProgressNotifier, SupabaseProgressNotifier
+from pipeline.classification_cache import (
+    InMemoryClassificationCache,
+    PostgresClassificationCache,
+    SqliteClassificationCache,
+)
 from pipeline.config import IngestionPipelineSettings
+from pipeline.embeddings import CachedEmbeddings, MmapEmbeddingStore
+from pipeline.qdrant import LockedQdrantClient
 from pipeline.runner import LocalPipelineRunner, ModalPipelineRunner
 from pipeline.service import IngestionPipelineService
 
@@ -31,6 +47,36 @@ def _create_pipeline_runner(
     return LocalPipelineRunner(pipeline=pipeline)
 
 
+def _create_embeddings(
+    model: str,
+    api_key: str,
+    cache_max_entries: int,
+    cache_dir: str,
+):
+    store = MmapEmbeddingStore(Path(cache_dir) / model) if cache_dir else None
+    return CachedEmbeddings(
+        OpenAIEmbeddings(model=model, api_key=api_key),
+        namespace=model,
+        max_entries=cache_max_entries,
+        store=store,
+    )
+
+
+def _create_classification_cache(
+    backend: str,
+    path: str,
+    dsn: str,
+    max_entries: int,
+):
+    if backend == "sqlite":
+        return SqliteClassificationCache(path, max_entries=max_entries)
+    if backend == "postgres":
+        return PostgresClassificationCache(dsn, max_entries=max_entries)
+    if backend == "memory":
+        return InMemoryClassificationCache(max_entries=max_entries)
+    return None
+
+
 def _create_document_store(
     use_supabase: bool,
     supabase_url: str,
@@ -51,6 +97,35 @@ def _create_progress_notifier(
     return InMemoryProgressNotifier()
 
 
+def _create_response_cache(
+    settings: SessionSettings,
+    embeddings,
+    versions: KnowledgeBaseVersions,
+    collection_name: str,
+):
+    if not settings.response_cache_enabled:
+        return None
+    return SemanticResponseCache(
+        embeddings=embeddings,
+        versions=versions,
+        collection_name=collection_name,
+        similarity_threshold=settings.response_cache_similarity,
+        ttl_seconds=settings.response_cache_ttl_seconds,
+        max_entries=settings.response_cache_max_entries,
+    )
+
+
+def _collection_changed_hook(
+    versions: KnowledgeBaseVersions,
+    retrieval_tool_builder: RetrievalToolBuilder,
+):
+    def collection_changed(collection_name: str, user_id: str | None = None) -> None:
+        versions.bump(collection_name, user_id)
+        retrieval_tool_builder.invalidate(collection_name, user_id)
+
+    return collection_changed
+
+
 class ApplicationContainer(containers.DeclarativeContainer):
     wiring_config = containers.WiringConfiguration(
         modules=[
@@ -58,6 +133,7 @@ class ApplicationContainer(containers.DeclarativeContainer):
             "app.api.routes.chat",
             "app.api.routes.chats",
             "app.api.routes.documents",
+            "app.api.routes.health",
         ]
     )
 
@@ -68,35 +144,69 @@ class ApplicationContainer(containers.DeclarativeContainer):
     avatar_settings = providers.Singleton(AvatarAgentSettings)
     gap_detection_settings = providers.Singleton(GapDetectionAgentSettings)
     supervisor_settings = providers.Singleton(SupervisorAgentSettings)
+    session_settings = providers.Singleton(SessionSettings)
     ingestion_settings = providers.Singleton(IngestionPipelineSettings)
 
     # ── Shared singletons ─────────────────────────────────────────────────
-    qdrant_client = providers.Singleton(QdrantClient, location=":memory:")
+    # One lock-guarded client shared by ingestion and retrieval threads.
+    qdrant_client = providers.Singleton(
+        LockedQdrantClient, client=providers.Singleton(QdrantClient, location=":memory:")
+    )
+    knowledge_base_versions = providers.Singleton(KnowledgeBaseVersions)
+    llm_registry = providers.Singleton(
+        LLMClientRegistry,
+        api_key=app_settings.provided.openai_api_key,
+        max_connections=app_settings.provided.llm_max_connections,
+        max_keepalive_connections=app_settings.provided.llm_max_keepalive_connections,
+        keepalive_expiry=app_settings.provided.llm_keepalive_expiry,
+        timeout=app_settings.provided.llm_timeout,
+    )
     embeddings = providers.Singleton(
-        OpenAIEmbeddings,
+        _create_embeddings,
         model=ingestion_settings.provided.embedding_model,
         api_key=app_settings.provided.openai_api_key,
+        cache_max_entries=ingestion_settings.provided.embedding_cache_max_entries,
+        cache_dir=ingestion_settings.provided.embedding_cache_dir,
     )
 
-    # ── Tool builders (Factory — stateless, new per request) ──────────────
-    retrieval_tool_builder = providers.Factory(
+    # ── Tool builders ─────────────────────────────────────────────────────
+    # Retrieval is a Singleton: it holds the reranker client, the vector
+    # store, the cached collection state and the result cache shared by
+    # every session.
+    retrieval_tool_builder = providers.Singleton(
         RetrievalToolBuilder,
         settings=retrieval_tool_settings,
         qdrant_client=qdrant_client,
         embeddings=embeddings,
+        versions=knowledge_base_versions,
     )
-    tavily_tool_builder = providers.Factory(
+    tavily_tool_builder = providers.Singleton(
         TavilyToolBuilder,
         settings=tavily_tool_settings,
     )
 
     # ── Ingestion pipeline ────────────────────────────────────────────────
+    classification_cache = providers.Singleton(
+        _create_classification_cache,
+        backend=ingestion_settings.provided.classification_cache_backend,
+        path=ingestion_settings.provided.classification_cache_path,
+        dsn=ingestion_settings.provided.classification_cache_dsn,
+        max_entries=ingestion_settings.provided.classification_cache_max_entries,
+    )
+
     ingestion_pipeline = providers.Factory(
         IngestionPipelineService,
         settings=ingestion_settings,
         qdrant_client=qdrant_client,
         embeddings=embeddings,
         openai_api_key=app_settings.provided.openai_api_key,
+        classification_cache=classification_cache,
+        on_collection_changed=providers.Singleton(
+            _collection_changed_hook,
+            versions=knowledge_base_versions,
+            retrieval_tool_builder=retrieval_tool_builder,
+        ),
+        llm_registry=llm_registry,
     )
 
     ingestion_runner = providers.Factory(
@@ -120,13 +230,14 @@ class ApplicationContainer(containers.DeclarativeContainer):
         supabase_service_key=app_settings.provided.supabase_service_key,
     )
 
-    # ── Sub-agent builders (Factory — produce CompiledStateGraphs) ────────
-    avatar_agent_builder = providers.Factory(
+    # ── Sub-agent builders (Singleton — each compiles its graph once) ─────
+    avatar_agent_builder = providers.Singleton(
         AvatarAgentBuilder,
         settings=avatar_settings,
         openai_api_key=app_settings.provided.openai_api_key,
+        llm_registry=llm_registry,
     )
-    gap_detection_builder = providers.Factory(
+    gap_detection_builder = providers.Singleton(
         GapDetectionAgentBuilder,
         settings=gap_detection_settings,
     )
@@ -134,8 +245,10 @@ class ApplicationContainer(containers.DeclarativeContainer):
     # ── Memory (Singleton — swap to PostgresSaver for Supabase persistence) ─
     checkpointer = providers.Singleton(MemorySaver)
 
-    # ── Supervisor (Factory) — receives all tool and sub-agent builders ───
-    supervisor_agent = providers.Factory(
+    # ── Supervisor (Singleton) — receives all tool and sub-agent builders ─
+    # Compiled graphs hold no per-request state: each turn's data travels
+    # through graph inputs and the thread_id config only.
+    supervisor_agent = providers.Singleton(
         SupervisorAgentBuilder,
         settings=supervisor_settings,
         retrieval_tool_builder=retrieval_tool_builder,
@@ -145,10 +258,46 @@ class ApplicationContainer(containers.DeclarativeContainer):
         checkpointer=checkpointer,
     )
 
-    # ── Session service (Factory) ─────────────────────────────────────────
-    avatar_session_service = providers.Factory(
-        AvatarSessionService,
-        supervisor_builder=supervisor_agent,
+    # ── Chat repository (Singleton — one pooled async Supabase client) ────
+    chat_repository = providers.Singleton(
+        SupabaseChatRepository,
         supabase_url=app_settings.provided.supabase_url,
         supabase_service_key=app_settings.provided.supabase_service_key,
     )
+
+    # ── Write-behind turn persistence (started/flushed in the lifespan) ───
+    persistence_queue = providers.Singleton(
+        PersistenceQueue,
+        repository=chat_repository,
+        batch_size=app_settings.provided.persistence_batch_size,
+        flush_interval=app_settings.provided.persistence_flush_interval,
+        journal_path=app_settings.provided.persistence_journal_path,
+        max_attempts=app_settings.provided.persistence_max_attempts,
+        dead_letter_path=app_settings.provided.persistence_dead_letter_path,
+        wait_timeout=app_settings.provided.persistence_wait_timeout,
+    )
+
+    history_manager = providers.Singleton(
+        HistoryManager,
+        settings=session_settings,
+        openai_api_key=app_settings.provided.openai_api_key,
+        llm_registry=llm_registry,
+    )
+
+    response_cache = providers.Singleton(
+        _create_response_cache,
+        settings=session_settings,
+        embeddings=embeddings,
+        versions=knowledge_base_versions,
+        collection_name=retrieval_tool_settings.provided.collection_name,
+    )
+
+    # ── Session service (Singleton — warmed in the app lifespan) ──────────
+    avatar_session_service = providers.Singleton(
+        AvatarSessionService,
+        supervisor_builder=supervisor_agent,
+        repository=chat_repository,
+        persistence=persistence_queue,
+        history=history_manager,
+        response_cache=response_cache,
+    )
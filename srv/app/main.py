@@ -1,3 +1,4 @@
+import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -5,10 +6,27 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.containers import ApplicationContainer
 
+logger = logging.getLogger(__name__)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Build the session service (and with it the supervisor, avatar and gap
+    # detection graphs, tools and chat repository) before the first request.
+    # A failure (e.g. a missing Tavily key) must not take down the routes
+    # that do not need it; /chat/stream retries the build on first use.
+    container: ApplicationContainer = app.state.container
+    try:
+        container.avatar_session_service()
+        logger.info("Compiled agent graphs and session service")
+    except Exception:
+        logger.exception("Warming the session service failed; chat will retry on first use")
+    persistence = container.persistence_queue()
+    persistence.start()
     yield
+    await persistence.close(container.app_settings().persistence_shutdown_timeout)
+    await container.chat_repository().aclose()
+    await container.llm_registry().aclose()
 
 
 def create_app() -> FastAPI:
@@ -0,0 +1,14 @@
+-- Migration 003: Content-addressed cache for ingestion chunk classifications
+-- Apply via Supabase SQL Editor or `supabase db push`
+create table
+  classification_cache (
+    key text primary key,
+    value text not null,
+    last_used timestamptz not null default now ()
+  );
+
+create index classification_cache_last_used on classification_cache (last_used);
+
+-- RLS with no policies: PostgREST (anon / authenticated keys) can neither read
+-- nor write the cache; the pipeline's direct DSN connection bypasses RLS.
+alter table classification_cache enable row level security;
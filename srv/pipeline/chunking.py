@@ -1,16 +1,119 @@
 from __future__ import annotations
 
+import hashlib
 import re
+from collections import deque
 
+import numpy as np
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
 
 
 def _split_sentences(text: str) -> list[str]:
     """Split *text* into sentences on '.', '!', or '?' boundaries."""
-    parts = re.split(r"(?<=[.!?])\s+", text.strip())
+    parts = _SENTENCE_BOUNDARY.split(text.strip())
     return [p for p in parts if p]
 
 
+def _sentence_tail(text: str, n: int) -> tuple[str, int]:
+    """Return the last *n* sentences of *text* as one slice, plus their count.
+
+    Walks the sentence boundaries once, keeping only the start offsets of
+    the last *n* sentences, and slices the original string from the
+    earliest of them.  The whitespace between those sentences is preserved
+    as written.
+    """
+    stripped = text.strip()
+    if n <= 0 or not stripped:
+        return "", 0
+    starts: deque[int] = deque([0], maxlen=n)
+    for match in _SENTENCE_BOUNDARY.finditer(stripped):
+        starts.append(match.end())
+    return stripped[starts[0] :], len(starts)
+
+
+def _sentence_windows(sentences: list[str], buffer_size: int) -> list[str]:
+    """Join each sentence with ``buffer_size`` neighbours on either side."""
+    return [
+        " ".join(sentences[max(0, i - buffer_size) : i + buffer_size + 1])
+        for i in range(len(sentences))
+    ]
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+async def semantic_chunk(
+    documents: list[Document],
+    embeddings: Embeddings,
+    breakpoint_percentile: float = 95.0,
+    buffer_size: int = 1,
+) -> tuple[list[Document], np.ndarray]:
+    """Split *documents* where consecutive sentences drift apart semantically.
+
+    Equivalent to LangChain's ``SemanticChunker`` with
+    ``breakpoint_threshold_type="percentile"``, but all sentence windows
+    across all documents are embedded in a single ``aembed_documents`` call
+    and the resulting matrix is kept as a NumPy array.  Cosine distances
+    between consecutive windows are computed in one vectorised pass, and a
+    breakpoint is placed wherever the distance exceeds the
+    ``breakpoint_percentile``-th percentile for that document.
+
+    Args:
+        documents: Source documents; each chunk inherits its document's metadata.
+        embeddings: Embeddings client used for the sentence windows.
+        breakpoint_percentile: Percentile of the distance distribution above
+            which a breakpoint is placed.
+        buffer_size: Neighbouring sentences on each side included in every
+            embedded window.
+
+    Returns:
+        ``(chunks, chunk_vectors)`` where ``chunk_vectors[i]`` is the
+        normalised mean of the window embeddings that make up ``chunks[i]``.
+        It approximates an embedding of the chunk text without a second call.
+    """
+    per_doc = [_split_sentences(doc.page_content) for doc in documents]
+    windows = [w for sentences in per_doc for w in _sentence_windows(sentences, buffer_size)]
+    if not windows:
+        return [], np.empty((0, 0), dtype=np.float32)
+
+    matrix = _normalize_rows(
+        np.asarray(await embeddings.aembed_documents(windows), dtype=np.float32)
+    )
+
+    chunks: list[Document] = []
+    vectors: list[np.ndarray] = []
+    offset = 0
+    for doc, sentences in zip(documents, per_doc):
+        rows = matrix[offset : offset + len(sentences)]
+        offset += len(sentences)
+        if not sentences:
+            continue
+
+        if len(sentences) > 1:
+            distances = 1.0 - np.einsum("ij,ij->i", rows[:-1], rows[1:])
+            threshold = np.percentile(distances, breakpoint_percentile)
+            ends = np.flatnonzero(distances > threshold) + 1
+        else:
+            ends = np.empty(0, dtype=np.intp)
+        bounds = np.concatenate(([0], ends, [len(sentences)]))
+
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            chunks.append(
+                Document(
+                    page_content=" ".join(sentences[start:end]),
+                    metadata=dict(doc.metadata),
+                )
+            )
+            vectors.append(rows[start:end].mean(axis=0))
+
+    return chunks, _normalize_rows(np.vstack(vectors))
+
+
 def apply_semantic_overlap(
     chunks: list[Document],
     overlap_sentences: int = 3,
@@ -23,6 +126,8 @@ def apply_semantic_overlap(
 
     The overlap is always sourced from the original text, never from an
     already-overlapped version, so the prefix does not compound across hops.
+    Each chunk is scanned once, and the prefix is a single slice of the
+    predecessor's text, so the cost is linear in the total corpus size.
 
     Metadata is preserved as-is; ``overlap_sentence_count`` is added to
     every returned document for observability (0 for chunk 0).
@@ -38,35 +143,17 @@ def apply_semantic_overlap(
         return []
 
     result: list[Document] = []
+    prefix, count = "", 0
 
-    for i, chunk in enumerate(chunks):
-        if i == 0:
-            result.append(
-                Document(
-                    page_content=chunk.page_content,
-                    metadata={**chunk.metadata, "overlap_sentence_count": 0},
-                )
-            )
-            continue
-
-        prev_sentences = _split_sentences(chunks[i - 1].page_content)
-        tail = prev_sentences[-overlap_sentences:] if overlap_sentences > 0 else []
-
-        if tail:
-            prefix = " ".join(tail)
-            new_content = prefix + "\n\n" + chunk.page_content
-        else:
-            new_content = chunk.page_content
-
+    for chunk in chunks:
+        content = chunk.page_content
         result.append(
             Document(
-                page_content=new_content,
-                metadata={
-                    **chunk.metadata,
-                    "overlap_sentence_count": len(tail),
-                },
+                page_content=f"{prefix}\n\n{content}" if count else content,
+                metadata={**chunk.metadata, "overlap_sentence_count": count},
             )
         )
+        prefix, count = _sentence_tail(content, overlap_sentences)
 
     return result
 
@@ -101,3 +188,31 @@ def prepend_metadata_title(chunks: list[Document]) -> list[Document]:
         new_content = title + "\n\n" + chunk.page_content
         result.append(Document(page_content=new_content, metadata=chunk.metadata))
     return result
+
+
+def fingerprint_chunks(chunks: list[Document], salt: str = "") -> list[Document]:
+    """Attach a content fingerprint to each chunk as ``chunk_fingerprint``.
+
+    The fingerprint is a SHA-256 over *salt*, the chunk's ``source`` and its
+    ``page_content``.  Identical chunks within one source are told apart by
+    an occurrence counter, so every fingerprint is unique per source.  *salt*
+    should capture every setting that changes what is stored for a chunk
+    (pipeline option, models, known characters).
+    """
+    seen: dict[tuple[str, str], int] = {}
+    result: list[Document] = []
+    for chunk in chunks:
+        source = chunk.metadata.get("source", "unknown")
+        content_hash = hashlib.sha256(
+            f"{salt}\x00{source}\x00{chunk.page_content}".encode("utf-8")
+        ).hexdigest()
+        occurrence = seen.get((source, content_hash), 0)
+        seen[(source, content_hash)] = occurrence + 1
+        fingerprint = content_hash if occurrence == 0 else f"{content_hash}-{occurrence}"
+        result.append(
+            Document(
+                page_content=chunk.page_content,
+                metadata={**chunk.metadata, "chunk_fingerprint": fingerprint},
+            )
+        )
+    return result
@@ -5,12 +5,16 @@ import logging
 import time
 import warnings
 from collections.abc import Awaitable, Callable
-from typing import Literal
+from typing import TYPE_CHECKING, Literal
 
 from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.rate_limiters import BaseRateLimiter
 from pydantic import BaseModel, Field
 
+if TYPE_CHECKING:
+    from pipeline.classification_cache import ClassificationCache
+
 warnings.filterwarnings("ignore", message="Pydantic serializer warnings", category=UserWarning)
 
 logger = logging.getLogger(__name__)
@@ -97,6 +101,9 @@ Classify the following story chunk:
 {chunk_text}
 """
 
+# Bump whenever the prompt or schema changes so cached classifications miss.
+CLASSIFICATION_PROMPT_VERSION = "1"
+
 _classification_prompt = ChatPromptTemplate.from_messages(
     [
         ("system", _CLASSIFICATION_SYSTEM),
@@ -173,8 +180,15 @@ def classify_chunks(
 # ---------------------------------------------------------------------------
 
 
-async def _ainvoke_with_retry(chain, chars_str: str, text: str) -> ChunkClassification:
+async def _ainvoke_with_retry(
+    chain,
+    chars_str: str,
+    text: str,
+    rate_limiter: BaseRateLimiter | None = None,
+) -> ChunkClassification:
     for attempt in range(_MAX_RETRIES):
+        if rate_limiter is not None:
+            await rate_limiter.aacquire()
         try:
             return await chain.ainvoke({"known_characters": chars_str, "chunk_text": text})
         except Exception as exc:
@@ -187,48 +201,135 @@ async def _ainvoke_with_retry(chain, chars_str: str, text: str) -> ChunkClassifi
     raise RuntimeError("unreachable")
 
 
+def make_chunk_classifier(
+    known_characters: list[str],
+    llm,
+    *,
+    rate_limiter: BaseRateLimiter | None = None,
+    cache: ClassificationCache | None = None,
+    model_name: str = "",
+    semaphore: asyncio.Semaphore | None = None,
+) -> Callable[[Document], Awaitable[Document]]:
+    """Return a coroutine function that classifies a single chunk.
+
+    The returned callable consults ``cache`` first (keyed by chunk text,
+    character list, prompt version and ``model_name``; cache errors are
+    logged and treated as a miss / skipped write), otherwise acquires
+    ``semaphore`` (if given) and calls the LLM through ``rate_limiter``.  It
+    resolves to a new ``Document`` whose metadata carries the
+    classification fields.  Used directly by the streaming ingestion
+    pipeline and by ``classify_chunks_async``.
+    """
+    if cache is not None:
+        from pipeline.classification_cache import classification_cache_key
+
+    structured_llm = llm.with_structured_output(
+        ChunkClassification, method="function_calling", strict=True
+    )
+    chain = _classification_prompt | structured_llm
+    chars_str = ", ".join(known_characters) if known_characters else "(none provided)"
+
+    async def _call_llm(text: str) -> ChunkClassification:
+        if semaphore is None:
+            return await _ainvoke_with_retry(chain, chars_str, text, rate_limiter)
+        async with semaphore:
+            return await _ainvoke_with_retry(chain, chars_str, text, rate_limiter)
+
+    async def classify(chunk: Document) -> Document:
+        classification = None
+        if cache is not None:
+            key = classification_cache_key(chunk.page_content, chars_str, model_name)
+            try:
+                classification = await cache.get(key)
+            except Exception:
+                logger.exception("Classification cache lookup failed; calling the LLM")
+        if classification is None:
+            classification = await _call_llm(chunk.page_content)
+            if cache is not None:
+                try:
+                    await cache.put(key, classification)
+                except Exception:
+                    logger.exception("Classification cache write failed; result not cached")
+        new_meta = {
+            **chunk.metadata,
+            **classification.model_dump(),
+        }
+        return Document(page_content=chunk.page_content, metadata=new_meta)
+
+    return classify
+
+
 async def classify_chunks_async(
     chunks: list[Document],
     known_characters: list[str],
     llm,
     on_chunk_classified: Callable[[int, int], Awaitable[None]] | None = None,
+    *,
+    max_concurrency: int = 8,
+    rate_limiter: BaseRateLimiter | None = None,
+    cache: ClassificationCache | None = None,
+    model_name: str = "",
 ) -> list[Document]:
     """Run a structured-output LLM call per chunk and attach taxonomy metadata.
 
     Async version — suitable for FastAPI / ``IngestionPipelineService``.
 
+    Up to ``max_concurrency`` classification calls are in flight at once.
+    Request pacing is delegated to ``rate_limiter`` (a token bucket such as
+    ``InMemoryRateLimiter``), which is acquired before every LLM attempt.
+    When a ``cache`` is supplied, chunks whose text, character list, prompt
+    version and ``model_name`` were classified before skip the LLM entirely.
+
     Args:
         on_chunk_classified: Optional callback ``(processed, total) -> None``
-            fired after each chunk is classified.
-
-    Returns new Document objects whose ``metadata`` dicts contain the
-    classification fields (suitable for use as Qdrant payload).
+            fired each time a chunk finishes classifying.  Chunks may finish
+            out of order; ``processed`` is a running completion count.
+        max_concurrency: Maximum number of in-flight classification calls.
+        rate_limiter: Optional token-bucket limiter shared by all calls.
+        cache: Optional ``ClassificationCache`` consulted before each call.
+        model_name: Classification model name, part of the cache key.
+
+    Returns new Document objects — in the same order as *chunks* — whose
+    ``metadata`` dicts contain the classification fields (suitable for use
+    as Qdrant payload).
     """
-    structured_llm = llm.with_structured_output(
-        ChunkClassification, method="function_calling", strict=True
+    if not chunks:
+        return []
+
+    classify = make_chunk_classifier(
+        known_characters,
+        llm,
+        rate_limiter=rate_limiter,
+        cache=cache,
+        model_name=model_name,
+        semaphore=asyncio.Semaphore(max(1, max_concurrency)),
     )
-    chain = _classification_prompt | structured_llm
-
-    enriched: list[Document] = []
-    chars_str = ", ".join(known_characters) if known_characters else "(none provided)"
-
-    for i, chunk in enumerate(chunks):
-        classification = await _ainvoke_with_retry(chain, chars_str, chunk.page_content)
-        new_meta = {
-            **chunk.metadata,
-            **classification.model_dump(),
-        }
-        enriched.append(Document(page_content=chunk.page_content, metadata=new_meta))
+    total = len(chunks)
+    enriched: list[Document | None] = [None] * total
+    processed = 0
+
+    async def _classify(index: int, chunk: Document) -> None:
+        nonlocal processed
+        enriched[index] = doc = await classify(chunk)
+        processed += 1
         logger.info(
-            "[%d/%d] %s / %s — %s",
-            i + 1,
-            len(chunks),
-            classification.content_type,
-            classification.narrative_function,
-            classification.characters_present,
+            "[%d/%d] chunk %d: %s / %s — %s",
+            processed,
+            total,
+            index,
+            doc.metadata.get("content_type"),
+            doc.metadata.get("narrative_function"),
+            doc.metadata.get("characters_present"),
         )
         if on_chunk_classified:
-            await on_chunk_classified(i + 1, len(chunks))
-        await asyncio.sleep(0.3)
+            await on_chunk_classified(processed, total)
 
-    return enriched
+    tasks = [asyncio.create_task(_classify(i, chunk)) for i, chunk in enumerate(chunks)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    return [doc for doc in enriched if doc is not None]
@@ -0,0 +1,190 @@
+"""Content-addressed cache for ``ChunkClassification`` results.
+
+Entries are keyed by a SHA-256 over the chunk text, the known-characters
+string, the classification prompt version and the classification model, so a
+re-extract of an unchanged chunk skips the LLM call entirely while any change
+to the inputs (or a prompt bump) naturally misses.
+
+Backends:
+
+- ``InMemoryClassificationCache`` — ``OrderedDict`` LRU, per-process.
+- ``SqliteClassificationCache`` — on-disk file for local development.
+- ``PostgresClassificationCache`` — shared ``classification_cache`` table
+  (see ``migrations/003_create_classification_cache.sql``) for production.
+
+All backends evict least-recently-used entries once ``max_entries`` is
+exceeded.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Protocol, runtime_checkable
+
+from pipeline.classification import CLASSIFICATION_PROMPT_VERSION, ChunkClassification
+
+logger = logging.getLogger(__name__)
+
+
+def classification_cache_key(chunk_text: str, known_characters: str, model: str) -> str:
+    """Return the content address for a single classification call."""
+    digest = hashlib.sha256()
+    for part in (CLASSIFICATION_PROMPT_VERSION, model, known_characters, chunk_text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+@runtime_checkable
+class ClassificationCache(Protocol):
+    """Async get/put interface for cached chunk classifications."""
+
+    async def get(self, key: str) -> ChunkClassification | None: ...
+
+    async def put(self, key: str, value: ChunkClassification) -> None: ...
+
+
+class InMemoryClassificationCache:
+    """``OrderedDict`` LRU bounded by ``max_entries``. Ephemeral — lost on restart."""
+
+    def __init__(self, max_entries: int = 10_000) -> None:
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, ChunkClassification] = OrderedDict()
+
+    async def get(self, key: str) -> ChunkClassification | None:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    async def put(self, key: str, value: ChunkClassification) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+
+_SQLITE_SCHEMA = """\
+CREATE TABLE IF NOT EXISTS classification_cache (
+    key       TEXT PRIMARY KEY,
+    value     TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS classification_cache_last_used
+    ON classification_cache (last_used);
+"""
+
+
+class SqliteClassificationCache:
+    """Single-file SQLite cache for local development.
+
+    Blocking ``sqlite3`` calls run in a worker thread so the event loop is
+    never stalled by disk I/O.
+    """
+
+    def __init__(self, path: str | Path, max_entries: int = 100_000) -> None:
+        self._path = Path(path)
+        self._max_entries = max_entries
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self._path, check_same_thread=False)
+        self._conn.executescript(_SQLITE_SCHEMA)
+        self._lock = asyncio.Lock()
+
+    async def get(self, key: str) -> ChunkClassification | None:
+        async with self._lock:
+            raw = await asyncio.to_thread(self._get_sync, key)
+        return ChunkClassification.model_validate_json(raw) if raw else None
+
+    async def put(self, key: str, value: ChunkClassification) -> None:
+        async with self._lock:
+            await asyncio.to_thread(self._put_sync, key, value.model_dump_json())
+
+    def _get_sync(self, key: str) -> str | None:
+        row = self._conn.execute(
+            "SELECT value FROM classification_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._conn.execute(
+            "UPDATE classification_cache SET last_used = ? WHERE key = ?",
+            (time.time(), key),
+        )
+        self._conn.commit()
+        return row[0]
+
+    def _put_sync(self, key: str, raw: str) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO classification_cache (key, value, last_used) "
+            "VALUES (?, ?, ?)",
+            (key, raw, time.time()),
+        )
+        self._conn.execute(
+            "DELETE FROM classification_cache WHERE key IN ("
+            "  SELECT key FROM classification_cache ORDER BY last_used DESC"
+            "  LIMIT -1 OFFSET ?"
+            ")",
+            (self._max_entries,),
+        )
+        self._conn.commit()
+
+
+class PostgresClassificationCache:
+    """Shared cache backed by the ``classification_cache`` Postgres table.
+
+    A single async connection is opened lazily and reused for all calls.
+    LRU eviction runs once every ``_EVICT_EVERY`` writes rather than on each
+    insert, since trimming a large table is far more expensive than a lookup.
+    """
+
+    _EVICT_EVERY = 100
+
+    def __init__(self, dsn: str, max_entries: int = 1_000_000) -> None:
+        self._dsn = dsn
+        self._max_entries = max_entries
+        self._conn = None
+        self._lock = asyncio.Lock()
+        self._writes = 0
+
+    async def _connection(self):
+        if self._conn is None or self._conn.closed:
+            import psycopg
+
+            self._conn = await psycopg.AsyncConnection.connect(self._dsn, autocommit=True)
+        return self._conn
+
+    async def get(self, key: str) -> ChunkClassification | None:
+        async with self._lock:
+            conn = await self._connection()
+            cur = await conn.execute(
+                "UPDATE classification_cache SET last_used = now() "
+                "WHERE key = %s RETURNING value",
+                (key,),
+            )
+            row = await cur.fetchone()
+        return ChunkClassification.model_validate_json(row[0]) if row else None
+
+    async def put(self, key: str, value: ChunkClassification) -> None:
+        async with self._lock:
+            conn = await self._connection()
+            await conn.execute(
+                "INSERT INTO classification_cache (key, value, last_used) "
+                "VALUES (%s, %s, now()) "
+                "ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, last_used = now()",
+                (key, value.model_dump_json()),
+            )
+            self._writes += 1
+            if self._writes % self._EVICT_EVERY:
+                return
+            await conn.execute(
+                "DELETE FROM classification_cache WHERE key IN ("
+                "  SELECT key FROM classification_cache ORDER BY last_used DESC"
+                "  OFFSET %s"
+                ")",
+                (self._max_entries,),
+            )
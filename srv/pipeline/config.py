@@ -1,14 +1,39 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 
 class IngestionPipelineSettings(BaseSettings):
     collection_name: str = "lrwr_chunks"
     embedding_model: str = "text-embedding-3-small"
+    embedding_cache_max_entries: int = 50_000
+    embedding_cache_dir: str = ""
     classification_model: str = "gpt-4.1-mini"
     classification_max_tokens: int = 500
+    classification_max_concurrency: int = 8
+    classification_requests_per_second: float = 5.0
+    classification_max_burst: int = 8
+    classification_cache_backend: Literal["none", "memory", "sqlite", "postgres"] = "memory"
+    classification_cache_path: str = ".cache/classification.sqlite3"
+    classification_cache_dsn: str = ""
+    classification_cache_max_entries: int = 100_000
     chunk_size: int = 500
     chunk_overlap: int = 50
     overlap_sentences: int = 3
+    semantic_breakpoint_percentile: float = 95.0
+    reuse_chunker_vectors: bool = False
+    incremental_ingestion: bool = True
+    sparse_vectors: bool = True
+    quantization: Literal["none", "scalar", "binary"] = "scalar"
+    quantization_always_ram: bool = True
+    # None: originals on disk whenever quantization is on (see vectors_on_disk)
+    on_disk_vectors: bool | None = None
+    hnsw_m: int = 16
+    hnsw_ef_construct: int = 100
+    upsert_batch_size: int = 64
+    upsert_max_concurrency: int = 4
+    stream_queue_size: int = 128
+    stream_flush_seconds: float = 0.5
     use_modal: bool = False
 
     model_config = {"env_prefix": "PIPELINE_", "env_file": ".env", "extra": "ignore"}
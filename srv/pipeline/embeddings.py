@@ -0,0 +1,226 @@
+"""Caching wrapper around the shared ``Embeddings`` singleton.
+
+``CachedEmbeddings`` is a drop-in ``Embeddings`` implementation: sentences
+embedded by the semantic chunker, chunks embedded at upsert time and queries
+embedded by the retrieval tool all go through it, and a given text is only
+ever sent to the provider once per model.
+
+Lookups go through two tiers:
+
+1. An in-process LRU of recently used vectors.
+2. An optional ``MmapEmbeddingStore`` — an append-only float32 matrix on disk
+   (memory-mapped for reads) plus a text-hash → row index.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def _text_key(namespace: str, kind: str, text: str) -> str:
+    digest = hashlib.sha256()
+    for part in (namespace, kind, text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class MmapEmbeddingStore:
+    """Append-only on-disk vector store for a single embedding model.
+
+    Layout inside *directory*:
+
+    - ``vectors.f32`` — raw float32 rows, ``dim`` values each.
+    - ``index.tsv``   — a ``#dim`` header line, then one ``<key>\\t<row>``
+      line per stored vector.
+
+    Reads go through ``np.memmap`` so only touched pages are loaded.  The
+    mapping is refreshed lazily when rows have been appended since it was
+    opened.  Writes append to both files, so a crash can at worst lose the
+    last partially written row, which is simply never indexed.
+    """
+
+    def __init__(self, directory: str | Path) -> None:
+        self._dir = Path(directory)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self._dir / "vectors.f32"
+        self._index_path = self._dir / "index.tsv"
+        self._index: dict[str, int] = {}
+        self._dim: int | None = None
+        self._rows = 0
+        self._mmap: np.memmap | None = None
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _load_index(self) -> None:
+        if not self._index_path.exists():
+            return
+        for line in self._index_path.read_text().splitlines():
+            key, _, value = line.partition("\t")
+            if not value:
+                continue
+            if key == "#dim":
+                self._dim = int(value)
+            else:
+                self._index[key] = int(value)
+        if self._dim and self._vectors_path.exists():
+            row_bytes = 4 * self._dim
+            self._rows = self._vectors_path.stat().st_size // row_bytes
+            # Drop a torn trailing row so later appends stay row-aligned.
+            with self._vectors_path.open("r+b") as f:
+                f.truncate(self._rows * row_bytes)
+        self._index = {k: r for k, r in self._index.items() if r < self._rows}
+
+    def _matrix(self) -> np.memmap | None:
+        if self._dim is None or self._rows == 0:
+            return None
+        if self._mmap is None or self._mmap.shape[0] < self._rows:
+            self._mmap = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r", shape=(self._rows, self._dim)
+            )
+        return self._mmap
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        with self._lock:
+            rows = {k: self._index[k] for k in keys if k in self._index}
+            matrix = self._matrix() if rows else None
+            if matrix is None:
+                return {}
+            return {k: matrix[row].tolist() for k, row in rows.items()}
+
+    def put_many(self, items: dict[str, list[float]]) -> None:
+        with self._lock:
+            new = {k: v for k, v in items.items() if k not in self._index}
+            if not new:
+                return
+            block = np.asarray(list(new.values()), dtype=np.float32)
+            if self._dim is None:
+                self._dim = block.shape[1]
+                with self._index_path.open("a") as f:
+                    f.write(f"#dim\t{self._dim}\n")
+            elif block.shape[1] != self._dim:
+                raise ValueError(
+                    f"Embedding dimension mismatch: store has {self._dim}, got {block.shape[1]}"
+                )
+            with self._vectors_path.open("ab") as f:
+                f.write(block.tobytes())
+            lines = []
+            for offset, key in enumerate(new):
+                self._index[key] = self._rows + offset
+                lines.append(f"{key}\t{self._rows + offset}\n")
+            with self._index_path.open("a") as f:
+                f.writelines(lines)
+            self._rows += len(new)
+
+
+class CachedEmbeddings(Embeddings):
+    """``Embeddings`` wrapper that never embeds the same text twice per model.
+
+    Args:
+        underlying: The real embeddings client (e.g. ``OpenAIEmbeddings``).
+        namespace: Cache namespace, normally the embedding model name, so
+            switching models never returns stale vectors.
+        max_entries: Capacity of the in-process LRU.
+        store: Optional persistent ``MmapEmbeddingStore`` consulted on LRU
+            misses and populated with every freshly computed vector.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        namespace: str,
+        max_entries: int = 50_000,
+        store: MmapEmbeddingStore | None = None,
+    ) -> None:
+        self.underlying = underlying
+        self.namespace = namespace
+        self._max_entries = max_entries
+        self._store = store
+        self._lru: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ── Embeddings interface ──────────────────────────────────────────────
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys, found, missing = self._lookup("document", texts)
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            found.update(self._remember(dict(zip(missing, vectors))))
+        return [found[k] for k in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        keys, found, missing = self._lookup("query", [text])
+        if missing:
+            found.update(self._remember({keys[0]: self.underlying.embed_query(text)}))
+        return found[keys[0]]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys, found, missing = self._lookup("document", texts)
+        if missing:
+            vectors = await self.underlying.aembed_documents(list(missing.values()))
+            found.update(self._remember(dict(zip(missing, vectors))))
+        return [found[k] for k in keys]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        keys, found, missing = self._lookup("query", [text])
+        if missing:
+            found.update(self._remember({keys[0]: await self.underlying.aembed_query(text)}))
+        return found[keys[0]]
+
+    # ── Cache tiers ───────────────────────────────────────────────────────
+
+    def _lookup(
+        self, kind: str, texts: list[str]
+    ) -> tuple[list[str], dict[str, list[float]], dict[str, str]]:
+        """Return ``(keys, found, missing)`` for *texts*.
+
+        *found* maps cached keys to vectors; *missing* maps uncached keys to
+        the text that still needs embedding (deduplicated).
+        """
+        keys = [_text_key(self.namespace, kind, t) for t in texts]
+        found: dict[str, list[float]] = {}
+        missing: dict[str, str] = {}
+        with self._lock:
+            for key, text in zip(keys, texts):
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    found[key] = vector
+                else:
+                    missing.setdefault(key, text)
+        if missing and self._store is not None:
+            stored = self._store.get_many(list(missing))
+            if stored:
+                found.update(self._remember(stored, persist=False))
+                for key in stored:
+                    del missing[key]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return keys, found, missing
+
+    def _remember(
+        self, vectors: dict[str, list[float]], persist: bool = True
+    ) -> dict[str, list[float]]:
+        with self._lock:
+            for key, vector in vectors.items():
+                self._lru[key] = vector
+                self._lru.move_to_end(key)
+            while len(self._lru) > self._max_entries:
+                self._lru.popitem(last=False)
+        if persist and self._store is not None:
+            self._store.put_many(vectors)
+        return vectors
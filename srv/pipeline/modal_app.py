@@ -25,7 +25,6 @@ image = modal.Image.debian_slim(python_version="3.11").pip_install(
     "langchain-openai",
     "langchain-qdrant",
     "langchain-cohere",
-    "langchain-experimental",
     "langchain-text-splitters",
     "qdrant-client",
     "pydantic-settings",
@@ -45,7 +44,7 @@ async def process_document(
     """
     from langchain_core.documents import Document
     from langchain_openai import OpenAIEmbeddings
-    from qdrant_client import QdrantClient
+    from qdrant_client import AsyncQdrantClient, QdrantClient
 
     from pipeline.config import IngestionPipelineSettings
     from pipeline.service import IngestionPipelineService
@@ -55,12 +54,17 @@ async def process_document(
         url=settings.qdrant_url,  # type: ignore[attr-defined]
         api_key=settings.qdrant_api_key,  # type: ignore[attr-defined]
     )
+    async_qdrant_client = AsyncQdrantClient(
+        url=settings.qdrant_url,  # type: ignore[attr-defined]
+        api_key=settings.qdrant_api_key,  # type: ignore[attr-defined]
+    )
     embeddings = OpenAIEmbeddings(model=settings.embedding_model)
 
     pipeline = IngestionPipelineService(
         settings=settings,
         qdrant_client=qdrant_client,
         embeddings=embeddings,
+        async_qdrant_client=async_qdrant_client,
     )
 
     docs = [Document(**d) for d in documents]
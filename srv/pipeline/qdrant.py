@@ -0,0 +1,48 @@
+"""Thread-safe access to a shared sync ``QdrantClient``.
+
+The local in-memory client is not safe to drive from several threads at
+once, yet the ingestion pipeline (``asyncio.to_thread`` per call) and the
+retrieval tool (sync search in a worker thread) share one instance.
+``LockedQdrantClient`` serialises every method call behind one lock; the
+application container hands the same wrapped client to every user, and
+``locked_client`` wraps raw clients passed in directly.
+"""
+
+from __future__ import annotations
+
+import functools
+import threading
+from typing import Any
+
+from qdrant_client import QdrantClient
+
+
+class LockedQdrantClient:
+    """Proxy that runs each ``QdrantClient`` method call under one lock."""
+
+    def __init__(self, client: QdrantClient) -> None:
+        self._client = client
+        self._lock = threading.RLock()
+
+    @property
+    def client(self) -> QdrantClient:
+        return self._client
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def locked(*args: Any, **kwargs: Any) -> Any:
+            with self._lock:
+                return attr(*args, **kwargs)
+
+        return locked
+
+
+def locked_client(client: QdrantClient | LockedQdrantClient) -> LockedQdrantClient:
+    """Return *client* wrapped in a ``LockedQdrantClient`` (unless it already is one)."""
+    if isinstance(client, LockedQdrantClient):
+        return client
+    return LockedQdrantClient(client)
@@ -1,50 +1,187 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import uuid
+from collections import defaultdict
 from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING
 
+import numpy as np
 from langchain_core.documents import Document
-from langchain_experimental.text_splitter import SemanticChunker
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_qdrant import QdrantVectorStore
+from langchain_core.embeddings import Embeddings
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from langchain_openai import ChatOpenAI
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from qdrant_client import QdrantClient, models
+from qdrant_client import AsyncQdrantClient, QdrantClient, models
 
-from pipeline.chunking import apply_semantic_overlap, prepend_metadata_title
-from pipeline.classification import classify_chunks_async
+from pipeline.chunking import (
+    apply_semantic_overlap,
+    fingerprint_chunks,
+    prepend_metadata_title,
+    semantic_chunk,
+)
+from pipeline.classification import CLASSIFICATION_PROMPT_VERSION, make_chunk_classifier
+from pipeline.classification_cache import ClassificationCache
 from pipeline.config import IngestionPipelineSettings
+from pipeline.qdrant import locked_client
+from pipeline.sparse import SPARSE_VECTOR_NAME, BM25SparseEmbeddings
+from pipeline.taxonomy import PAYLOAD_INDEXES as TAXONOMY_INDEXES
+from pipeline.taxonomy import character_keys
+from pipeline.tenancy import DOCUMENT_ID_KEY, USER_ID_KEY, tenant_condition
+from pipeline.tenancy import PAYLOAD_INDEXES as TENANT_INDEXES
+
+if TYPE_CHECKING:
+    from agents.llm import LLMClientRegistry
 
 logger = logging.getLogger(__name__)
 
 ProgressCallback = Callable[[str, int, int | None, int | None], Awaitable[None]]
 
+_POINT_ID_NAMESPACE = uuid.UUID("6f1c5d0e-3b7a-4c1e-9a52-0d6f2b8e4a17")
+
+
+def point_id(source: str, fingerprint: str, user_id: str = "") -> str:
+    """Deterministic Qdrant point ID for the chunk of *source* with *fingerprint*.
+
+    Re-ingesting the same document overwrites its points instead of
+    appending duplicates, and unchanged chunks keep their IDs.  Points of
+    different users never collide, even for identical files.
+    """
+    key = f"{source}\x00{fingerprint}"
+    if user_id:
+        key = f"{user_id}\x00{key}"
+    return str(uuid.uuid5(_POINT_ID_NAMESPACE, key))
+
+
+def quantization_config(
+    settings: IngestionPipelineSettings,
+) -> models.ScalarQuantization | models.BinaryQuantization | None:
+    """Dense-vector quantization for new collections (``None`` = full float32).
+
+    ``"scalar"`` stores int8 copies (4x smaller), ``"binary"`` one bit per
+    dimension (32x smaller, suited to high-dimensional embeddings such as
+    ``text-embedding-3-*``).  The originals stay available for rescoring,
+    on disk by default (see ``vectors_on_disk``).
+    """
+    if settings.quantization == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=settings.quantization_always_ram,
+            )
+        )
+    if settings.quantization == "binary":
+        return models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=settings.quantization_always_ram)
+        )
+    return None
+
+
+def vectors_on_disk(settings: IngestionPipelineSettings) -> bool:
+    """Whether new collections keep the original dense vectors on disk.
+
+    Defaults to on whenever quantization is: searches score the quantized
+    copies held in RAM (``quantization_always_ram``) and only read the
+    ``oversampling x limit`` originals needed for rescoring, so RAM holds
+    the 4x / 32x smaller vectors instead of both.  Without quantization the
+    originals are what is searched and stay in RAM.  ``on_disk_vectors``
+    overrides either way.
+    """
+    if settings.on_disk_vectors is not None:
+        return settings.on_disk_vectors
+    return settings.quantization != "none"
+
+
+PAYLOAD_INDEXES = {**TENANT_INDEXES, **TAXONOMY_INDEXES}
+"""Keyword indexes every collection written by the pipeline carries."""
+
+
+def _payload(doc: Document) -> dict:
+    metadata = doc.metadata
+    if metadata.get("characters_present"):
+        metadata = {**metadata, "character_keys": character_keys(metadata)}
+    payload = {"page_content": doc.page_content, "metadata": metadata}
+    for key in (USER_ID_KEY, DOCUMENT_ID_KEY):
+        if doc.metadata.get(key):
+            payload[key] = doc.metadata[key]
+    return payload
+
+
+def _owner(doc: Document) -> tuple[str, str]:
+    """``(user_id, source)`` a chunk is stored and de-duplicated under."""
+    return doc.metadata.get(USER_ID_KEY) or "", doc.metadata.get("source", "unknown")
+
 
 class IngestionPipelineService:
     """Orchestrates document ingestion into the Qdrant vector store.
 
     Supports two pipeline options:
 
-    - **baseline** (Option A): ``RecursiveCharacterTextSplitter`` + dense
-      vector upsert.  No LLM calls during ingestion.
-    - **advanced** (Option B): ``SemanticChunker`` + content overlap + LLM
-      taxonomy classification + metadata-titled chunks + dense vector upsert.
+    - **baseline** (Option A): ``RecursiveCharacterTextSplitter`` + vector
+      upsert.  No LLM calls during ingestion.
+    - **advanced** (Option B): NumPy semantic chunking + content overlap + LLM
+      taxonomy classification + metadata-titled chunks + vector upsert.
+
+    With ``sparse_vectors`` enabled, every point carries a BM25 sparse vector
+    (``pipeline.sparse``) next to its dense vector, for hybrid retrieval.
+    Collections created before sparse vectors existed keep receiving dense
+    vectors only.
+
+    Chunking needs the whole document (breakpoints are percentiles over it),
+    but everything after it is streamed: chunks flow through classification,
+    titling, embedding and upsert as soon as each is ready.
+
+    Every chunk carries a ``chunk_fingerprint``.  With
+    ``incremental_ingestion`` enabled, chunks whose fingerprint is already
+    stored for their ``source`` are neither classified nor re-embedded; their
+    points are re-stamped with the new upload's ``document_id``.
+    In both modes, points of that source whose fingerprint no longer
+    appears are deleted after the upsert.
+
+    Documents whose metadata carries ``user_id`` / ``document_id`` are
+    stored per tenant (``pipeline.tenancy``): both become top-level payload
+    fields, point IDs and source bookkeeping are scoped to the user, and the
+    collection gets keyword payload indexes on them.  Classified chunks also
+    store normalized ``character_keys``, and the taxonomy fields are indexed
+    for filtered retrieval (``pipeline.taxonomy``).
 
     This class is pure Python with no Modal dependency.  It is called
     directly by ``LocalPipelineRunner`` or instantiated inside a Modal
     function by ``modal_app.py``.
+
+    Qdrant writes go through ``async_qdrant_client`` when one is supplied
+    (remote deployments); otherwise the sync client is driven from a worker
+    thread so the event loop is never blocked.
+
+    ``on_collection_changed(collection_name, user_id)`` is called when the
+    collection is created (``user_id=None``: everything changed), and for
+    each writer whose chunks an upsert batch or a finished ingestion run
+    touched, so readers that cache collection state or search results (the
+    retrieval tool, the response cache) can drop what went stale.
     """
 
     def __init__(
         self,
         settings: IngestionPipelineSettings,
         qdrant_client: QdrantClient,
-        embeddings: OpenAIEmbeddings,
+        embeddings: Embeddings,
         openai_api_key: str = "",
+        classification_cache: ClassificationCache | None = None,
+        async_qdrant_client: AsyncQdrantClient | None = None,
+        on_collection_changed: Callable[[str, str | None], None] | None = None,
+        llm_registry: LLMClientRegistry | None = None,
     ) -> None:
         self._settings = settings
-        self._qdrant_client = qdrant_client
+        self._qdrant_client = locked_client(qdrant_client)
         self._embeddings = embeddings
         self._openai_api_key = openai_api_key
+        self._classification_cache = classification_cache
+        self._async_qdrant_client = async_qdrant_client
+        self._on_collection_changed = on_collection_changed
+        self._llm_registry = llm_registry
+        self._sparse_embeddings = BM25SparseEmbeddings()
 
     async def ingest(
         self,
@@ -67,27 +204,61 @@ class IngestionPipelineService:
         if on_progress:
             await on_progress("chunking", 10, None, None)
 
+        vectors: np.ndarray | None = None
         if pipeline_option == "baseline":
             chunks = self._baseline_chunk(documents)
         elif pipeline_option == "advanced":
-            chunks = await self._advanced_chunk(documents, known_characters, on_progress)
+            chunks, chunk_vectors = await self._advanced_chunk(documents)
+            if self._settings.reuse_chunker_vectors:
+                vectors = chunk_vectors
         else:
             raise ValueError(f"Unknown pipeline_option: {pipeline_option!r}")
 
-        if on_progress:
-            await on_progress("embedding", 85, len(chunks), None)
+        salt = self._fingerprint_salt(pipeline_option, known_characters)
+        chunks = fingerprint_chunks(chunks, salt)
+        current: dict[tuple[str, str], list[str]] = defaultdict(list)
+        for chunk in chunks:
+            current[_owner(chunk)].append(chunk.metadata["chunk_fingerprint"])
+        total = len(chunks)
+
+        document_ids = {
+            _owner(chunk): chunk.metadata[DOCUMENT_ID_KEY]
+            for chunk in chunks
+            if chunk.metadata.get(DOCUMENT_ID_KEY)
+        }
+
+        if self._settings.incremental_ingestion:
+            stored = await self._stored_fingerprints(list(current))
+            keep = [
+                i
+                for i, chunk in enumerate(chunks)
+                if chunk.metadata["chunk_fingerprint"] not in stored.get(_owner(chunk), ())
+            ]
+            chunks = [chunks[i] for i in keep]
+            if vectors is not None:
+                vectors = vectors[keep]
+            logger.info("Incremental ingestion: %d of %d chunks new or changed", len(keep), total)
 
         logger.info(
-            "Upserting %d chunks into collection %r",
+            "Streaming %d chunks into collection %r",
             len(chunks),
             self._settings.collection_name,
         )
-        self._upsert(chunks)
+        await self._stream(
+            chunks,
+            vectors,
+            known_characters if pipeline_option == "advanced" else None,
+            on_progress,
+        )
+        if self._settings.incremental_ingestion:
+            await self._stamp_document_ids(document_ids)
+        await self._delete_vanished(current)
+        self._collection_changed({user_id for user_id, _ in current})
 
         if on_progress:
-            await on_progress("complete", 100, len(chunks), len(chunks))
+            await on_progress("complete", 100, total, total)
 
-        return len(chunks)
+        return total
 
     # ------------------------------------------------------------------
     # Pipeline stages
@@ -104,68 +275,390 @@ class IngestionPipelineService:
         logger.info("Baseline chunking: %d chunks", len(chunks))
         return chunks
 
-    async def _advanced_chunk(
-        self,
-        documents: list[Document],
-        known_characters: list[str],
-        on_progress: ProgressCallback | None = None,
-    ) -> list[Document]:
-        """Option B: semantic chunking + overlap + LLM classification + metadata title."""
-        chunker = SemanticChunker(
+    async def _advanced_chunk(self, documents: list[Document]) -> tuple[list[Document], np.ndarray]:
+        """Option B chunking: semantic chunking + overlap.
+
+        Returns the chunks together with the vectors derived from the
+        sentence embeddings computed during chunking (one row per chunk).
+        """
+        chunks, chunk_vectors = await semantic_chunk(
+            documents,
             self._embeddings,
-            breakpoint_threshold_type="percentile",
+            breakpoint_percentile=self._settings.semantic_breakpoint_percentile,
         )
-        chunks = chunker.split_documents(documents)
         logger.info("Semantic chunking: %d chunks", len(chunks))
 
         chunks = apply_semantic_overlap(chunks, overlap_sentences=self._settings.overlap_sentences)
         logger.info("Applied %d-sentence overlap", self._settings.overlap_sentences)
 
-        if on_progress:
-            await on_progress("classifying", 25, len(chunks), 0)
+        return chunks, chunk_vectors
 
-        async def _on_chunk_classified(processed: int, total: int) -> None:
-            if on_progress:
-                pct = 25 + int(55 * processed / total)
-                await on_progress("classifying", pct, total, processed)
+    def _fingerprint_salt(self, pipeline_option: str, known_characters: list[str]) -> str:
+        """Everything besides chunk text that changes what is stored for a chunk."""
+        parts = [pipeline_option, self._settings.embedding_model]
+        if pipeline_option == "advanced":
+            parts += [
+                self._settings.classification_model,
+                CLASSIFICATION_PROMPT_VERSION,
+                ", ".join(known_characters),
+            ]
+        return "|".join(parts)
 
-        classification_llm = ChatOpenAI(
+    async def _stored_fingerprints(
+        self, owners: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], set[str]]:
+        """Return the chunk fingerprints already stored for each ``(user_id, source)``."""
+        stored: dict[tuple[str, str], set[str]] = defaultdict(set)
+        if not owners or not await self._qdrant(
+            "collection_exists", collection_name=self._settings.collection_name
+        ):
+            return stored
+
+        sources_by_user: dict[str, list[str]] = defaultdict(list)
+        for user_id, source in owners:
+            sources_by_user[user_id].append(source)
+        for user_id, sources in sources_by_user.items():
+            offset = None
+            while True:
+                points, offset = await self._qdrant(
+                    "scroll",
+                    collection_name=self._settings.collection_name,
+                    scroll_filter=models.Filter(
+                        must=[
+                            tenant_condition(user_id),
+                            models.FieldCondition(
+                                key="metadata.source", match=models.MatchAny(any=sources)
+                            ),
+                        ]
+                    ),
+                    limit=1024,
+                    offset=offset,
+                    with_payload=["metadata"],
+                    with_vectors=False,
+                )
+                for point in points:
+                    metadata = (point.payload or {}).get("metadata") or {}
+                    fingerprint = metadata.get("chunk_fingerprint")
+                    if fingerprint:
+                        stored[(user_id, metadata.get("source", "unknown"))].add(fingerprint)
+                if offset is None:
+                    break
+        return stored
+
+    async def _stamp_document_ids(self, document_ids: dict[tuple[str, str], str]) -> None:
+        """Set ``document_id`` on the stored points of each ``(user_id, source)``.
+
+        Unchanged chunks skipped by incremental ingestion keep their points,
+        which would otherwise still carry the previous upload's id.
+        """
+        for (user_id, source), document_id in document_ids.items():
+            await self._qdrant(
+                "set_payload",
+                collection_name=self._settings.collection_name,
+                payload={DOCUMENT_ID_KEY: document_id},
+                points=models.Filter(
+                    must=[
+                        tenant_condition(user_id),
+                        models.FieldCondition(
+                            key="metadata.source", match=models.MatchValue(value=source)
+                        ),
+                    ],
+                    must_not=[
+                        models.FieldCondition(
+                            key=DOCUMENT_ID_KEY, match=models.MatchValue(value=document_id)
+                        )
+                    ],
+                ),
+            )
+
+    async def _delete_vanished(self, current: dict[tuple[str, str], list[str]]) -> None:
+        """Delete stored points of each ``(user_id, source)`` not fingerprinted in *current*."""
+        for (user_id, source), fingerprints in current.items():
+            await self._qdrant(
+                "delete",
+                collection_name=self._settings.collection_name,
+                points_selector=models.FilterSelector(
+                    filter=models.Filter(
+                        must=[
+                            tenant_condition(user_id),
+                            models.FieldCondition(
+                                key="metadata.source", match=models.MatchValue(value=source)
+                            ),
+                        ],
+                        must_not=[
+                            models.FieldCondition(
+                                key="metadata.chunk_fingerprint",
+                                match=models.MatchAny(any=fingerprints),
+                            )
+                        ],
+                    )
+                ),
+            )
+
+    async def _stream(
+        self,
+        chunks: list[Document],
+        vectors: np.ndarray | None,
+        known_characters: list[str] | None,
+        on_progress: ProgressCallback | None = None,
+    ) -> None:
+        """Stream chunks through classify → title → embed → upsert.
+
+        Stages run concurrently and are connected by bounded queues of
+        ``stream_queue_size``, so a full downstream queue stalls the stage
+        feeding it:
+
+        - a feeder pushes chunk indices into ``pending``;
+        - ``classification_max_concurrency`` workers classify and title
+          chunks and put them on ``ready`` (skipped entirely when
+          *known_characters* is ``None``, i.e. the baseline pipeline);
+        - a writer drains ``ready`` into batches of ``upsert_batch_size``,
+          flushing a partial batch after ``stream_flush_seconds`` so early
+          chunks become searchable without waiting for the rest.  Up to
+          ``upsert_max_concurrency`` batches are embedded (unless *vectors*
+          is supplied) and upserted at once.
+
+        Point IDs are derived from each chunk's ``user_id``, ``source`` and
+        ``chunk_fingerprint``; payloads use the layout expected by
+        ``QdrantVectorStore`` (``page_content`` + ``metadata``) plus the
+        tenant fields.
+        """
+        total = len(chunks)
+        if not total:
+            await self._ensure_collection()
+            return
+
+        classify = known_characters is not None
+        queue_size = max(1, self._settings.stream_queue_size)
+        pending: asyncio.Queue[int | None] = asyncio.Queue(queue_size)
+        ready: asyncio.Queue[tuple[int, Document]] = asyncio.Queue(queue_size)
+        workers = max(1, self._settings.classification_max_concurrency) if classify else 0
+        classified = 0
+        stored = 0
+
+        async def _report() -> None:
+            if not on_progress:
+                return
+            if classify and classified < total:
+                stage, processed = "classifying", classified
+            else:
+                stage, processed = "embedding", stored
+            done = classified + stored if classify else 2 * stored
+            await on_progress(stage, 25 + int(74 * done / (2 * total)), total, processed)
+
+        async def _feed() -> None:
+            for i in range(total):
+                if classify:
+                    await pending.put(i)
+                else:
+                    await ready.put((i, chunks[i]))
+            for _ in range(workers):
+                await pending.put(None)
+
+        async def _classify_worker(classify_chunk) -> None:
+            nonlocal classified
+            while (i := await pending.get()) is not None:
+                doc = prepend_metadata_title([await classify_chunk(chunks[i])])[0]
+                classified += 1
+                await _report()
+                await ready.put((i, doc))
+
+        collection_lock = asyncio.Lock()
+        collection_ready = False
+        with_sparse = False
+
+        async def _write_batch(batch: list[tuple[int, Document]]) -> None:
+            nonlocal collection_ready, with_sparse, stored
+            texts = [doc.page_content for _, doc in batch]
+            if vectors is not None:
+                batch_vectors = [vectors[i].tolist() for i, _ in batch]
+            else:
+                batch_vectors = await self._embeddings.aembed_documents(texts)
+            async with collection_lock:
+                if not collection_ready:
+                    with_sparse = await self._ensure_collection(len(batch_vectors[0]))
+                    collection_ready = True
+            if with_sparse:
+                batch_vectors = [
+                    {
+                        "": list(dense),
+                        SPARSE_VECTOR_NAME: models.SparseVector(
+                            indices=sparse.indices, values=sparse.values
+                        ),
+                    }
+                    for dense, sparse in zip(
+                        batch_vectors, self._sparse_embeddings.embed_documents(texts)
+                    )
+                ]
+            else:
+                batch_vectors = [list(dense) for dense in batch_vectors]
+            await self._qdrant(
+                "upsert",
+                collection_name=self._settings.collection_name,
+                points=[
+                    models.PointStruct(
+                        id=point_id(
+                            doc.metadata.get("source", "unknown"),
+                            doc.metadata["chunk_fingerprint"],
+                            doc.metadata.get(USER_ID_KEY) or "",
+                        ),
+                        vector=vector,
+                        payload=_payload(doc),
+                    )
+                    for (_, doc), vector in zip(batch, batch_vectors)
+                ],
+            )
+            self._collection_changed({doc.metadata.get(USER_ID_KEY) or "" for _, doc in batch})
+            stored += len(batch)
+            await _report()
+
+        async def _write(group: asyncio.TaskGroup) -> None:
+            loop = asyncio.get_running_loop()
+            size = max(1, self._settings.upsert_batch_size)
+            semaphore = asyncio.Semaphore(max(1, self._settings.upsert_max_concurrency))
+
+            async def _guarded(batch: list[tuple[int, Document]]) -> None:
+                try:
+                    await _write_batch(batch)
+                finally:
+                    semaphore.release()
+
+            received = 0
+            while received < total:
+                batch = [await ready.get()]
+                deadline = loop.time() + self._settings.stream_flush_seconds
+                while len(batch) < size and received + len(batch) < total:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(ready.get(), timeout))
+                    except TimeoutError:
+                        break
+                received += len(batch)
+                await semaphore.acquire()
+                group.create_task(_guarded(batch))
+
+        classify_chunk = None
+        if classify:
+            classify_chunk = make_chunk_classifier(
+                known_characters,
+                self._classification_llm(),
+                rate_limiter=InMemoryRateLimiter(
+                    requests_per_second=self._settings.classification_requests_per_second,
+                    max_bucket_size=max(1, self._settings.classification_max_burst),
+                ),
+                cache=self._classification_cache,
+                model_name=self._settings.classification_model,
+            )
+
+        await _report()
+        # Feeding, classification and every batch write share one task group:
+        # the first failure (or a cancellation of the run) cancels the rest,
+        # so no LLM calls are spent on a failed run and no write is orphaned.
+        try:
+            async with asyncio.TaskGroup() as group:
+                group.create_task(_feed())
+                group.create_task(_write(group))
+                for _ in range(workers):
+                    group.create_task(_classify_worker(classify_chunk))
+        except BaseExceptionGroup as failed:
+            raise failed.exceptions[0] from None
+        logger.info("Streamed %d chunks (%d classified)", stored, classified)
+
+    def _classification_llm(self) -> ChatOpenAI:
+        """Shared client from ``llm_registry`` if one was supplied, else a new one."""
+        if self._llm_registry is not None:
+            return self._llm_registry.get(
+                self._settings.classification_model,
+                max_completion_tokens=self._settings.classification_max_tokens,
+            )
+        return ChatOpenAI(
             model=self._settings.classification_model,
             max_completion_tokens=self._settings.classification_max_tokens,
             api_key=self._openai_api_key or None,
         )
-        chunks = await classify_chunks_async(
-            chunks, known_characters, classification_llm,
-            on_chunk_classified=_on_chunk_classified,
-        )
-        logger.info("Classification complete")
 
-        chunks = prepend_metadata_title(chunks)
-        logger.info("Metadata titles prepended")
+    def _collection_changed(self, user_ids: set[str] | None = None) -> None:
+        """Notify ``on_collection_changed`` for *user_ids* (the whole collection if ``None``)."""
+        if self._on_collection_changed is None:
+            return
+        for user_id in sorted(user_ids) if user_ids is not None else [None]:
+            self._on_collection_changed(self._settings.collection_name, user_id)
 
-        return chunks
+    async def _qdrant(self, method: str, **kwargs):
+        """Call *method* on the async Qdrant client, or the sync one in a thread.
 
-    def _upsert(self, chunks: list[Document]) -> None:
-        """Embed chunks and upsert into Qdrant using the shared client."""
-        self._ensure_collection()
-        vectorstore = QdrantVectorStore(
-            client=self._qdrant_client,
-            collection_name=self._settings.collection_name,
-            embedding=self._embeddings,
-        )
-        vectorstore.add_documents(chunks)
+        Sync calls go through ``LockedQdrantClient``, which serialises them
+        with every other user of the same client.
+        """
+        if self._async_qdrant_client is not None:
+            return await getattr(self._async_qdrant_client, method)(**kwargs)
+        return await asyncio.to_thread(getattr(self._qdrant_client, method), **kwargs)
 
-    def _ensure_collection(self) -> None:
-        """Create the Qdrant collection if it does not already exist."""
-        collections = self._qdrant_client.get_collections().collections
-        if any(c.name == self._settings.collection_name for c in collections):
-            return
+    async def _ensure_collection(self, dimension: int | None = None) -> bool:
+        """Create the Qdrant collection if it does not already exist.
 
-        sample_vec = self._embeddings.embed_query("dimension probe")
-        self._qdrant_client.create_collection(
+        New collections use the HNSW, quantization and on-disk
+        (``vectors_on_disk``) settings; existing collections keep the configuration they were
+        created with.
+
+        Returns whether sparse vectors should be written to the collection:
+        ``sparse_vectors`` is enabled and the collection has a sparse vector
+        named ``SPARSE_VECTOR_NAME``.  Missing ``PAYLOAD_INDEXES`` are
+        created on new and existing collections alike.
+        """
+        wants_sparse = self._settings.sparse_vectors
+        if await self._qdrant(
+            "collection_exists", collection_name=self._settings.collection_name
+        ):
+            info = await self._qdrant(
+                "get_collection", collection_name=self._settings.collection_name
+            )
+            await self._ensure_payload_indexes(info.payload_schema or {})
+            if not wants_sparse:
+                return False
+            if SPARSE_VECTOR_NAME in (info.config.params.sparse_vectors or {}):
+                return True
+            logger.warning(
+                "Collection %r has no %r sparse vector; writing dense vectors only",
+                self._settings.collection_name,
+                SPARSE_VECTOR_NAME,
+            )
+            return False
+
+        if dimension is None:
+            dimension = len(await self._embeddings.aembed_query("dimension probe"))
+        await self._qdrant(
+            "create_collection",
             collection_name=self._settings.collection_name,
             vectors_config=models.VectorParams(
-                size=len(sample_vec),
+                size=dimension,
                 distance=models.Distance.COSINE,
+                on_disk=vectors_on_disk(self._settings) or None,
+            ),
+            hnsw_config=models.HnswConfigDiff(
+                m=self._settings.hnsw_m, ef_construct=self._settings.hnsw_ef_construct
+            ),
+            quantization_config=quantization_config(self._settings),
+            sparse_vectors_config=(
+                {SPARSE_VECTOR_NAME: models.SparseVectorParams(modifier=models.Modifier.IDF)}
+                if wants_sparse
+                else None
             ),
         )
+        await self._ensure_payload_indexes({})
+        self._collection_changed()
+        return wants_sparse
+
+    async def _ensure_payload_indexes(self, existing: dict) -> None:
+        """Create the ``PAYLOAD_INDEXES`` that are not in *existing* yet."""
+        for field_name, schema in PAYLOAD_INDEXES.items():
+            if field_name in existing:
+                continue
+            await self._qdrant(
+                "create_payload_index",
+                collection_name=self._settings.collection_name,
+                field_name=field_name,
+                field_schema=schema,
+            )
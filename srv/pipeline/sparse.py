@@ -0,0 +1,76 @@
+"""Local BM25-style sparse encoder for hybrid dense + sparse retrieval.
+
+Documents are encoded at ingestion time as Qdrant sparse vectors whose values
+are BM25 term-frequency weights; the collection's sparse vector is created
+with ``Modifier.IDF`` so Qdrant supplies the inverse document frequency at
+query time.  Queries are encoded as a bag of their unique terms.
+
+Exact character names ("PurpleFrog") and invented terms ("Ytterbium
+Entangler") that dense embeddings blur together are matched lexically, and
+``QdrantVectorStore`` fuses both result lists with reciprocal rank fusion.
+
+No model download and no network call: tokens are hashed to 32-bit indices.
+"""
+
+from __future__ import annotations
+
+import re
+import zlib
+from collections import Counter
+
+from langchain_qdrant import SparseEmbeddings, SparseVector
+
+SPARSE_VECTOR_NAME = "bm25"
+"""Name of the sparse vector in the Qdrant collection (shared by ingestion and retrieval)."""
+
+_TOKEN = re.compile(r"\w+")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from had has have he her his i in is it its "
+    "of on or she so that the their them they this to was were which with you".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-cased word tokens of *text* with common English stopwords removed."""
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _token_index(token: str) -> int:
+    return zlib.crc32(token.encode("utf-8"))
+
+
+def _to_sparse(weights: dict[int, float]) -> SparseVector:
+    indices = sorted(weights)
+    return SparseVector(indices=indices, values=[weights[i] for i in indices])
+
+
+class BM25SparseEmbeddings(SparseEmbeddings):
+    """BM25 term-frequency encoder (IDF is applied by Qdrant).
+
+    Args:
+        k1: Term-frequency saturation.
+        b: Document-length normalisation strength.
+        avg_doc_length: Assumed average chunk length in tokens.  The corpus
+            average is unknown while streaming, so a fixed estimate is used.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, avg_doc_length: float = 256.0) -> None:
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_length = avg_doc_length
+
+    def embed_documents(self, texts: list[str]) -> list[SparseVector]:
+        return [self._embed_document(text) for text in texts]
+
+    def embed_query(self, text: str) -> SparseVector:
+        return _to_sparse({_token_index(t): 1.0 for t in set(tokenize(text))})
+
+    def _embed_document(self, text: str) -> SparseVector:
+        tokens = tokenize(text)
+        norm = self.k1 * (1 - self.b + self.b * len(tokens) / self.avg_doc_length)
+        weights: dict[int, float] = {}
+        for token, tf in Counter(tokens).items():
+            index = _token_index(token)
+            weights[index] = weights.get(index, 0.0) + tf * (self.k1 + 1) / (tf + norm)
+        return _to_sparse(weights)
@@ -0,0 +1,71 @@
+"""Payload filters over the classification taxonomy.
+
+The advanced pipeline stores ``characters_present``, ``content_type``,
+``narrative_function`` and ``story_grid_tag`` in each chunk's metadata.
+These fields are keyword-indexed so retrieval can narrow a search to the
+active character's chunks (and, optionally, to taxonomy hints) before
+falling back to the whole collection.
+
+Chats identify characters by ``characters.id``; the session service
+resolves it to the character's name before retrieval.  Names are written
+differently by the author (``"Purple Frog"``) and the classifier
+(``"PurpleFrog"``), so every point also stores ``metadata.character_keys``:
+the names normalized by ``character_key``.
+"""
+
+from __future__ import annotations
+
+import re
+
+from qdrant_client import models
+
+CHARACTER_KEYS_KEY = "metadata.character_keys"
+
+TAXONOMY_FIELDS = ("content_type", "narrative_function", "story_grid_tag")
+"""Metadata fields accepted as taxonomy hints."""
+
+PAYLOAD_INDEXES: dict[str, models.KeywordIndexParams] = {
+    key: models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD)
+    for key in (
+        CHARACTER_KEYS_KEY,
+        "metadata.characters_present",
+        *(f"metadata.{field}" for field in TAXONOMY_FIELDS),
+    )
+}
+
+_NON_ALNUM = re.compile(r"[\W_]+")
+
+
+def character_key(name: str) -> str:
+    """Case- and punctuation-insensitive form of a character name or slug."""
+    return _NON_ALNUM.sub("", name.lower())
+
+
+def character_keys(metadata: dict) -> list[str]:
+    """Normalized ``characters_present`` of a chunk's *metadata*."""
+    names = metadata.get("characters_present") or []
+    return sorted({character_key(name) for name in names if character_key(name)})
+
+
+def focus_conditions(
+    character_id: str, hints: dict[str, list[str]] | None = None
+) -> list[models.Condition]:
+    """Must-conditions narrowing a search to *character_id* and taxonomy *hints*.
+
+    Each hint field matches any of its values; unknown fields and empty
+    values are ignored.  Returns an empty list when there is nothing to
+    focus on.
+    """
+    conditions: list[models.Condition] = []
+    key = character_key(character_id) if character_id else ""
+    if key:
+        conditions.append(
+            models.FieldCondition(key=CHARACTER_KEYS_KEY, match=models.MatchValue(value=key))
+        )
+    for field in TAXONOMY_FIELDS:
+        values = [v for v in (hints or {}).get(field) or [] if v]
+        if values:
+            conditions.append(
+                models.FieldCondition(key=f"metadata.{field}", match=models.MatchAny(any=values))
+            )
+    return conditions
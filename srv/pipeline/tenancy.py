@@ -0,0 +1,33 @@
+"""Per-user scoping of the shared chunk collection.
+
+All writers share one Qdrant collection.  Every point carries the owning
+``user_id`` and the ``document_id`` of the upload it came from as top-level
+payload fields (next to the ``page_content`` / ``metadata`` layout used by
+``QdrantVectorStore``).  ``user_id`` is indexed as a tenant key
+(``is_tenant``) so Qdrant co-locates each writer's points, and every
+retrieval query carries a must-filter on it.
+"""
+
+from __future__ import annotations
+
+from qdrant_client import models
+
+USER_ID_KEY = "user_id"
+DOCUMENT_ID_KEY = "document_id"
+
+PAYLOAD_INDEXES: dict[str, models.KeywordIndexParams] = {
+    USER_ID_KEY: models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True),
+    DOCUMENT_ID_KEY: models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD),
+}
+
+
+def tenant_condition(user_id: str | None) -> models.Condition:
+    """Condition matching the points of *user_id* (points without an owner if falsy)."""
+    if user_id:
+        return models.FieldCondition(key=USER_ID_KEY, match=models.MatchValue(value=user_id))
+    return models.IsEmptyCondition(is_empty=models.PayloadField(key=USER_ID_KEY))
+
+
+def tenant_filter(user_id: str) -> models.Filter:
+    """Must-filter restricting a search to *user_id*'s points."""
+    return models.Filter(must=[tenant_condition(user_id)])
@@ -0,0 +1,52 @@
+"""
+Benchmark ``apply_semantic_overlap`` across growing synthetic corpora.
+
+Prints wall time and per-chunk cost for each corpus size; the per-chunk
+column should stay roughly flat if the overlap pass scales linearly.
+
+Usage:
+    uv run python -m scripts.bench_chunking                  # from srv/
+    uv run python -m scripts.bench_chunking 1000 100000      # custom sizes
+    just bench-chunking                                      # from repo root
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+
+from langchain_core.documents import Document
+
+from pipeline.chunking import apply_semantic_overlap
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+SENTENCES_PER_CHUNK = 12
+
+
+def make_corpus(n_chunks: int) -> list[Document]:
+    """Build *n_chunks* documents of ``SENTENCES_PER_CHUNK`` short sentences each."""
+    return [
+        Document(
+            page_content=" ".join(
+                f"Sentence {j} of chunk {i} moves the scene along."
+                for j in range(SENTENCES_PER_CHUNK)
+            ),
+            metadata={"source": f"doc-{i // 100}.md"},
+        )
+        for i in range(n_chunks)
+    ]
+
+
+def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or list(DEFAULT_SIZES)
+    print(f"{'chunks':>10}  {'seconds':>9}  {'us/chunk':>9}")
+    for n in sizes:
+        corpus = make_corpus(n)
+        start = time.perf_counter()
+        apply_semantic_overlap(corpus, overlap_sentences=3)
+        elapsed = time.perf_counter() - start
+        print(f"{n:>10}  {elapsed:>9.3f}  {elapsed / n * 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
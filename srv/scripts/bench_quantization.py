@@ -0,0 +1,151 @@
+"""
+Benchmark recall vs latency of the chunk-collection storage modes.
+
+Builds a synthetic clustered corpus of unit vectors and measures, for each
+``PIPELINE_QUANTIZATION`` mode and ``TOOL_RETRIEVAL_QUANTIZATION_OVERSAMPLING``
+value:
+
+* recall@k against exact float32 search, and
+* mean / p95 query latency through Qdrant's ``query_points``.
+
+Collections are created with the pipeline's own ``quantization_config`` and
+``vectors_on_disk`` and queried with the retrieval tool's ``search_params``.  The local in-memory
+Qdrant searches exhaustively and ignores quantization and HNSW, so its
+latency column is only a baseline and recall is emulated: quantized scores
+(int8 per the 0.99 quantile, or sign bits) pick ``oversampling x k``
+candidates that are rescored with the original vectors, as Qdrant does.
+Pass ``--url`` to measure a real Qdrant server end to end instead.
+
+Usage:
+    uv run python -m scripts.bench_quantization                   # from srv/
+    uv run python -m scripts.bench_quantization --points 50000 --dim 1536
+    uv run python -m scripts.bench_quantization --url http://localhost:6333
+    just bench-quantization                                       # from repo root
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+
+from agents.tools.retrieval.config import RetrievalToolSettings
+from agents.tools.retrieval.tool import search_params
+from pipeline.config import IngestionPipelineSettings
+from pipeline.service import quantization_config, vectors_on_disk
+
+MODES = ("none", "scalar", "binary")
+OVERSAMPLING = (1.0, 2.0, 4.0)
+COLLECTION = "bench_quantization"
+
+
+def make_corpus(
+    n_points: int, n_queries: int, dim: int, seed: int = 0
+) -> tuple[np.ndarray, np.ndarray]:
+    """Unit vectors around ``sqrt(n_points)`` random topic centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((max(1, int(n_points**0.5)), dim))
+
+    def sample(n: int) -> np.ndarray:
+        vectors = centroids[rng.integers(len(centroids), size=n)]
+        vectors = vectors + 0.8 * rng.standard_normal((n, dim))
+        return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+    return sample(n_points), sample(n_queries)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+
+def emulated_ids(
+    corpus: np.ndarray, queries: np.ndarray, mode: str, k: int, oversampling: float
+) -> np.ndarray:
+    """Top-*k* ids after quantized candidate scoring and float32 rescoring."""
+    if mode == "none":
+        return _top_k(queries @ corpus.T, k)
+    if mode == "scalar":
+        bound = np.quantile(np.abs(corpus), 0.99)
+        quantized = np.clip(np.round(corpus / bound * 127), -127, 127)
+        approx = queries @ quantized.T
+    else:
+        approx = np.sign(queries) @ np.sign(corpus).T
+    candidates = _top_k(approx, min(len(corpus), max(k, int(k * oversampling))))
+    rescored = np.einsum("qd,qcd->qc", queries, corpus[candidates])
+    return np.take_along_axis(candidates, _top_k(rescored, k), axis=1)
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    return float(
+        np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found.tolist(), truth.tolist())])
+    )
+
+
+def query_latencies(
+    client: QdrantClient, queries: np.ndarray, k: int, params: models.SearchParams | None
+) -> tuple[list[list[int]], list[float]]:
+    ids, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        response = client.query_points(
+            COLLECTION, query=query.tolist(), limit=k, search_params=params
+        )
+        latencies.append(time.perf_counter() - start)
+        ids.append([point.id for point in response.points])
+    return ids, latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--points", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--url", default="", help="Qdrant server (default: in-memory)")
+    args = parser.parse_args()
+
+    corpus, queries = make_corpus(args.points, args.queries, args.dim)
+    truth = _top_k(queries @ corpus.T, args.k)
+    client = QdrantClient(url=args.url) if args.url else QdrantClient(location=":memory:")
+
+    print(f"{'mode':>8}  {'oversample':>10}  {'recall@k':>8}  {'mean ms':>8}  {'p95 ms':>8}")
+    for mode in MODES:
+        settings = IngestionPipelineSettings(quantization=mode)
+        if client.collection_exists(COLLECTION):
+            client.delete_collection(COLLECTION)
+        client.create_collection(
+            COLLECTION,
+            vectors_config=models.VectorParams(
+                size=args.dim,
+                distance=models.Distance.COSINE,
+                on_disk=vectors_on_disk(settings) or None,
+            ),
+            hnsw_config=models.HnswConfigDiff(
+                m=settings.hnsw_m, ef_construct=settings.hnsw_ef_construct
+            ),
+            quantization_config=quantization_config(settings),
+        )
+        client.upload_collection(
+            COLLECTION, vectors=corpus, ids=range(len(corpus)), batch_size=1024, wait=True
+        )
+
+        for oversampling in OVERSAMPLING if mode != "none" else (1.0,):
+            params = search_params(RetrievalToolSettings(quantization_oversampling=oversampling))
+            ids, latencies = query_latencies(client, queries, args.k, params)
+            found = (
+                np.array(ids)
+                if args.url
+                else emulated_ids(corpus, queries, mode, args.k, oversampling)
+            )
+            ms = np.array(latencies) * 1e3
+            print(
+                f"{mode:>8}  {oversampling:>10.1f}  {recall(found, truth):>8.3f}  "
+                f"{ms.mean():>8.2f}  {np.percentile(ms, 95):>8.2f}"
+            )
+    client.delete_collection(COLLECTION)
+
+
+if __name__ == "__main__":
+    main()
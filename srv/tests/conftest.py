@@ -8,6 +8,8 @@ from jose import jwt
 from langchain_core.embeddings import DeterministicFakeEmbedding
 from qdrant_client import QdrantClient
 
+from agents.session.repository import InMemoryChatRepository
+
 os.environ.setdefault("APP_SUPABASE_URL", "https://test.supabase.co")
 os.environ.setdefault("APP_SUPABASE_SERVICE_KEY", "test-service-key")
 os.environ.setdefault("APP_OPENAI_API_KEY", "sk-test")
@@ -54,7 +56,7 @@ def _make_supabase_table_mock(data=None):
 
     result = MagicMock()
     result.data = data if data is not None else []
-    table.execute.return_value = result
+    table.execute = AsyncMock(return_value=result)
 
     return table
 
@@ -62,18 +64,17 @@ def _make_supabase_table_mock(data=None):
 @pytest.fixture
 def mock_session_service():
     service = MagicMock()
-    service.assert_chat_owner = AsyncMock()
+    service.load_turn = AsyncMock()
+    return service
 
-    supabase = MagicMock()
-    default_table = _make_supabase_table_mock()
-    supabase.table.return_value = default_table
 
-    service.get_supabase_client.return_value = supabase
-    return service
+@pytest.fixture
+def chat_repository():
+    return InMemoryChatRepository()
 
 
 @pytest.fixture
-def test_app(mock_session_service):
+def test_app(mock_session_service, chat_repository):
     from dependency_injector import providers
 
     from app.containers import ApplicationContainer
@@ -83,10 +84,12 @@ def test_app(mock_session_service):
     container: ApplicationContainer = app.state.container
 
     container.avatar_session_service.override(providers.Object(mock_session_service))
+    container.chat_repository.override(providers.Object(chat_repository))
 
     yield app, mock_session_service
 
     container.avatar_session_service.reset_override()
+    container.chat_repository.reset_override()
 
 
 @pytest.fixture
@@ -98,6 +101,24 @@ def client(test_app):
 # ── Pipeline fixtures ──────────────────────────────────────────────────────
 
 
+@pytest.fixture
+def stub_builder():
+    """Factory for agent/tool builders whose ``build()`` / ``compile()`` returns a stub.
+
+    ``stub_builder(method, **kwargs)`` returns ``(builder, stub)``; *kwargs*
+    configure the stub's ``ainvoke`` ``AsyncMock``.
+    """
+
+    def make(method: str, **kwargs):
+        stub = MagicMock()
+        stub.ainvoke = AsyncMock(**kwargs)
+        builder = MagicMock()
+        getattr(builder, method).return_value = stub
+        return builder, stub
+
+    return make
+
+
 @pytest.fixture
 def fake_embeddings():
     """Deterministic fake embeddings — no OpenAI calls, consistent vectors."""
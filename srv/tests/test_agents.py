@@ -1,4 +1,6 @@
+import asyncio
 import json
+import re
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
@@ -10,6 +12,7 @@ from agents.avatar.config import AvatarAgentSettings
 from agents.base import AgentBuilder
 from agents.gap_detection.agent import GapDetectionAgentBuilder
 from agents.gap_detection.config import GapDetectionAgentSettings
+from agents.llm import LLMClientRegistry
 from agents.supervisor.agent import SupervisorAgentBuilder
 from agents.supervisor.config import SupervisorAgentSettings
 from agents.tools.retrieval.config import RetrievalToolSettings
@@ -140,7 +143,7 @@ async def populated_qdrant(qdrant_in_memory, fake_embeddings):
                     "and uncover the truth about the surface world. She struggles "
                     "with self-doubt but her curiosity always pushes her forward."
                 ),
-                metadata={"source": "purplefrog-story-notes.md"},
+                metadata={"source": "purplefrog-story-notes.md", "user_id": "writer-1"},
             ),
         ],
         [],
@@ -151,29 +154,17 @@ async def populated_qdrant(qdrant_in_memory, fake_embeddings):
 
 @pytest.mark.asyncio
 async def test_supervisor_produces_full_output(populated_qdrant, fake_embeddings):
-    def _bypass_rerank(**kwargs):
-        mock = MagicMock()
-        mock.invoke = kwargs["base_retriever"].invoke
-        return mock
-
     fake_llm_response = MagicMock()
     fake_llm_response.content = "PurpleFrog is driven by curiosity and loyalty."
 
-    with (
-        patch("agents.tools.retrieval.tool.CohereRerank"),
-        patch(
-            "agents.tools.retrieval.tool.ContextualCompressionRetriever",
-            side_effect=_bypass_rerank,
-        ),
-        patch("agents.avatar.agent.ChatOpenAI") as MockLLM,
-    ):
+    with patch("agents.avatar.agent.ChatOpenAI") as MockLLM:
         instance = MockLLM.return_value
         instance.ainvoke = AsyncMock(return_value=fake_llm_response)
 
         builder = SupervisorAgentBuilder(
             settings=SupervisorAgentSettings(),
             retrieval_tool_builder=RetrievalToolBuilder(
-                settings=RetrievalToolSettings(cohere_api_key="unused"),
+                settings=RetrievalToolSettings(reranker="none"),
                 qdrant_client=populated_qdrant,
                 embeddings=fake_embeddings,
             ),
@@ -185,6 +176,7 @@ async def test_supervisor_produces_full_output(populated_qdrant, fake_embeddings
         result = await graph.ainvoke(
             {
                 "message": "What drives PurpleFrog?",
+                "user_id": "writer-1",
                 "character_id": "purplefrog",
                 "conversation_history": [],
                 "narrative_state": {},
@@ -215,6 +207,7 @@ async def test_supervisor_no_context_early_exit(qdrant_in_memory, fake_embedding
     result = await graph.ainvoke(
         {
             "message": "What drives PurpleFrog?",
+            "user_id": "writer-1",
             "character_id": "purplefrog",
             "conversation_history": [],
             "narrative_state": {},
@@ -227,6 +220,37 @@ async def test_supervisor_no_context_early_exit(qdrant_in_memory, fake_embedding
     assert result["tavily_used"] is False
 
 
+def test_llm_registry_shares_clients_and_http_pool():
+    registry = LLMClientRegistry(api_key="sk-test", max_connections=7)
+    avatar = registry.get("gpt-4o", temperature=0)
+
+    assert registry.get("gpt-4o", temperature=0) is avatar
+    assert registry.get("gpt-4o", temperature=0.7) is not avatar
+    classifier = registry.get("gpt-4.1-mini", max_completion_tokens=256)
+    assert classifier.http_async_client is avatar.http_async_client
+    assert registry.metrics() == {
+        "clients": 3,
+        "requests_total": 0,
+        "requests_in_flight": 0,
+        "pool_connections": 0,
+        "pool_idle_connections": 0,
+        "max_connections": 7,
+        "max_keepalive_connections": 20,
+    }
+
+
+@pytest.mark.asyncio
+async def test_avatar_uses_llm_registry():
+    registry = MagicMock()
+    registry.get.return_value.ainvoke = AsyncMock(return_value=MagicMock(content="Hi."))
+    graph = AvatarAgentBuilder(settings=AvatarAgentSettings(), llm_registry=registry).compile()
+
+    result = await graph.ainvoke({"query": "Hello", "character_id": "purplefrog"})
+
+    registry.get.assert_called_once_with(AvatarAgentSettings().model, temperature=0)
+    assert result["response_text"] == "Hi."
+
+
 def test_compile_is_cached():
     builder = AvatarAgentBuilder(settings=AvatarAgentSettings())
     graph1 = builder.compile()
@@ -255,6 +279,7 @@ async def test_supervisor_with_checkpointer_and_thread_id(qdrant_in_memory, fake
     result = await graph.ainvoke(
         {
             "message": "Hello",
+            "user_id": "writer-1",
             "character_id": "purplefrog",
             "conversation_history": [],
             "narrative_state": {},
@@ -262,3 +287,106 @@ async def test_supervisor_with_checkpointer_and_thread_id(qdrant_in_memory, fake
         config=config,
     )
     assert "response_text" in result
+
+
+def _fanout_supervisor(
+    stub_builder, retrieval: dict, settings: SupervisorAgentSettings | None = None
+):
+    events: list[str] = []
+
+    async def _retrieve(message):
+        events.append("retrieval:start")
+        await asyncio.sleep(0.01)
+        events.append("retrieval:end")
+        return json.dumps(retrieval)
+
+    async def _tavily(message):
+        events.append("tavily:start")
+        await asyncio.sleep(0.02)
+        events.append("tavily:end")
+        return {"answer": "web"}
+
+    async def _gaps(payload):
+        events.append("gaps:start")
+        await asyncio.sleep(0.02)
+        events.append("gaps:end")
+        return {"gap_flags": [{"type": "undefined_attribute"}]}
+
+    retrieval_builder, _ = stub_builder("build", side_effect=_retrieve)
+    tavily_builder, tavily = stub_builder("build", side_effect=_tavily)
+    gap_builder, _ = stub_builder("compile", side_effect=_gaps)
+    avatar_builder, avatar = stub_builder(
+        "compile", return_value={"response_text": "ok", "citations": []}
+    )
+    builder = SupervisorAgentBuilder(
+        settings=settings or SupervisorAgentSettings(),
+        retrieval_tool_builder=retrieval_builder,
+        tavily_tool_builder=tavily_builder,
+        avatar_agent_builder=avatar_builder,
+        gap_detection_builder=gap_builder,
+    )
+    return builder.compile(), events, tavily, avatar
+
+
+_TURN = {"character_id": "purplefrog", "conversation_history": [], "narrative_state": {}}
+_CHUNK = {"text": "PurpleFrog.", "source_document": "a.md", "chunk_index": 0, "score": 0.9}
+
+
+@pytest.mark.asyncio
+async def test_supervisor_starts_tavily_speculatively_with_retrieval(stub_builder):
+    graph, events, tavily, avatar = _fanout_supervisor(
+        stub_builder,
+        {"ranked_chunks": [_CHUNK], "low_confidence": False, "external_references": ["Dune"]},
+        SupervisorAgentSettings(speculative_tavily=True),
+    )
+    result = await graph.ainvoke({"message": "Is she similar to Paul in Dune?", **_TURN})
+
+    assert events.index("tavily:start") < events.index("retrieval:end")
+    tavily.ainvoke.assert_awaited_once()
+    assert result["tavily_used"] is True
+    assert avatar.ainvoke.await_args.args[0]["tavily_context"] == {"answer": "web"}
+
+
+@pytest.mark.asyncio
+async def test_supervisor_discards_unneeded_speculative_tavily(stub_builder):
+    graph, events, tavily, _ = _fanout_supervisor(
+        stub_builder,
+        {"ranked_chunks": [_CHUNK], "low_confidence": False, "external_references": []},
+        SupervisorAgentSettings(speculative_tavily=True),
+    )
+    result = await graph.ainvoke({"message": "Is she similar to Paul in Dune?", **_TURN})
+
+    assert "tavily:start" in events
+    assert "tavily:end" not in events
+    assert result["tavily_used"] is False
+
+
+def test_external_reference_pattern_skips_dialogue_and_everyday_words():
+    settings = SupervisorAgentSettings()
+    pattern = re.compile(settings.external_reference_pattern, re.IGNORECASE)
+
+    assert settings.speculative_tavily is False
+    assert pattern.search("Does her arc follow the Hero's Journey?")
+    assert pattern.search("Is she inspired by Ripley?")
+    for message in (
+        '"Get out," she said. Why would she say that?',
+        "What books does PurpleFrog keep in the burrow?",
+        "Is he like in the last chapter?",
+    ):
+        assert not pattern.search(message)
+
+
+@pytest.mark.asyncio
+async def test_supervisor_runs_tavily_and_gap_detection_concurrently(stub_builder):
+    graph, events, tavily, _ = _fanout_supervisor(
+        stub_builder,
+        {"ranked_chunks": [_CHUNK], "low_confidence": True, "external_references": ["Dune"]},
+        SupervisorAgentSettings(speculative_tavily=False),
+    )
+    result = await graph.ainvoke({"message": "What drives PurpleFrog?", **_TURN})
+
+    assert events.index("retrieval:end") < events.index("tavily:start")
+    assert events.index("gaps:start") < events.index("tavily:end")
+    assert events.index("tavily:start") < events.index("gaps:end")
+    assert result["tavily_used"] is True
+    assert result["gap_flags"] == [{"type": "undefined_attribute"}]
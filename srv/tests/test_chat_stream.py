@@ -38,7 +38,7 @@ def test_chat_stream_returns_sse(test_app, auth_headers):
         yield 'event: token\ndata: {"text": "world"}\n\n'
         yield f'event: done\ndata: {{"chat_id": "{TEST_CHAT_ID}"}}\n\n'
 
-    mock_service.assert_chat_owner = AsyncMock()
+    mock_service.load_turn = AsyncMock()
     mock_service.stream = MagicMock(return_value=fake_stream())
 
     client = TestClient(app)
@@ -66,7 +66,7 @@ def test_chat_stream_returns_403_for_wrong_owner(test_app, auth_headers):
 
     app, mock_service = test_app
 
-    mock_service.assert_chat_owner = AsyncMock(
+    mock_service.load_turn = AsyncMock(
         side_effect=HTTPException(status_code=403, detail="Access denied")
     )
 
@@ -1,19 +1,14 @@
-from fastapi.testclient import TestClient
+from unittest.mock import patch
 
-from tests.conftest import TEST_CHAT_ID, _make_supabase_table_mock
+import pytest
+from fastapi.testclient import TestClient
 
+from agents.session.repository import SupabaseChatRepository
+from tests.conftest import TEST_CHAT_ID, TEST_USER_ID, _make_supabase_table_mock
 
-def test_create_chat(test_app, auth_headers):
-    app, mock_service = test_app
-    supabase = mock_service.get_supabase_client()
 
-    chat_row = {
-        "id": TEST_CHAT_ID,
-        "user_id": "test-user",
-        "character_id": "purplefrog",
-        "title": None,
-    }
-    supabase.table.return_value = _make_supabase_table_mock(data=[chat_row])
+def test_create_chat(test_app, auth_headers, chat_repository):
+    app, _ = test_app
 
     client = TestClient(app)
     response = client.post(
@@ -27,22 +22,14 @@ def test_create_chat(test_app, auth_headers):
 
     assert response.status_code == 201
     assert response.json()["id"] == TEST_CHAT_ID
+    assert chat_repository.chats[TEST_CHAT_ID]["user_id"] == TEST_USER_ID
 
 
-def test_list_chats(test_app, auth_headers):
-    app, mock_service = test_app
-    supabase = mock_service.get_supabase_client()
-
-    supabase.table.return_value = _make_supabase_table_mock(
-        data=[
-            {
-                "id": "chat-1",
-                "character_id": "purplefrog",
-                "title": "Test",
-                "updated_at": "2026-01-01",
-            },
-        ]
-    )
+@pytest.mark.asyncio
+async def test_list_chats(test_app, auth_headers, chat_repository):
+    app, _ = test_app
+    await chat_repository.create_chat("chat-1", TEST_USER_ID, "purplefrog", "Test")
+    await chat_repository.create_chat("chat-2", "someone-else", "purplefrog", "Other")
 
     client = TestClient(app)
     response = client.get("/chats", headers=auth_headers)
@@ -53,13 +40,10 @@ def test_list_chats(test_app, auth_headers):
     assert data[0]["id"] == "chat-1"
 
 
-def test_rename_chat(test_app, auth_headers):
-    app, mock_service = test_app
-    supabase = mock_service.get_supabase_client()
-
-    supabase.table.return_value = _make_supabase_table_mock(
-        data=[{"id": TEST_CHAT_ID, "title": "New Title"}]
-    )
+@pytest.mark.asyncio
+async def test_rename_chat(test_app, auth_headers, chat_repository):
+    app, _ = test_app
+    await chat_repository.create_chat(TEST_CHAT_ID, TEST_USER_ID, "purplefrog", None)
 
     client = TestClient(app)
     response = client.patch(
@@ -72,11 +56,10 @@ def test_rename_chat(test_app, auth_headers):
     assert response.json()["title"] == "New Title"
 
 
-def test_rename_chat_returns_403_for_non_owner(test_app, auth_headers):
-    app, mock_service = test_app
-    supabase = mock_service.get_supabase_client()
-
-    supabase.table.return_value = _make_supabase_table_mock(data=[])
+@pytest.mark.asyncio
+async def test_rename_chat_returns_403_for_non_owner(test_app, auth_headers, chat_repository):
+    app, _ = test_app
+    await chat_repository.create_chat(TEST_CHAT_ID, "someone-else", "purplefrog", None)
 
     client = TestClient(app)
     response = client.patch(
@@ -88,23 +71,20 @@ def test_rename_chat_returns_403_for_non_owner(test_app, auth_headers):
     assert response.status_code == 403
 
 
-def test_delete_chat(test_app, auth_headers):
-    app, mock_service = test_app
-    supabase = mock_service.get_supabase_client()
-
-    supabase.table.return_value = _make_supabase_table_mock(data=[{"id": TEST_CHAT_ID}])
+@pytest.mark.asyncio
+async def test_delete_chat(test_app, auth_headers, chat_repository):
+    app, _ = test_app
+    await chat_repository.create_chat(TEST_CHAT_ID, TEST_USER_ID, "purplefrog", None)
 
     client = TestClient(app)
     response = client.delete(f"/chats/{TEST_CHAT_ID}", headers=auth_headers)
 
     assert response.status_code == 204
+    assert TEST_CHAT_ID not in chat_repository.chats
 
 
 def test_delete_chat_returns_403_for_non_owner(test_app, auth_headers):
-    app, mock_service = test_app
-    supabase = mock_service.get_supabase_client()
-
-    supabase.table.return_value = _make_supabase_table_mock(data=[])
+    app, _ = test_app
 
     client = TestClient(app)
     response = client.delete(f"/chats/{TEST_CHAT_ID}", headers=auth_headers)
@@ -117,3 +97,42 @@ def test_list_chats_requires_auth(test_app):
     client = TestClient(app)
     response = client.get("/chats")
     assert response.status_code in (401, 403)
+
+
+def test_character_crud(test_app, auth_headers):
+    app, _ = test_app
+    client = TestClient(app)
+
+    created = client.post(
+        "/characters",
+        json={"name": "PurpleFrog", "initials": "PF", "color": "#7a3cff"},
+        headers=auth_headers,
+    )
+    assert created.status_code == 201
+    character_id = created.json()["id"]
+
+    listed = client.get("/characters", headers=auth_headers)
+    assert [c["name"] for c in listed.json()] == ["PurpleFrog"]
+
+    assert client.delete(f"/characters/{character_id}", headers=auth_headers).status_code == 204
+    assert client.delete(f"/characters/{character_id}", headers=auth_headers).status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_supabase_repository_awaits_async_client():
+    with patch("agents.session.repository.AsyncClient") as mock_client_cls:
+        table = _make_supabase_table_mock(data=[{"id": TEST_CHAT_ID, "title": "New"}])
+        mock_client_cls.return_value.table.return_value = table
+        repository = SupabaseChatRepository("https://test.supabase.co", "test-key")
+
+        assert await repository.chat_owned_by(TEST_CHAT_ID, TEST_USER_ID)
+        assert await repository.rename_chat(TEST_CHAT_ID, TEST_USER_ID, "New") == {
+            "id": TEST_CHAT_ID,
+            "title": "New",
+        }
+
+        table.execute.return_value.data = []
+        assert await repository.delete_chat(TEST_CHAT_ID, TEST_USER_ID) is False
+
+    assert table.execute.await_count == 3
+    table.update.assert_called_once_with({"title": "New"})
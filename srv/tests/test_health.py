@@ -1,4 +1,60 @@
+from unittest.mock import AsyncMock, patch
+
+from fastapi.testclient import TestClient
+
+
 def test_health_returns_ok(client):
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
+
+
+def test_llm_pool_metrics(client):
+    response = client.get("/health/llm-pool")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["requests_in_flight"] == 0
+    assert body["max_connections"] == 100
+
+
+def test_persistence_metrics(client):
+    response = client.get("/health/persistence")
+    assert response.status_code == 200
+    assert response.json()["pending_turns"] == 0
+
+
+def test_retrieval_cache_metrics(client):
+    response = client.get("/health/retrieval-cache")
+    assert response.status_code == 200
+    assert response.json()["hits"] == 0
+
+
+def test_lifespan_warms_singleton_session_service():
+    from app.main import create_app
+
+    with (
+        patch("agents.session.repository.AsyncClient") as mock_client_cls,
+        patch("agents.tools.tavily.tool.TavilySearch"),
+    ):
+        mock_client_cls.return_value.postgrest.aclose = AsyncMock()
+        app = create_app()
+        container = app.state.container
+        with TestClient(app):
+            service = container.avatar_session_service()
+            assert container.avatar_session_service() is service
+            assert service._supervisor_graph is container.supervisor_agent().compile()
+            assert service._repository is container.chat_repository()
+    mock_client_cls.assert_called_once()
+    mock_client_cls.return_value.postgrest.aclose.assert_awaited_once()
+
+
+def test_app_starts_when_session_service_cannot_be_built():
+    from app.main import create_app
+
+    with (
+        patch("agents.session.repository.AsyncClient") as mock_client_cls,
+        patch("agents.tools.tavily.tool.TavilySearch", side_effect=ValueError("no key")),
+    ):
+        mock_client_cls.return_value.postgrest.aclose = AsyncMock()
+        with TestClient(create_app()) as client:
+            assert client.get("/health").status_code == 200
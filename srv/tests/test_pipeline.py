@@ -6,20 +6,40 @@ services are required.  Classification LLM calls are mocked.
 
 from __future__ import annotations
 
+import asyncio
 import json
+import threading
+import time
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from qdrant_client import AsyncQdrantClient, models
 
+from agents.knowledge_base import KnowledgeBaseVersions
 from agents.tools.retrieval.config import RetrievalToolSettings
+from agents.tools.retrieval.rerank import LexicalReranker, create_reranker
 from agents.tools.retrieval.schemas import RetrievalResult
-from agents.tools.retrieval.tool import RetrievalToolBuilder
-from pipeline.chunking import apply_semantic_overlap, prepend_metadata_title
+from agents.tools.retrieval.tool import RetrievalToolBuilder, search_params
+from pipeline.chunking import (
+    apply_semantic_overlap,
+    fingerprint_chunks,
+    prepend_metadata_title,
+    semantic_chunk,
+)
 from pipeline.classification import ChunkClassification, classify_chunks_async
+from pipeline.classification_cache import (
+    InMemoryClassificationCache,
+    SqliteClassificationCache,
+    classification_cache_key,
+)
 from pipeline.config import IngestionPipelineSettings
+from pipeline.embeddings import CachedEmbeddings, MmapEmbeddingStore
+from pipeline.qdrant import LockedQdrantClient
 from pipeline.runner import LocalPipelineRunner, ModalPipelineRunner
-from pipeline.service import IngestionPipelineService
+from pipeline.service import IngestionPipelineService, point_id, vectors_on_disk
+from pipeline.sparse import SPARSE_VECTOR_NAME, BM25SparseEmbeddings
 
 # ── Chunking unit tests ───────────────────────────────────────────────────
 
@@ -49,6 +69,41 @@ def test_apply_semantic_overlap_prepends_tail():
     assert result[1].page_content.index("Third.") < result[1].page_content.index("Fifth.")
 
 
+def test_apply_semantic_overlap_fewer_sentences_than_window():
+    a = Document(page_content="  Only one sentence here.  ", metadata={"source": "a.md"})
+    b = Document(page_content="Next.", metadata={"source": "a.md"})
+    result = apply_semantic_overlap([a, b], overlap_sentences=3)
+
+    assert result[1].page_content == "Only one sentence here.\n\nNext."
+    assert result[1].metadata == {"source": "a.md", "overlap_sentence_count": 1}
+
+
+def test_apply_semantic_overlap_sources_original_text_only():
+    chunks = [Document(page_content=f"S{i}a. S{i}b.") for i in range(4)]
+    result = apply_semantic_overlap(chunks, overlap_sentences=1)
+
+    assert [r.page_content for r in result[1:]] == [
+        "S0b.\n\nS1a. S1b.",
+        "S1b.\n\nS2a. S2b.",
+        "S2b.\n\nS3a. S3b.",
+    ]
+
+
+def test_fingerprint_chunks_distinguishes_duplicates_and_salt():
+    chunks = [
+        Document(page_content="Same.", metadata={"source": "a.md"}),
+        Document(page_content="Same.", metadata={"source": "a.md"}),
+        Document(page_content="Same.", metadata={"source": "b.md"}),
+    ]
+    fps = [c.metadata["chunk_fingerprint"] for c in fingerprint_chunks(chunks)]
+    assert len(set(fps)) == 3
+
+    again = [c.metadata["chunk_fingerprint"] for c in fingerprint_chunks(chunks)]
+    salted = [c.metadata["chunk_fingerprint"] for c in fingerprint_chunks(chunks, "x")]
+    assert again == fps
+    assert salted[0] != fps[0]
+
+
 def test_prepend_metadata_title():
     doc = Document(
         page_content="Some story text.",
@@ -80,6 +135,64 @@ def test_prepend_metadata_title_includes_story_grid_tag():
     assert "crisis" in result[0].page_content
 
 
+class _TopicEmbeddings(Embeddings):
+    """Maps text to a one-hot vector per topic keyword and counts calls."""
+
+    topics = ("frog", "raven")
+
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+
+    def _vec(self, text: str) -> list[float]:
+        return [float(t in text.lower()) for t in self.topics] + [0.1]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(list(texts))
+        return [self._vec(t) for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._vec(text)
+
+
+@pytest.mark.asyncio
+async def test_semantic_chunk_splits_on_topic_shift():
+    text = (
+        "The frog sat. The frog hopped. The frog sang. The frog slept. "
+        "A raven cawed. The raven flew. The raven landed. The raven watched."
+    )
+    embeddings = _TopicEmbeddings()
+    chunks, vectors = await semantic_chunk(
+        [Document(page_content=text, metadata={"source": "s.md"})],
+        embeddings,
+        buffer_size=0,
+    )
+
+    assert [c.page_content for c in chunks] == [
+        "The frog sat. The frog hopped. The frog sang. The frog slept.",
+        "A raven cawed. The raven flew. The raven landed. The raven watched.",
+    ]
+    assert all(c.metadata == {"source": "s.md"} for c in chunks)
+    assert len(embeddings.calls) == 1
+    assert vectors.shape == (2, 3)
+    assert vectors[0][0] > vectors[0][1]
+    assert vectors[1][1] > vectors[1][0]
+
+
+@pytest.mark.asyncio
+async def test_semantic_chunk_batches_all_documents_in_one_call():
+    embeddings = _TopicEmbeddings()
+    docs = [
+        Document(page_content="One frog. Two frogs."),
+        Document(page_content="Single raven."),
+        Document(page_content=""),
+    ]
+    chunks, vectors = await semantic_chunk(docs, embeddings)
+
+    assert len(embeddings.calls) == 1
+    assert len(chunks) == len(vectors)
+    assert chunks[-1].page_content == "Single raven."
+
+
 # ── Classification unit tests ─────────────────────────────────────────────
 
 
@@ -109,6 +222,222 @@ async def test_classify_chunks_async_attaches_metadata():
     assert result[0].page_content == "PurpleFrog said hello."
 
 
+@pytest.mark.asyncio
+async def test_classify_chunks_async_preserves_order_under_concurrency():
+    """Chunks finishing out of order are still returned in input order."""
+    in_flight = 0
+    peak = 0
+
+    async def fake_classify(chain, chars_str, text, rate_limiter=None):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01 * (5 - int(text.split()[-1])))
+        in_flight -= 1
+        return ChunkClassification(
+            content_type="description",
+            narrative_function="worldbuilding",
+            characters_present=[text],
+            story_grid_tag="none",
+            external_references=[],
+            implied_gaps=[],
+        )
+
+    chunks = [Document(page_content=f"chunk {i}") for i in range(5)]
+    progress: list[tuple[int, int]] = []
+
+    async def on_classified(processed: int, total: int) -> None:
+        progress.append((processed, total))
+
+    with patch("pipeline.classification._ainvoke_with_retry", side_effect=fake_classify):
+        result = await classify_chunks_async(
+            chunks, [], MagicMock(),
+            on_chunk_classified=on_classified,
+            max_concurrency=2,
+        )
+
+    assert [d.page_content for d in result] == [f"chunk {i}" for i in range(5)]
+    assert [d.metadata["characters_present"] for d in result] == [
+        [f"chunk {i}"] for i in range(5)
+    ]
+    assert peak == 2
+    assert progress == [(i, 5) for i in range(1, 6)]
+
+
+@pytest.mark.asyncio
+async def test_classify_chunks_async_acquires_rate_limiter():
+    classification = ChunkClassification(
+        content_type="dialogue",
+        narrative_function="plot_event",
+        characters_present=[],
+        story_grid_tag="none",
+        external_references=[],
+        implied_gaps=[],
+    )
+    chain = MagicMock()
+    chain.ainvoke = AsyncMock(return_value=classification)
+    llm = MagicMock()
+    llm.with_structured_output.return_value = chain
+    rate_limiter = MagicMock()
+    rate_limiter.aacquire = AsyncMock(return_value=True)
+
+    with patch("pipeline.classification._classification_prompt") as prompt:
+        prompt.__or__.return_value = chain
+        result = await classify_chunks_async(
+            [Document(page_content="a"), Document(page_content="b")],
+            [], llm, rate_limiter=rate_limiter,
+        )
+
+    assert len(result) == 2
+    assert rate_limiter.aacquire.await_count == 2
+
+
+# ── Classification cache tests ────────────────────────────────────────────
+
+
+def _classification(*characters: str) -> ChunkClassification:
+    return ChunkClassification(
+        content_type="dialogue",
+        narrative_function="plot_event",
+        characters_present=list(characters),
+        story_grid_tag="none",
+        external_references=[],
+        implied_gaps=[],
+    )
+
+
+def test_classification_cache_key_varies_by_inputs():
+    base = classification_cache_key("text", "PurpleFrog", "gpt-4.1-mini")
+    assert base == classification_cache_key("text", "PurpleFrog", "gpt-4.1-mini")
+    assert base != classification_cache_key("text!", "PurpleFrog", "gpt-4.1-mini")
+    assert base != classification_cache_key("text", "SnowRaven", "gpt-4.1-mini")
+    assert base != classification_cache_key("text", "PurpleFrog", "gpt-4o")
+
+
+@pytest.mark.asyncio
+async def test_in_memory_classification_cache_evicts_lru():
+    cache = InMemoryClassificationCache(max_entries=2)
+    await cache.put("a", _classification("A"))
+    await cache.put("b", _classification("B"))
+    await cache.get("a")
+    await cache.put("c", _classification("C"))
+
+    assert await cache.get("b") is None
+    assert (await cache.get("a")).characters_present == ["A"]
+    assert (await cache.get("c")).characters_present == ["C"]
+
+
+@pytest.mark.asyncio
+async def test_sqlite_classification_cache_round_trip_and_eviction(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = SqliteClassificationCache(path, max_entries=2)
+    await cache.put("a", _classification("A"))
+    await cache.put("b", _classification("B"))
+    await cache.put("c", _classification("C"))
+
+    reopened = SqliteClassificationCache(path, max_entries=2)
+    assert await reopened.get("a") is None
+    assert (await reopened.get("c")).characters_present == ["C"]
+
+
+@pytest.mark.asyncio
+async def test_classify_chunks_async_skips_llm_on_cache_hit():
+    cache = InMemoryClassificationCache()
+    chunks = [Document(page_content="PurpleFrog said hello.")]
+
+    with patch(
+        "pipeline.classification._ainvoke_with_retry",
+        new_callable=AsyncMock,
+        return_value=_classification("PurpleFrog"),
+    ) as mock_invoke:
+        await classify_chunks_async(
+            chunks, ["PurpleFrog"], MagicMock(), cache=cache, model_name="m"
+        )
+        result = await classify_chunks_async(
+            chunks, ["PurpleFrog"], MagicMock(), cache=cache, model_name="m"
+        )
+
+    assert mock_invoke.await_count == 1
+    assert result[0].metadata["characters_present"] == ["PurpleFrog"]
+
+
+@pytest.mark.asyncio
+async def test_classification_survives_a_failing_cache():
+    cache = MagicMock()
+    cache.get = AsyncMock(side_effect=ConnectionError("cache down"))
+    cache.put = AsyncMock(side_effect=ConnectionError("cache down"))
+    chunks = [Document(page_content="PurpleFrog said hello.")]
+
+    with patch(
+        "pipeline.classification._ainvoke_with_retry",
+        new_callable=AsyncMock,
+        return_value=_classification("PurpleFrog"),
+    ) as mock_invoke:
+        result = await classify_chunks_async(
+            chunks, ["PurpleFrog"], MagicMock(), cache=cache, model_name="m"
+        )
+
+    assert mock_invoke.await_count == 1
+    cache.put.assert_awaited_once()
+    assert result[0].metadata["characters_present"] == ["PurpleFrog"]
+
+
+# ── Embedding cache tests ─────────────────────────────────────────────────
+
+
+def _counting(embeddings):
+    """Wrap *embeddings* so every text sent to the provider is recorded."""
+    seen: list[str] = []
+    original_docs = embeddings.embed_documents
+    original_query = embeddings.embed_query
+
+    def embed_documents(texts):
+        seen.extend(texts)
+        return original_docs(texts)
+
+    def embed_query(text):
+        seen.append(text)
+        return original_query(text)
+
+    wrapped = MagicMock(wraps=embeddings)
+    wrapped.embed_documents.side_effect = embed_documents
+    wrapped.embed_query.side_effect = embed_query
+    return wrapped, seen
+
+
+def test_cached_embeddings_embeds_each_text_once(fake_embeddings):
+    underlying, seen = _counting(fake_embeddings)
+    cached = CachedEmbeddings(underlying, namespace="fake")
+
+    first = cached.embed_documents(["a", "b", "a"])
+    second = cached.embed_documents(["b", "c"])
+    query = cached.embed_query("a")
+    cached.embed_query("a")
+
+    assert seen == ["a", "b", "c", "a"]
+    assert first[0] == first[2] == fake_embeddings.embed_documents(["a"])[0]
+    assert second[0] == first[1]
+    assert query == fake_embeddings.embed_query("a")
+    assert cached.hits == 3
+
+
+def test_cached_embeddings_persists_to_mmap_store(fake_embeddings, tmp_path):
+    cached = CachedEmbeddings(
+        fake_embeddings, namespace="fake", store=MmapEmbeddingStore(tmp_path)
+    )
+    expected = cached.embed_documents(["alpha", "beta"])
+
+    underlying, seen = _counting(fake_embeddings)
+    reloaded = CachedEmbeddings(
+        underlying, namespace="fake", store=MmapEmbeddingStore(tmp_path)
+    )
+    vectors = reloaded.embed_documents(["beta", "alpha", "gamma"])
+
+    assert seen == ["gamma"]
+    assert vectors[0] == pytest.approx(expected[1], abs=1e-6)
+    assert vectors[1] == pytest.approx(expected[0], abs=1e-6)
+
+
 # ── Pipeline settings tests ──────────────────────────────────────────────
 
 
@@ -119,11 +448,14 @@ def test_pipeline_settings_defaults():
     assert settings.use_modal is False
     assert settings.chunk_size == 500
     assert settings.overlap_sentences == 3
+    assert settings.classification_max_concurrency == 8
 
 
 # ── Pipeline service tests ────────────────────────────────────────────────
 
 
+WRITER = "writer-1"
+
 SAMPLE_DOCS = [
     Document(
         page_content=(
@@ -131,7 +463,7 @@ SAMPLE_DOCS = [
             "The colony had been underground for 720 days. "
             "She missed the sky. She missed her brother."
         ),
-        metadata={"source": "test-doc.md"},
+        metadata={"source": "test-doc.md", "user_id": WRITER},
     ),
 ]
 
@@ -195,6 +527,512 @@ async def test_advanced_pipeline_ingest(qdrant_in_memory, fake_embeddings):
     assert "test_advanced" in names
 
 
+def _mock_classification_llm(classification: ChunkClassification):
+    mock_chain = MagicMock()
+    mock_chain.__or__ = MagicMock(return_value=mock_chain)
+    mock_chain.ainvoke = AsyncMock(return_value=classification)
+    mock_llm = MagicMock()
+    mock_llm.with_structured_output.return_value = mock_chain
+    return mock_llm
+
+
+@pytest.mark.asyncio
+async def test_advanced_pipeline_reuses_chunker_vectors(qdrant_in_memory):
+    settings = IngestionPipelineSettings(
+        collection_name="test_reuse", reuse_chunker_vectors=True
+    )
+    embeddings = _TopicEmbeddings()
+    pipeline = IngestionPipelineService(
+        settings=settings,
+        qdrant_client=qdrant_in_memory,
+        embeddings=embeddings,
+    )
+
+    with patch(
+        "pipeline.service.ChatOpenAI",
+        return_value=_mock_classification_llm(_classification("PurpleFrog")),
+    ):
+        count = await pipeline.ingest(SAMPLE_DOCS, ["PurpleFrog"], pipeline_option="advanced")
+
+    assert len(embeddings.calls) == 1
+    assert qdrant_in_memory.count("test_reuse").count == count
+
+
+def test_pipeline_takes_classification_llm_from_registry(qdrant_in_memory, fake_embeddings):
+    registry = MagicMock()
+    settings = IngestionPipelineSettings()
+    pipeline = IngestionPipelineService(
+        settings=settings,
+        qdrant_client=qdrant_in_memory,
+        embeddings=fake_embeddings,
+        llm_registry=registry,
+    )
+
+    assert pipeline._classification_llm() is registry.get.return_value
+    registry.get.assert_called_once_with(
+        settings.classification_model,
+        max_completion_tokens=settings.classification_max_tokens,
+    )
+
+
+def test_point_id_is_deterministic():
+    assert point_id("a.md", "f0") == point_id("a.md", "f0")
+    assert point_id("a.md", "f0") != point_id("a.md", "f1")
+    assert point_id("a.md", "f0") != point_id("b.md", "f0")
+    assert point_id("a.md", "f0", "alice") != point_id("a.md", "f0", "bob")
+    assert point_id("a.md", "f0", "") == point_id("a.md", "f0")
+
+
+def test_locked_qdrant_client_is_shared_and_serialises_calls(
+    qdrant_in_memory, fake_embeddings
+):
+    active = 0
+    overlaps = 0
+
+    def slow_count(*args, **kwargs):
+        nonlocal active, overlaps
+        active += 1
+        overlaps += active > 1
+        time.sleep(0.01)
+        active -= 1
+
+    shared = LockedQdrantClient(qdrant_in_memory)
+    pipeline = IngestionPipelineService(
+        settings=IngestionPipelineSettings(), qdrant_client=shared, embeddings=fake_embeddings
+    )
+    builder = RetrievalToolBuilder(
+        settings=RetrievalToolSettings(), qdrant_client=shared, embeddings=fake_embeddings
+    )
+    assert pipeline._qdrant_client is shared
+    assert builder.qdrant_client is shared
+
+    with patch.object(qdrant_in_memory, "count", side_effect=slow_count):
+        threads = [threading.Thread(target=shared.count, args=("c",)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert overlaps == 0
+
+
+@pytest.mark.asyncio
+async def test_reingest_is_idempotent(qdrant_in_memory, fake_embeddings):
+    settings = IngestionPipelineSettings(collection_name="test_idempotent")
+    pipeline = IngestionPipelineService(
+        settings=settings,
+        qdrant_client=qdrant_in_memory,
+        embeddings=fake_embeddings,
+    )
+
+    first = await pipeline.ingest(SAMPLE_DOCS, [], pipeline_option="baseline")
+    await pipeline.ingest(SAMPLE_DOCS, [], pipeline_option="baseline")
+
+    assert qdrant_in_memory.count("test_idempotent").count == first
+
+
+def _paragraph_docs(*paragraphs: str) -> list[Document]:
+    return [Document(page_content="\n\n".join(paragraphs), metadata={"source": "draft.md"})]
+
+
+@pytest.mark.asyncio
+async def test_incremental_reingest_only_embeds_changed_chunks(qdrant_in_memory, fake_embeddings):
+    settings = IngestionPipelineSettings(
+        collection_name="test_incremental", chunk_size=25, chunk_overlap=0
+    )
+    underlying, seen = _counting(fake_embeddings)
+    underlying.aembed_documents = AsyncMock(
+        side_effect=lambda texts: underlying.embed_documents(texts)
+    )
+    pipeline = IngestionPipelineService(
+        settings=settings,
+        qdrant_client=qdrant_in_memory,
+        embeddings=underlying,
+    )
+    first = _paragraph_docs("Alpha paragraph here.", "Beta paragraph here.", "Gamma one.")
+    await pipeline.ingest(first, [], pipeline_option="baseline")
+    seen.clear()
+
+    edited = _paragraph_docs("Alpha paragraph here.", "Delta paragraph now.", "Gamma one.")
+    count = await pipeline.ingest(edited, [], pipeline_option="baseline")
+
+    assert seen == ["Delta paragraph now."]
+    assert count == 3
+    points, _ = qdrant_in_memory.scroll("test_incremental", limit=100)
+    texts = sorted(p.payload["page_content"] for p in points)
+    assert texts == ["Alpha paragraph here.", "Delta paragraph now.", "Gamma one."]
+
+
+@pytest.mark.asyncio
+async def test_incremental_reingest_skips_classification_of_unchanged(qdrant_in_memory):
+    settings = IngestionPipelineSettings(collection_name="test_incremental_adv")
+    pipeline = IngestionPipelineService(
+        settings=settings,
+        qdrant_client=qdrant_in_memory,
+        embeddings=_TopicEmbeddings(),
+    )
+
+    with (
+        patch("pipeline.service.ChatOpenAI"),
+        patch(
+            "pipeline.classification._ainvoke_with_retry",
+            new_callable=AsyncMock,
+            return_value=_classification("PurpleFrog"),
+        ) as mock_invoke,
+    ):
+        await pipeline.ingest(SAMPLE_DOCS, ["PurpleFrog"], pipeline_option="advanced")
+        calls = mock_invoke.await_count
+        await pipeline.ingest(SAMPLE_DOCS, ["PurpleFrog"], pipeline_option="advanced")
+
+    assert calls > 0
+    assert mock_invoke.await_count == calls
+
+
+@pytest.mark.asyncio
+async def test_upsert_reports_per_batch_progress(fake_embeddings):
+    settings = IngestionPipelineSettings(
+        collection_name="test_batches", upsert_batch_size=2, upsert_max_concurrency=2
+    )
+    async_client = AsyncQdrantClient(location=":memory:")
+    pipeline = IngestionPipelineService(
+        settings=settings,
+        qdrant_client=MagicMock(),
+        embeddings=fake_embeddings,
+        async_qdrant_client=async_client,
+    )
+    docs = [
+        Document(page_content=f"Chunk number {i}.", metadata={"source": "batch.md"})
+        for i in range(5)
+    ]
+    events: list[tuple[str, int, int | None, int | None]] = []
+
+    async def on_progress(stage, pct, total, processed):
+        events.append((stage, pct, total, processed))
+
+    with patch.object(pipeline, "_baseline_chunk", return_value=docs):
+        count = await pipeline.ingest(docs, [], "baseline", on_progress=on_progress)
+
+    embedding = [e for e in events if e[0] == "embedding"]
+    assert [e[3] for e in embedding][0] == 0
+    assert sorted(e[3] for e in embedding[1:]) == [2, 4, 5]
+    assert all(25 <= e[1] < 100 for e in embedding)
+    assert [e[1] for e in embedding] == sorted(e[1] for e in embedding)
+    assert events[-1] == ("complete", 100, 5, 5)
+    assert (await async_client.count("test_batches")).count == count == 5
+
+
+@pytest.mark.asyncio
+async def test_streaming_pipeline_upserts_before_classification_finishes(fake_embeddings):
+    """Early chunks reach Qdrant while later ones are still being classified."""
+    settings = IngestionPipelineSettings(
+        collection_name="test_streaming",
+        upsert_batch_size=1,
+        classification_max_concurrency=1,
+        stream_flush_seconds=0,
+    )
+    async_client = AsyncQdrantClient(location=":memory:")
+    pipeline = IngestionPipelineService(
+        settings=settings,
+        qdrant_client=MagicMock(),
+        embeddings=fake_embeddings,
+        async_qdrant_client=async_client,
+    )
+    docs = [
+        Document(page_content=f"Scene {i}.", metadata={"source": "stream.md"})
+        for i in range(3)
+    ]
+    stored_when_classifying: list[int] = []
+
+    async def fake_classify(chain, chars_str, text, rate_limiter=None):
+        if await async_client.collection_exists("test_streaming"):
+            stored_when_classifying.append(
+                (await async_client.count("test_streaming")).count
+            )
+        else:
+            stored_when_classifying.append(0)
+        await asyncio.sleep(0.05)
+        return _classification("PurpleFrog")
+
+    with (
+        patch.object(pipeline, "_advanced_chunk", AsyncMock(return_value=(docs, None))),
+        patch("pipeline.service.ChatOpenAI"),
+        patch("pipeline.classification._ainvoke_with_retry", side_effect=fake_classify),
+    ):
+        count = await pipeline.ingest(docs, ["PurpleFrog"], pipeline_option="advanced")
+
+    assert count == 3
+    assert stored_when_classifying[0] == 0
+    assert stored_when_classifying[-1] >= 1
+    points, _ = await async_client.scroll("test_streaming", limit=10)
+    assert all(p.payload["page_content"].startswith("[") for p in points)
+
+
+@pytest.mark.asyncio
+async def test_streaming_pipeline_stops_classifying_after_a_failed_write(fake_embeddings):
+    settings = IngestionPipelineSettings(
+        collection_name="test_stream_failure",
+        upsert_batch_size=1,
+        classification_max_concurrency=1,
+        stream_flush_seconds=0,
+    )
+    async_client = AsyncQdrantClient(location=":memory:")
+    pipeline = IngestionPipelineService(
+        settings=settings,
+        qdrant_client=MagicMock(),
+        embeddings=fake_embeddings,
+        async_qdrant_client=async_client,
+    )
+    docs = [
+        Document(page_content=f"Scene {i}.", metadata={"source": "stream.md"})
+        for i in range(20)
+    ]
+
+    async def fake_classify(chain, chars_str, text, rate_limiter=None):
+        await asyncio.sleep(0.01)
+        return _classification("PurpleFrog")
+
+    with (
+        patch.object(pipeline, "_advanced_chunk", AsyncMock(return_value=(docs, None))),
+        patch("pipeline.service.ChatOpenAI"),
+        patch(
+            "pipeline.classification._ainvoke_with_retry", side_effect=fake_classify
+        ) as classify,
+        patch.object(async_client, "upsert", AsyncMock(side_effect=RuntimeError("qdrant down"))),
+        pytest.raises(RuntimeError, match="qdrant down"),
+    ):
+        await pipeline.ingest(docs, ["PurpleFrog"], pipeline_option="advanced")
+
+    assert classify.call_count < len(docs)
+    assert not [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+
+def _tenant_docs(user_id: str, text: str) -> list[Document]:
+    return [
+        Document(
+            page_content=text,
+            metadata={"source": "draft.md", "user_id": user_id, "document_id": f"doc-{user_id}"},
+        )
+    ]
+
+
+@pytest.mark.asyncio
+async def test_same_filename_from_two_users_is_stored_per_tenant(
+    qdrant_in_memory, fake_embeddings
+):
+    collection = "test_tenants"
+    pipeline = IngestionPipelineService(
+        settings=IngestionPipelineSettings(collection_name=collection),
+        qdrant_client=qdrant_in_memory,
+        embeddings=fake_embeddings,
+    )
+    with patch.object(
+        qdrant_in_memory, "create_payload_index", wraps=qdrant_in_memory.create_payload_index
+    ) as create_index:
+        await pipeline.ingest(_tenant_docs("alice", "PurpleFrog guards the vault."), [], "baseline")
+        await pipeline.ingest(_tenant_docs("bob", "SnowRaven flies north."), [], "baseline")
+
+    points, _ = qdrant_in_memory.scroll(collection, limit=100)
+    assert sorted((p.payload["user_id"], p.payload["document_id"]) for p in points) == [
+        ("alice", "doc-alice"),
+        ("bob", "doc-bob"),
+    ]
+    assert {call.kwargs["field_name"] for call in create_index.call_args_list} >= {
+        "user_id",
+        "document_id",
+    }
+
+    builder = RetrievalToolBuilder(
+        settings=RetrievalToolSettings(collection_name=collection, reranker="none"),
+        qdrant_client=qdrant_in_memory,
+        embeddings=fake_embeddings,
+    )
+    for user_id, text in (
+        ("alice", "PurpleFrog guards the vault."),
+        ("bob", "SnowRaven flies north."),
+    ):
+        result = RetrievalResult.model_validate_json(
+            await builder.build().ainvoke({"query": "vault", "user_id": user_id})
+        )
+        assert [chunk.text for chunk in result.ranked_chunks] == [text]
+
+
+@pytest.mark.asyncio
+async def test_async_retrieval_filters_by_user():
+    collection = "test_tenants_async"
+    async_client = AsyncQdrantClient(location=":memory:")
+    embeddings = _TopicEmbeddings()
+    pipeline = IngestionPipelineService(
+        settings=IngestionPipelineSettings(collection_name=collection),
+        qdrant_client=MagicMock(),
+        embeddings=embeddings,
+        async_qdrant_client=async_client,
+    )
+    await pipeline.ingest(_tenant_docs("alice", "The Ytterbium Entangler hums."), [], "baseline")
+    await pipeline.ingest(_tenant_docs("bob", "The frog hopped."), [], "baseline")
+
+    builder = RetrievalToolBuilder(
+        settings=RetrievalToolSettings(collection_name=collection, reranker="none"),
+        qdrant_client=MagicMock(),
+        embeddings=embeddings,
+        async_qdrant_client=async_client,
+    )
+    result = await builder.asearch("Ytterbium Entangler", user_id="bob")
+
+    assert [chunk.text for chunk in result.ranked_chunks] == ["The frog hopped."]
+
+
+@pytest.mark.asyncio
+async def test_retrieval_without_user_id_fails_closed(qdrant_in_memory, fake_embeddings):
+    collection = "test_tenants_unscoped"
+    pipeline = IngestionPipelineService(
+        settings=IngestionPipelineSettings(collection_name=collection),
+        qdrant_client=qdrant_in_memory,
+        embeddings=fake_embeddings,
+    )
+    await pipeline.ingest(_tenant_docs("alice", "PurpleFrog guards the vault."), [], "baseline")
+    builder = RetrievalToolBuilder(
+        settings=RetrievalToolSettings(collection_name=collection, reranker="none"),
+        qdrant_client=qdrant_in_memory,
+        embeddings=fake_embeddings,
+    )
+
+    with patch.object(qdrant_in_memory, "query_points") as query:
+        result = RetrievalResult.model_validate_json(builder.build().invoke("vault"))
+        assert (await builder.asearch("vault")) == result
+    assert result.ranked_chunks == []
+    assert result.low_confidence is True
+    query.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_incremental_reingest_restamps_unchanged_points(qdrant_in_memory, fake_embeddings):
+    collection = "test_tenants_restamp"
+    pipeline = IngestionPipelineService(
+        settings=IngestionPipelineSettings(
+            collection_name=collection, chunk_size=25, chunk_overlap=0
+        ),
+        qdrant_client=qdrant_in_memory,
+        embeddings=fake_embeddings,
+    )
+
+    first = _paragraph_docs("Alpha paragraph here.", "Beta paragraph here.")
+    edited = _paragraph_docs("Alpha paragraph here.", "Delta paragraph now.")
+    for document_id, docs in (("v1", first), ("v2", edited)):
+        docs[0].metadata.update(user_id="alice", document_id=document_id)
+        await pipeline.ingest(docs, [], pipeline_option="baseline")
+
+    points, _ = qdrant_in_memory.scroll(collection, limit=100)
+    assert sorted((p.payload["page_content"], p.payload["document_id"]) for p in points) == [
+        ("Alpha paragraph here.", "v2"),
+        ("Delta paragraph now.", "v2"),
+    ]
+
+
+def _character_docs() -> list[Document]:
+    return [
+        Document(
+            page_content=text,
+            metadata={
+                "source": f"{i}.md",
+                "user_id": WRITER,
+                "characters_present": characters,
+                "narrative_function": function,
+            },
+        )
+        for i, (text, characters, function) in enumerate(
+            [
+                ("PurpleFrog remembers the flooded burrow.", ["PurpleFrog"], "backstory"),
+                ("PurpleFrog guards the vault.", ["PurpleFrog", "SnowRaven"], "plot_event"),
+                ("SnowRaven guards the northern gate.", ["SnowRaven"], "plot_event"),
+            ]
+        )
+    ]
+
+
+@pytest.mark.asyncio
+async def test_focused_retrieval_searches_the_characters_chunks_first(
+    qdrant_in_memory, fake_embeddings
+):
+    collection = "test_focused"
+    pipeline = IngestionPipelineService(
+        settings=IngestionPipelineSettings(collection_name=collection),
+        qdrant_client=qdrant_in_memory,
+        embeddings=fake_embeddings,
+    )
+    await pipeline.ingest(_character_docs(), [], pipeline_option="baseline")
+    points, _ = qdrant_in_memory.scroll(collection, limit=100)
+    assert sorted(p.payload["metadata"]["character_keys"] for p in points) == [
+        ["purplefrog"],
+        ["purplefrog", "snowraven"],
+        ["snowraven"],
+    ]
+
+    def texts(settings: RetrievalToolSettings, **focus) -> list[str]:
+        builder = RetrievalToolBuilder(
+            settings=settings, qdrant_client=qdrant_in_memory, embeddings=fake_embeddings
+        )
+        result = builder.search("guards", WRITER, **focus)
+        return sorted(chunk.text for chunk in result.ranked_chunks)
+
+    settings = RetrievalToolSettings(
+        collection_name=collection, reranker="none", rerank_top_n=10, focused_min_results=1
+    )
+    assert texts(settings, character_id="purplefrog") == [
+        "PurpleFrog guards the vault.",
+        "PurpleFrog remembers the flooded burrow.",
+    ]
+    assert texts(
+        settings, character_id="Purple Frog", hints={"narrative_function": ["backstory"]}
+    ) == ["PurpleFrog remembers the flooded burrow."]
+    # Too few focused hits: the unfocused search tops the candidates up.
+    assert len(texts(settings, character_id="ochramags")) == 3
+    topped_up = settings.model_copy(update={"focused_min_results": 3})
+    assert len(texts(topped_up, character_id="purplefrog")) == 3
+
+
+@pytest.mark.asyncio
+async def test_collection_created_with_quantization_and_hnsw_settings(
+    qdrant_in_memory, fake_embeddings
+):
+    pipeline = IngestionPipelineService(
+        settings=IngestionPipelineSettings(
+            collection_name="test_quantized",
+            quantization="scalar",
+            hnsw_m=32,
+            hnsw_ef_construct=256,
+        ),
+        qdrant_client=qdrant_in_memory,
+        embeddings=fake_embeddings,
+    )
+    with patch.object(
+        qdrant_in_memory, "create_collection", wraps=qdrant_in_memory.create_collection
+    ) as create:
+        await pipeline.ingest(SAMPLE_DOCS, [], pipeline_option="baseline")
+
+    kwargs = create.call_args.kwargs
+    assert kwargs["vectors_config"].on_disk is True
+    assert (kwargs["hnsw_config"].m, kwargs["hnsw_config"].ef_construct) == (32, 256)
+    assert kwargs["quantization_config"].scalar.type == models.ScalarType.INT8
+    assert kwargs["quantization_config"].scalar.always_ram is True
+
+
+def test_original_vectors_go_on_disk_only_when_quantized():
+    assert vectors_on_disk(IngestionPipelineSettings(quantization="scalar")) is True
+    assert vectors_on_disk(IngestionPipelineSettings(quantization="binary")) is True
+    assert vectors_on_disk(IngestionPipelineSettings(quantization="none")) is False
+    assert (
+        vectors_on_disk(IngestionPipelineSettings(quantization="scalar", on_disk_vectors=False))
+        is False
+    )
+
+
+def test_search_params_carry_ef_and_oversampling():
+    params = search_params(RetrievalToolSettings(hnsw_ef=128, quantization_oversampling=3.0))
+    assert params.hnsw_ef == 128
+    assert params.quantization.rescore is True
+    assert params.quantization.oversampling == 3.0
+    assert search_params(RetrievalToolSettings(quantization_oversampling=1.0)) is None
+
+
 @pytest.mark.asyncio
 async def test_pipeline_rejects_unknown_option(qdrant_in_memory, fake_embeddings):
     settings = IngestionPipelineSettings()
@@ -223,7 +1061,7 @@ def test_retrieval_tool_empty_collection(qdrant_in_memory, fake_embeddings):
         embeddings=fake_embeddings,
     )
     tool = builder.build()
-    result_json = tool.invoke("any query")
+    result_json = tool.invoke({"query": "any query", "user_id": WRITER})
     result = RetrievalResult.model_validate(json.loads(result_json))
     assert result.low_confidence is True
     assert result.ranked_chunks == []
@@ -243,7 +1081,7 @@ async def test_ingest_then_retrieve(qdrant_in_memory, fake_embeddings):
 
     tool_settings = RetrievalToolSettings(
         collection_name=collection,
-        cohere_api_key="unused",
+        reranker="lexical",
     )
     builder = RetrievalToolBuilder(
         settings=tool_settings,
@@ -251,18 +1089,7 @@ async def test_ingest_then_retrieve(qdrant_in_memory, fake_embeddings):
         embeddings=fake_embeddings,
     )
     tool = builder.build()
-
-    with patch("agents.tools.retrieval.tool.ContextualCompressionRetriever") as mock_ccr:
-        mock_retriever = MagicMock()
-        mock_retriever.invoke.return_value = [
-            Document(
-                page_content="PurpleFrog stared at the flickering LED screen.",
-                metadata={"source": "test-doc.md", "relevance_score": 0.9},
-            ),
-        ]
-        mock_ccr.return_value = mock_retriever
-
-        result_json = tool.invoke("PurpleFrog underground")
+    result_json = tool.invoke({"query": "PurpleFrog underground", "user_id": WRITER})
 
     result = RetrievalResult.model_validate(json.loads(result_json))
     assert result.low_confidence is False
@@ -270,6 +1097,322 @@ async def test_ingest_then_retrieve(qdrant_in_memory, fake_embeddings):
     assert "PurpleFrog" in result.ranked_chunks[0].text
 
 
+def test_bm25_sparse_embeddings_weights_terms():
+    encoder = BM25SparseEmbeddings()
+    [doc] = encoder.embed_documents(["The Entangler hums; the Entangler glows."])
+    query = encoder.embed_query("the entangler")
+
+    assert len(query.indices) == 1
+    assert set(query.indices) < set(doc.indices)
+    weights = dict(zip(doc.indices, doc.values))
+    assert weights[query.indices[0]] > max(v for i, v in weights.items() if i != query.indices[0])
+
+
+def _search(qdrant_client, embeddings, collection: str, mode: str, query: str) -> list[str]:
+    builder = RetrievalToolBuilder(
+        settings=RetrievalToolSettings(
+            collection_name=collection, top_k=2, retrieval_mode=mode, reranker="none"
+        ),
+        qdrant_client=qdrant_client,
+        embeddings=embeddings,
+    )
+    result = RetrievalResult.model_validate_json(
+        builder.build().invoke({"query": query, "user_id": WRITER})
+    )
+    return [chunk.text for chunk in result.ranked_chunks]
+
+
+@pytest.mark.asyncio
+async def test_hybrid_retrieval_recalls_exact_terms(qdrant_in_memory):
+    """Dense-only ranks the invented term last; hybrid pulls it into the top-k."""
+    collection = "test_hybrid"
+    target = "The Ytterbium Entangler hums in the vault."
+    docs = [
+        Document(page_content=text, metadata={"source": f"{i}.md", "user_id": WRITER})
+        for i, text in enumerate(
+            [
+                "A frog.",
+                "The frog hopped along the bank of the river.",
+                "The frog sang a long song to the moon above the quiet, sleeping pond.",
+                target,
+            ]
+        )
+    ]
+    embeddings = _TopicEmbeddings()
+    pipeline = IngestionPipelineService(
+        settings=IngestionPipelineSettings(collection_name=collection, chunk_size=200),
+        qdrant_client=qdrant_in_memory,
+        embeddings=embeddings,
+    )
+    await pipeline.ingest(docs, [], pipeline_option="baseline")
+
+    info = qdrant_in_memory.get_collection(collection)
+    assert SPARSE_VECTOR_NAME in info.config.params.sparse_vectors
+
+    query = "frog and the Ytterbium Entangler"
+    assert target not in _search(qdrant_in_memory, embeddings, collection, "dense", query)
+    assert target in _search(qdrant_in_memory, embeddings, collection, "hybrid", query)
+
+
+@pytest.mark.asyncio
+async def test_retrieval_falls_back_to_dense_without_sparse_vectors(
+    qdrant_in_memory, fake_embeddings
+):
+    collection = "test_dense_only"
+    pipeline = IngestionPipelineService(
+        settings=IngestionPipelineSettings(collection_name=collection, sparse_vectors=False),
+        qdrant_client=qdrant_in_memory,
+        embeddings=fake_embeddings,
+    )
+    await pipeline.ingest(SAMPLE_DOCS, [], pipeline_option="baseline")
+
+    assert not qdrant_in_memory.get_collection(collection).config.params.sparse_vectors
+    assert _search(qdrant_in_memory, fake_embeddings, collection, "hybrid", "PurpleFrog")
+
+
+def test_lexical_reranker_prefers_rare_query_terms():
+    docs = [
+        Document(page_content="The frog sat by the pond."),
+        Document(page_content="The frog met the Ytterbium Entangler."),
+        Document(page_content="The frog slept."),
+    ]
+    reranked = LexicalReranker(top_n=2).compress_documents(docs, "frog Entangler")
+
+    assert len(reranked) == 2
+    assert reranked[0].page_content == docs[1].page_content
+    assert 0 < reranked[1].metadata["relevance_score"] < reranked[0].metadata["relevance_score"]
+
+
+def test_create_reranker_auto_selects_by_cohere_key():
+    with patch("agents.tools.retrieval.rerank.CohereRerank") as mock_cohere:
+        assert create_reranker(RetrievalToolSettings(cohere_api_key="key")) is (
+            mock_cohere.return_value
+        )
+    assert isinstance(create_reranker(RetrievalToolSettings(cohere_api_key="")), LexicalReranker)
+    assert create_reranker(RetrievalToolSettings(reranker="none")) is None
+
+
+def _scored_builder(qdrant_client, embeddings, collection: str, margin: float, reranker):
+    return RetrievalToolBuilder(
+        settings=RetrievalToolSettings(
+            collection_name=collection, retrieval_mode="dense", rerank_skip_margin=margin
+        ),
+        qdrant_client=qdrant_client,
+        embeddings=embeddings,
+        reranker=reranker,
+    )
+
+
+@pytest.mark.asyncio
+async def test_rerank_skipped_when_margin_is_decisive(qdrant_in_memory):
+    collection = "test_rerank_margin"
+    embeddings = _TopicEmbeddings()
+    pipeline = IngestionPipelineService(
+        settings=IngestionPipelineSettings(collection_name=collection, chunk_size=200),
+        qdrant_client=qdrant_in_memory,
+        embeddings=embeddings,
+    )
+    docs = [
+        Document(page_content="The frog hopped.", metadata={"source": "a.md", "user_id": WRITER}),
+        Document(page_content="The raven flew.", metadata={"source": "b.md", "user_id": WRITER}),
+    ]
+    await pipeline.ingest(docs, [], pipeline_option="baseline")
+
+    reranker = MagicMock()
+    reranker.compress_documents.return_value = []
+
+    decisive = _scored_builder(qdrant_in_memory, embeddings, collection, 0.5, reranker)
+    result = decisive.search("frog", WRITER)
+    reranker.compress_documents.assert_not_called()
+    assert result.ranked_chunks[0].text == "The frog hopped."
+    assert result.ranked_chunks[0].score == pytest.approx(1.0)
+
+    close = _scored_builder(qdrant_in_memory, embeddings, collection, 0.999, reranker)
+    close.search("frog", WRITER)
+    reranker.compress_documents.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_retrieval_engine_caches_collection_until_ingestion(
+    qdrant_in_memory, fake_embeddings
+):
+    collection = "test_engine_cache"
+    builder = RetrievalToolBuilder(
+        settings=RetrievalToolSettings(
+            collection_name=collection, reranker="none", collection_cache_seconds=3600
+        ),
+        qdrant_client=qdrant_in_memory,
+        embeddings=fake_embeddings,
+    )
+    assert builder.build() is builder.build()
+
+    with patch.object(
+        qdrant_in_memory, "get_collection", wraps=qdrant_in_memory.get_collection
+    ) as get_collection:
+        assert builder.search("PurpleFrog", WRITER).low_confidence is True
+        assert builder.search("PurpleFrog", WRITER).low_confidence is True
+        assert get_collection.call_count == 1
+
+        pipeline = IngestionPipelineService(
+            settings=IngestionPipelineSettings(collection_name=collection),
+            qdrant_client=qdrant_in_memory,
+            embeddings=fake_embeddings,
+            on_collection_changed=builder.invalidate,
+        )
+        await pipeline.ingest(SAMPLE_DOCS, [], pipeline_option="baseline")
+
+        assert builder.search("PurpleFrog", WRITER).low_confidence is False
+        assert builder.search("PurpleFrog", WRITER).low_confidence is False
+        assert get_collection.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_retrieval_result_cache_is_keyed_by_query_and_generation(
+    qdrant_in_memory, fake_embeddings
+):
+    collection = "test_result_cache"
+    versions = KnowledgeBaseVersions()
+    pipeline = IngestionPipelineService(
+        settings=IngestionPipelineSettings(collection_name=collection),
+        qdrant_client=qdrant_in_memory,
+        embeddings=fake_embeddings,
+        on_collection_changed=versions.bump,
+    )
+    await pipeline.ingest(SAMPLE_DOCS, [], pipeline_option="baseline")
+    reranker = LexicalReranker(top_n=2)
+    builder = RetrievalToolBuilder(
+        settings=RetrievalToolSettings(collection_name=collection, result_cache_max_entries=2),
+        qdrant_client=qdrant_in_memory,
+        embeddings=fake_embeddings,
+        reranker=reranker,
+        versions=versions,
+    )
+
+    with patch.object(
+        LexicalReranker,
+        "compress_documents",
+        autospec=True,
+        side_effect=LexicalReranker.compress_documents,
+    ) as rerank:
+        first = builder.search("Where is PurpleFrog?", WRITER)
+        assert builder.search("  where is purplefrog ", WRITER) == first
+        assert (await builder.asearch("WHERE IS PURPLEFROG", WRITER)) == first
+        assert rerank.call_count == 1
+
+        generation = versions.current(collection, WRITER)
+        await pipeline.ingest(SAMPLE_DOCS, [], pipeline_option="baseline")
+        assert versions.current(collection, WRITER) > generation
+        builder.search("Where is PurpleFrog?", WRITER)
+        assert rerank.call_count == 2
+
+        builder.search("SnowRaven", WRITER)
+        builder.search("the Underground", WRITER)
+    assert builder.cache_metrics() == {
+        "entries": 2,
+        "max_entries": 2,
+        "hits": 2,
+        "misses": 4,
+        "evictions": 2,
+    }
+
+
+@pytest.mark.asyncio
+async def test_ingestion_only_invalidates_the_writers_cached_results(
+    qdrant_in_memory, fake_embeddings
+):
+    collection = "test_tenant_cache"
+    versions = KnowledgeBaseVersions()
+    builder = RetrievalToolBuilder(
+        settings=RetrievalToolSettings(collection_name=collection, reranker="none"),
+        qdrant_client=qdrant_in_memory,
+        embeddings=fake_embeddings,
+        versions=versions,
+    )
+
+    def collection_changed(name: str, user_id: str | None) -> None:
+        versions.bump(name, user_id)
+        builder.invalidate(name, user_id)
+
+    pipeline = IngestionPipelineService(
+        settings=IngestionPipelineSettings(collection_name=collection),
+        qdrant_client=qdrant_in_memory,
+        embeddings=fake_embeddings,
+        on_collection_changed=collection_changed,
+    )
+    await pipeline.ingest(_tenant_docs("alice", "PurpleFrog guards the vault."), [], "baseline")
+    await pipeline.ingest(_tenant_docs("bob", "SnowRaven flies north."), [], "baseline")
+    alice = builder.search("vault", "alice")
+    builder.search("north", "bob")
+    alice_generation = versions.current(collection, "alice")
+
+    await pipeline.ingest(_tenant_docs("bob", "SnowRaven flies south."), [], "baseline")
+
+    assert versions.current(collection, "alice") == alice_generation
+    assert builder.cache_metrics()["entries"] == 1
+    assert builder.search("vault", "alice") == alice
+    assert builder.cache_metrics()["hits"] == 1
+    assert [c.text for c in builder.search("north", "bob").ranked_chunks] == [
+        "SnowRaven flies south."
+    ]
+
+
+@pytest.mark.asyncio
+async def test_retrieval_tool_ainvoke_uses_async_qdrant_client():
+    collection = "test_async_retrieval"
+    target = "The Ytterbium Entangler hums in the vault."
+    async_client = AsyncQdrantClient(location=":memory:")
+    embeddings = _TopicEmbeddings()
+    pipeline = IngestionPipelineService(
+        settings=IngestionPipelineSettings(collection_name=collection, chunk_size=200),
+        qdrant_client=MagicMock(),
+        embeddings=embeddings,
+        async_qdrant_client=async_client,
+    )
+    docs = [
+        Document(page_content="The frog hopped.", metadata={"source": "a.md", "user_id": WRITER}),
+        Document(page_content=target, metadata={"source": "b.md", "user_id": WRITER}),
+    ]
+    await pipeline.ingest(docs, [], pipeline_option="baseline")
+
+    sync_client = MagicMock()
+    builder = RetrievalToolBuilder(
+        settings=RetrievalToolSettings(collection_name=collection, reranker="lexical"),
+        qdrant_client=sync_client,
+        embeddings=embeddings,
+        async_qdrant_client=async_client,
+    )
+    result = RetrievalResult.model_validate_json(
+        await builder.build().ainvoke({"query": "Ytterbium Entangler", "user_id": WRITER})
+    )
+
+    assert result.ranked_chunks[0].text == target
+    assert result.ranked_chunks[0].source_document == "b.md"
+    assert not sync_client.method_calls
+
+
+@pytest.mark.asyncio
+async def test_retrieval_tool_ainvoke_falls_back_to_thread(qdrant_in_memory, fake_embeddings):
+    collection = "test_async_fallback"
+    pipeline = IngestionPipelineService(
+        settings=IngestionPipelineSettings(collection_name=collection),
+        qdrant_client=qdrant_in_memory,
+        embeddings=fake_embeddings,
+    )
+    await pipeline.ingest(SAMPLE_DOCS, [], pipeline_option="baseline")
+
+    builder = RetrievalToolBuilder(
+        settings=RetrievalToolSettings(collection_name=collection, reranker="none"),
+        qdrant_client=qdrant_in_memory,
+        embeddings=fake_embeddings,
+    )
+    with patch("agents.tools.retrieval.tool.asyncio.to_thread", wraps=asyncio.to_thread) as spy:
+        result = RetrievalResult.model_validate_json(
+            await builder.build().ainvoke({"query": "PurpleFrog", "user_id": WRITER})
+        )
+    spy.assert_called_once_with(builder._search, "PurpleFrog", WRITER, "", None)
+    assert "PurpleFrog" in result.ranked_chunks[0].text
+
+
 # ── Runner tests ──────────────────────────────────────────────────────────
 
 
@@ -1,8 +1,25 @@
-from unittest.mock import MagicMock, patch
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from fastapi import HTTPException
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from postgrest.exceptions import APIError
 
-from agents.session.service import AvatarSessionService, _chunk_text, _sse_frame
+from agents.avatar.agent import AvatarAgentBuilder
+from agents.avatar.config import AvatarAgentSettings
+from agents.knowledge_base import KnowledgeBaseVersions
+from agents.session.config import SessionSettings
+from agents.session.history import HistoryManager
+from agents.session.persistence import PersistenceQueue
+from agents.session.repository import InMemoryChatRepository
+from agents.session.response_cache import CachedResponse, SemanticResponseCache
+from agents.session.service import AvatarSessionService, TurnContext, _sse_frame
+from agents.supervisor.agent import SupervisorAgentBuilder
+from agents.supervisor.config import SupervisorAgentSettings
 
 
 def test_sse_frame_format():
@@ -16,58 +33,35 @@ def test_sse_frame_done():
     assert '"chat_id": "abc-123"' in frame
 
 
-def test_chunk_text_splits_words():
-    text = "one two three four five"
-    chunks = _chunk_text(text, chunk_size=2)
-    assert chunks == ["one two ", "three four ", "five"]
-
-
-def test_chunk_text_single_chunk():
-    text = "short"
-    chunks = _chunk_text(text, chunk_size=20)
-    assert chunks == ["short"]
-
-
 @pytest.mark.asyncio
 async def test_stream_yields_correct_events():
     mock_supervisor = MagicMock()
     mock_graph = MagicMock()
 
-    async def fake_ainvoke(input_data, **kwargs):
-        return {
-            "response_text": "Hello world test response",
-            "citations": [{"source": "test.md", "chunk_index": 0}],
-            "gap_flags": [],
-            "narrative_state_delta": {},
-        }
+    async def fake_astream(input_data, **kwargs):
+        avatar_ns = ("call_avatar_agent:1",)
+        response_meta = {"langgraph_node": "generate_response"}
+        yield (avatar_ns, "messages", (AIMessageChunk(content="Hello world "), response_meta))
+        yield (avatar_ns, "messages", (AIMessageChunk(content="test response"), response_meta))
+        yield (
+            (),
+            "updates",
+            {
+                "call_avatar_agent": {
+                    "response_text": "Hello world test response",
+                    "citations": [{"source": "test.md", "chunk_index": 0}],
+                    "narrative_state_delta": {},
+                }
+            },
+        )
 
-    mock_graph.ainvoke = fake_ainvoke
+    mock_graph.astream = fake_astream
     mock_supervisor.compile.return_value = mock_graph
 
-    with patch("agents.session.service.create_client") as mock_create:
-        mock_supabase = MagicMock()
-        mock_create.return_value = mock_supabase
-
-        table = MagicMock()
-        table.select.return_value = table
-        table.eq.return_value = table
-        table.order.return_value = table
-        table.limit.return_value = table
-        table.maybe_single.return_value = table
-        table.insert.return_value = table
-        table.upsert.return_value = table
-
-        result_empty = MagicMock()
-        result_empty.data = []
-        table.execute.return_value = result_empty
-
-        mock_supabase.table.return_value = table
-
-        service = AvatarSessionService(
-            supervisor_builder=mock_supervisor,
-            supabase_url="https://test.supabase.co",
-            supabase_service_key="test-key",
-        )
+    service = AvatarSessionService(
+        supervisor_builder=mock_supervisor,
+        repository=InMemoryChatRepository(),
+    )
 
     events = []
     async for frame in service.stream(
@@ -75,6 +69,7 @@ async def test_stream_yields_correct_events():
         user_id="test-user",
         character_id="purplefrog",
         message="Hello",
+        turn=TurnContext(),
     ):
         events.append(frame)
 
@@ -86,3 +81,515 @@ async def test_stream_yields_correct_events():
     done_frame = [e for e in events if "event: done" in e]
     assert len(done_frame) == 1
     assert "test-chat" in done_frame[0]
+
+
+def _service_with_graph(graph) -> tuple[AvatarSessionService, InMemoryChatRepository]:
+    supervisor = MagicMock()
+    supervisor.compile.return_value = graph
+    repository = InMemoryChatRepository()
+    repository.chats["c"] = {"id": "c", "user_id": "u"}
+    service = AvatarSessionService(supervisor_builder=supervisor, repository=repository)
+    return service, repository
+
+
+@pytest.mark.asyncio
+async def test_stream_forwards_llm_tokens_after_citations_and_gaps(stub_builder):
+    retrieval = {
+        "ranked_chunks": [
+            {"text": "PurpleFrog.", "source_document": "a.md", "chunk_index": 0, "score": 0.9}
+        ],
+        "low_confidence": True,
+        "external_references": [],
+    }
+    fake_llm = GenericFakeChatModel(messages=iter([AIMessage(content="I miss the sky")]))
+    with patch("agents.avatar.agent.ChatOpenAI", return_value=fake_llm):
+        supervisor = SupervisorAgentBuilder(
+            settings=SupervisorAgentSettings(),
+            retrieval_tool_builder=stub_builder("build", return_value=json.dumps(retrieval))[0],
+            tavily_tool_builder=stub_builder("build")[0],
+            avatar_agent_builder=AvatarAgentBuilder(settings=AvatarAgentSettings()),
+            gap_detection_builder=stub_builder(
+                "compile",
+                return_value={
+                    "gap_flags": [
+                        {"undefined_attribute": "sibling", "development_suggestion": "Name him"}
+                    ]
+                },
+            )[0],
+        )
+        service, repository = _service_with_graph(supervisor.compile())
+        frames = [
+            frame
+            async for frame in service.stream(
+                chat_id="c", user_id="u", character_id="purplefrog", message="Hello"
+            )
+        ]
+
+    await service._persistence.flush()
+    events = [f.split("\n")[0].removeprefix("event: ") for f in frames]
+    tokens = [json.loads(f.split("data: ")[1])["text"] for f in frames if "event: token" in f]
+    assert len(tokens) > 1
+    assert "".join(tokens) == "I miss the sky"
+    assert events.index("citation") < events.index("token")
+    assert events.index("gap") < events.index("token")
+    assert events[-1] == "done"
+
+    assert [m["role"] for m in repository.messages] == ["user", "assistant"]
+    assert repository.messages[1]["content"] == "I miss the sky"
+    assert repository.messages[1]["citations"] == [
+        {"source": "a.md", "chunk_index": 0, "text": "PurpleFrog."}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stream_focuses_retrieval_on_the_characters_name(stub_builder):
+    retrieval_builder, retrieval = stub_builder(
+        "build",
+        return_value=json.dumps(
+            {"ranked_chunks": [], "low_confidence": True, "external_references": []}
+        ),
+    )
+    supervisor = SupervisorAgentBuilder(
+        settings=SupervisorAgentSettings(),
+        retrieval_tool_builder=retrieval_builder,
+        tavily_tool_builder=stub_builder("build")[0],
+        avatar_agent_builder=stub_builder("compile")[0],
+        gap_detection_builder=stub_builder("compile")[0],
+    )
+    service, repository = _service_with_graph(supervisor.compile())
+    character = await repository.create_character("u", "Purple Frog", "PF", "#7c3aed")
+    other = await repository.create_character("intruder", "SnowRaven", "SR", "#0ea5e9")
+
+    turn = await service.load_turn("c", "u", character["id"])
+    assert turn.character_name == "Purple Frog"
+    frames = [
+        frame
+        async for frame in service.stream(
+            chat_id="c", user_id="u", character_id=character["id"], message="Hi", turn=turn
+        )
+    ]
+
+    assert frames[-1] == _sse_frame("done", {"chat_id": "c"})
+    query = retrieval.ainvoke.await_args.args[0]
+    assert (query["user_id"], query["character_id"]) == ("u", "Purple Frog")
+    assert await repository.character_name(other["id"], "u") is None
+
+
+@pytest.mark.asyncio
+async def test_stream_emits_non_llm_response_as_single_token():
+    async def fake_astream(input_data, **kwargs):
+        yield ((), "updates", {"handle_no_context": {"response_text": "Upload first."}})
+
+    graph = MagicMock()
+    graph.astream = fake_astream
+    service, _ = _service_with_graph(graph)
+    frames = [
+        frame
+        async for frame in service.stream(
+            chat_id="c", user_id="u", character_id="purplefrog", message="Hello"
+        )
+    ]
+
+    assert frames[0] == _sse_frame("token", {"text": "Upload first."})
+    assert frames[-1] == _sse_frame("done", {"chat_id": "c"})
+
+
+@pytest.mark.asyncio
+async def test_load_turn_reads_concurrently_and_rejects_non_owner():
+    service, repository = _service_with_graph(MagicMock())
+    await repository.insert_messages([{"chat_id": "c", "role": "user", "content": "Hi"}])
+    await repository.upsert_narrative_state("c", "u", {"mood": "wary"})
+
+    in_flight = 0
+    peak = 0
+    originals = {}
+    for name in ("chat_owned_by", "read_history", "read_narrative_state", "character_name"):
+        originals[name] = getattr(repository, name)
+
+        async def tracked(*args, _original=originals[name]):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0)
+            in_flight -= 1
+            return await _original(*args)
+
+        setattr(repository, name, tracked)
+
+    turn = await service.load_turn("c", "u")
+    assert turn.history == [{"role": "user", "content": "Hi"}]
+    assert turn.narrative_state == {"mood": "wary"}
+    assert turn.character_name == ""
+    assert peak == 4
+
+    with pytest.raises(HTTPException) as excinfo:
+        await service.load_turn("c", "intruder")
+    assert excinfo.value.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_stream_persists_loaded_narrative_state_without_rereading():
+    async def fake_astream(input_data, **kwargs):
+        yield (
+            (),
+            "updates",
+            {
+                "call_avatar_agent": {
+                    "response_text": "Hm.",
+                    "narrative_state_delta": {"trust": "low"},
+                }
+            },
+        )
+
+    graph = MagicMock()
+    graph.astream = fake_astream
+    service, repository = _service_with_graph(graph)
+    repository.read_narrative_state = AsyncMock(side_effect=AssertionError("re-read"))
+
+    turn = TurnContext(narrative_state={"mood": "wary"})
+    frames = [
+        frame
+        async for frame in service.stream(
+            chat_id="c", user_id="u", character_id="purplefrog", message="Hello", turn=turn
+        )
+    ]
+
+    assert frames[-1] == _sse_frame("done", {"chat_id": "c"})
+    await service._persistence.flush()
+    assert repository.narrative_states["c"]["state"] == {"mood": "wary", "trust": "low"}
+
+
+@pytest.mark.asyncio
+async def test_done_is_sent_before_the_turn_is_written():
+    async def fake_astream(input_data, **kwargs):
+        yield ((), "updates", {"call_avatar_agent": {"response_text": "Hm."}})
+
+    graph = MagicMock()
+    graph.astream = fake_astream
+    service, repository = _service_with_graph(graph)
+    release = asyncio.Event()
+    insert = repository.insert_messages
+
+    async def slow_insert(rows):
+        await release.wait()
+        await insert(rows)
+
+    repository.insert_messages = slow_insert
+
+    frames = [
+        frame
+        async for frame in service.stream(
+            chat_id="c", user_id="u", character_id="purplefrog", message="Hi", turn=TurnContext()
+        )
+    ]
+    assert frames[-1] == _sse_frame("done", {"chat_id": "c"})
+    assert repository.messages == []
+
+    release.set()
+    await service._persistence.flush()
+    assert [m["content"] for m in repository.messages] == ["Hi", "Hm."]
+
+
+@pytest.mark.asyncio
+async def test_persistence_queue_batches_across_chats_and_retries():
+    repository = InMemoryChatRepository()
+    insert = repository.insert_messages
+    calls = []
+
+    async def flaky_insert(rows):
+        calls.append(len(rows))
+        if len(calls) == 1:
+            raise ConnectionError("database unavailable")
+        await insert(rows)
+
+    repository.insert_messages = flaky_insert
+    queue = PersistenceQueue(repository, flush_interval=0.01, retry_backoff=0.01)
+    queue.submit("a", "u", [{"id": "1", "chat_id": "a", "role": "user"}], {"n": 1})
+    queue.submit("b", "u", [{"id": "2", "chat_id": "b", "role": "user"}], {"n": 1})
+    queue.submit("a", "u", [{"id": "3", "chat_id": "a", "role": "user"}], {"n": 2})
+    await queue.flush()
+    await queue.close()
+
+    # The failed batch is retried chat by chat.
+    assert calls == [3, 2, 1]
+    assert sorted(m["id"] for m in repository.messages) == ["1", "2", "3"]
+    assert repository.narrative_states["a"]["state"] == {"n": 2}
+    assert queue.metrics() == {
+        "pending_turns": 0,
+        "turns_written": 3,
+        "batches_written": 1,
+        "retries": 1,
+        "dead_lettered": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_persistence_queue_dead_letters_a_deleted_chat_without_blocking_others(tmp_path):
+    dead_letter = tmp_path / "dead.jsonl"
+    repository = InMemoryChatRepository()
+    insert = repository.insert_messages
+
+    async def insert_with_fk(rows):
+        if any(row["chat_id"] == "deleted" for row in rows):
+            raise APIError({"code": "23503", "message": "violates foreign key constraint"})
+        await insert(rows)
+
+    repository.insert_messages = insert_with_fk
+    queue = PersistenceQueue(
+        repository,
+        flush_interval=0.01,
+        retry_backoff=0.01,
+        dead_letter_path=str(dead_letter),
+        wait_timeout=1.0,
+    )
+    queue.submit("deleted", "u", [{"id": "1", "chat_id": "deleted", "role": "user"}], {})
+    queue.submit("live", "u", [{"id": "2", "chat_id": "live", "role": "user"}], {"n": 1})
+    await asyncio.wait_for(queue.wait_for_chat("live"), 1.0)
+    await queue.close()
+
+    assert [m["id"] for m in repository.messages] == ["2"]
+    assert json.loads(dead_letter.read_text())["chat_id"] == "deleted"
+    assert queue.metrics()["dead_lettered"] == 1
+    assert queue.metrics()["pending_turns"] == 0
+
+
+@pytest.mark.asyncio
+async def test_persistence_queue_gives_up_on_transient_errors_and_wait_times_out():
+    repository = InMemoryChatRepository()
+
+    async def down(rows):
+        raise ConnectionError("database unavailable")
+
+    repository.insert_messages = down
+    queue = PersistenceQueue(
+        repository, retry_backoff=0.05, max_attempts=3, wait_timeout=0.01
+    )
+    queue.submit("a", "u", [{"id": "1", "chat_id": "a", "role": "user"}], {})
+    await queue.wait_for_chat("a")
+    assert queue.metrics()["pending_turns"] == 1
+
+    await asyncio.wait_for(queue.flush(), 2.0)
+    await queue.close()
+    assert queue.metrics()["dead_lettered"] == 1
+
+
+@pytest.mark.asyncio
+async def test_persistence_journal_is_replayed_after_restart(tmp_path):
+    journal = tmp_path / "turns.jsonl"
+    repository = InMemoryChatRepository()
+
+    async def down(rows):
+        raise ConnectionError("database unavailable")
+
+    repository.insert_messages = down
+    queue = PersistenceQueue(repository, retry_backoff=0.01, journal_path=str(journal))
+    queue.submit("a", "u", [{"id": "1", "chat_id": "a", "role": "user"}], {})
+    await queue.close(timeout=0.05)
+    assert journal.read_text().count("\n") == 1
+
+    repository = InMemoryChatRepository()
+    queue = PersistenceQueue(repository, journal_path=str(journal))
+    queue.start()
+    await queue.flush()
+    await queue.close()
+
+    assert [m["id"] for m in repository.messages] == ["1"]
+    assert journal.read_text() == ""
+
+
+def _messages(n: int) -> list[dict]:
+    return [
+        {
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"message {i} " + "word " * 10,
+            "created_at": f"2026-01-01T00:00:{i:02d}+00:00",
+        }
+        for i in range(n)
+    ]
+
+
+def test_history_window_keeps_newest_turns_within_token_budget():
+    manager = HistoryManager(SessionSettings(history_token_budget=60, tokenizer_encoding=""))
+    messages = _messages(8)
+
+    history, unsummarized = manager.window(messages, {})
+
+    assert [h["content"].split()[1] for h in history] == ["6", "7"]
+    assert unsummarized == messages[:6]
+
+    state = {
+        "history_summary": "They argued about the map.",
+        "summarized_through": messages[3]["created_at"],
+    }
+    history, unsummarized = manager.window(messages, state)
+    assert history[0] == {
+        "role": "system",
+        "content": "Summary of the earlier conversation:\nThey argued about the map.",
+    }
+    assert unsummarized == messages[4:6]
+
+
+@pytest.mark.asyncio
+async def test_history_summary_keeps_up_with_chats_longer_than_the_fetch_limit():
+    settings = SessionSettings(tokenizer_encoding="")
+    manager = HistoryManager(settings)
+    repository = InMemoryChatRepository()
+    messages = _messages(60)
+    state: dict = {}
+    summarized: list[dict] = []
+
+    # Short messages: the whole fetch fits the token budget, so only the
+    # message cap pushes turns out of the window.
+    for i in range(0, len(messages), 2):
+        await repository.insert_messages([{"chat_id": "c", **m} for m in messages[i : i + 2]])
+        fetched = await repository.read_history("c", settings.history_fetch_limit)
+        history, unsummarized = manager.window(fetched, state)
+        summarized += unsummarized
+        if unsummarized:
+            state = {"history_summary": "...", "summarized_through": unsummarized[-1]["created_at"]}
+
+    window = [h["content"] for h in history if h["role"] != "system"]
+    assert len(window) == settings.history_window_messages
+    assert [m["content"] for m in summarized] + window == [m["content"] for m in messages]
+
+
+@pytest.mark.asyncio
+async def test_repository_reads_most_recent_history():
+    repository = InMemoryChatRepository()
+    await repository.insert_messages([{"chat_id": "c", **m} for m in _messages(5)])
+
+    recent = await repository.read_history("c", 2)
+
+    assert [m["content"].split()[1] for m in recent] == ["3", "4"]
+
+
+@pytest.mark.asyncio
+async def test_stream_folds_old_turns_into_rolling_summary():
+    async def fake_astream(input_data, **kwargs):
+        assert input_data["conversation_history"][0]["role"] == "user"
+        yield ((), "updates", {"call_avatar_agent": {"response_text": "Hm."}})
+
+    graph = MagicMock()
+    graph.astream = fake_astream
+    service, repository = _service_with_graph(graph)
+    service._history = HistoryManager(
+        SessionSettings(history_token_budget=60, tokenizer_encoding="")
+    )
+    await repository.insert_messages([{"chat_id": "c", **m} for m in _messages(8)])
+    summarizer = GenericFakeChatModel(messages=iter([AIMessage(content="Early turns.")]))
+
+    with patch.object(HistoryManager, "_llm", return_value=summarizer):
+        turn = await service.load_turn("c", "u")
+        frames = [
+            frame
+            async for frame in service.stream(
+                chat_id="c", user_id="u", character_id="purplefrog", message="Hi", turn=turn
+            )
+        ]
+    await service._persistence.flush()
+
+    assert frames[-1] == _sse_frame("done", {"chat_id": "c"})
+    assert len(turn.history) == 2
+    assert repository.narrative_states["c"]["state"] == {
+        "history_summary": "Early turns.",
+        "summarized_through": "2026-01-01T00:00:05+00:00",
+    }
+
+
+def _response_cache(**kwargs) -> tuple[SemanticResponseCache, KnowledgeBaseVersions]:
+    versions = KnowledgeBaseVersions()
+    cache = SemanticResponseCache(
+        embeddings=DeterministicFakeEmbedding(size=64),
+        versions=versions,
+        collection_name="lrwr_chunks",
+        **kwargs,
+    )
+    return cache, versions
+
+
+@pytest.mark.asyncio
+async def test_response_cache_scopes_entries_and_invalidates_on_new_generation():
+    cache, versions = _response_cache()
+    probe = await cache.lookup("u", "purplefrog", "What do you fear?")
+    assert probe.hit is None
+    cache.store(probe, CachedResponse(response_text="The dark."))
+
+    assert (await cache.lookup("u", "purplefrog", "What do you fear?")).hit.response_text == (
+        "The dark."
+    )
+    assert (await cache.lookup("u", "snowraven", "What do you fear?")).hit is None
+    assert (await cache.lookup("other", "purplefrog", "What do you fear?")).hit is None
+    assert (await cache.lookup("u", "purplefrog", "Where were you born?")).hit is None
+
+    versions.bump("lrwr_chunks", "other")
+    assert (await cache.lookup("u", "purplefrog", "What do you fear?")).hit is not None
+    versions.bump("lrwr_chunks", "u")
+    assert (await cache.lookup("u", "purplefrog", "What do you fear?")).hit is None
+    cache.store(
+        await cache.lookup("u", "purplefrog", "What do you fear?"),
+        CachedResponse(response_text="The dark."),
+    )
+    versions.bump("lrwr_chunks")
+    assert (await cache.lookup("u", "purplefrog", "What do you fear?")).hit is None
+    assert cache.metrics() == {"entries": 2, "hits": 2, "misses": 7}
+
+
+@pytest.mark.asyncio
+async def test_response_cache_evicts_least_recently_used_and_expired():
+    cache, _ = _response_cache(max_entries=2)
+    for question in ("a?", "b?"):
+        cache.store(await cache.lookup("u", "c", question), CachedResponse(response_text=question))
+    assert (await cache.lookup("u", "c", "a?")).hit is not None
+    cache.store(await cache.lookup("u", "c", "z?"), CachedResponse(response_text="z?"))
+
+    assert (await cache.lookup("u", "c", "b?")).hit is None
+    assert (await cache.lookup("u", "c", "a?")).hit is not None
+
+    expired, _ = _response_cache(ttl_seconds=0.0)
+    expired.store(await expired.lookup("u", "c", "a?"), CachedResponse(response_text="a"))
+    assert (await expired.lookup("u", "c", "a?")).hit is None
+    assert expired.metrics()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_answers_repeated_question_from_response_cache():
+    runs = 0
+
+    async def fake_astream(input_data, **kwargs):
+        nonlocal runs
+        runs += 1
+        yield (
+            (),
+            "updates",
+            {
+                "call_avatar_agent": {
+                    "response_text": "The dark.",
+                    "citations": [{"source": "a.md", "chunk_index": 0}],
+                }
+            },
+        )
+
+    graph = MagicMock()
+    graph.astream = fake_astream
+    service, repository = _service_with_graph(graph)
+    service._response_cache, _ = _response_cache()
+
+    async def ask() -> list[str]:
+        return [
+            frame
+            async for frame in service.stream(
+                chat_id="c",
+                user_id="u",
+                character_id="purplefrog",
+                message="What do you fear?",
+                turn=TurnContext(),
+            )
+        ]
+
+    first = await ask()
+    second = await ask()
+    await service._persistence.flush()
+
+    assert runs == 1
+    assert sorted(first) == sorted(second)
+    assert [m["content"] for m in repository.messages].count("The dark.") == 2